@@ -1,3 +1,7 @@
 from ._core import *
+from ._cache import *
+from ._expression_library import *
 from ._postprocessor import *
+from ._progress import *
+from ._rebin import *
 from ._ui import *
@@ -0,0 +1,116 @@
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import yaml
+
+from ._core import Quantity
+
+
+__all__ = ["TaskCache"]
+
+
+def _to_json_serializable(obj):
+    '''fallback conversion for objects that cannot be serialized to JSON directly'''
+    if isinstance(obj, Quantity):
+        return obj._dict
+    return repr(obj)
+
+
+class TaskCache(object):
+    """Record of the inputs and configuration used to produce a task output file.
+
+    The record contains a hash of the input files (paths, sizes and modification times),
+    a hash of the configuration shared by all objects in the output (selections, defines,
+    splittings, etc.) and one hash per requested histogram or profile specification.
+    It is stored in a YAML file next to the task output file.
+    """
+
+    OBJECT_TYPES = ('histograms', 'profiles')
+
+    def __init__(self, input_hash, task_hash, object_hashes):
+        self._input_hash = input_hash
+        self._task_hash = task_hash
+        self._object_hashes = {
+            _object_type: dict(object_hashes.get(_object_type, None) or {})
+            for _object_type in self.OBJECT_TYPES
+        }
+
+    @staticmethod
+    def get_cache_filename(output_filename):
+        '''name of the cache file corresponding to an output file'''
+        return ".".join(output_filename.split('.')[:-1]) + "_cache.yml"
+
+    @staticmethod
+    def get_hash(obj):
+        '''compute a hash of an object from a canonical JSON representation'''
+        _serialized = json.dumps(obj, sort_keys=True, default=_to_json_serializable)
+        return hashlib.sha1(_serialized.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get_input_files_hash(input_files):
+        '''compute a hash of a list of input files from their paths, sizes and modification times'''
+        _file_infos = []
+        for _file_name in input_files:
+            if '://' in _file_name:
+                # no metadata available for remote files
+                _file_infos.append((_file_name, None, None))
+            else:
+                _stat = os.stat(_file_name)
+                _file_infos.append((os.path.realpath(_file_name), _stat.st_size, _stat.st_mtime))
+        return TaskCache.get_hash(_file_infos)
+
+    @classmethod
+    def load(cls, output_filename):
+        '''load the cache for an output file. Returns `None` if no valid cache is found.'''
+        _cache_filename = cls.get_cache_filename(output_filename)
+        if not os.path.exists(_cache_filename):
+            return None
+        try:
+            with open(_cache_filename, 'r') as _f:
+                _cache_dict = yaml.safe_load(_f)
+            return cls(
+                input_hash=_cache_dict['input'],
+                task_hash=_cache_dict['task'],
+                object_hashes=_cache_dict['objects'],
+            )
+        except (yaml.YAMLError, KeyError, TypeError) as _e:
+            print("[WARNING] Ignoring invalid task cache file '{}': {}".format(_cache_filename, _e))
+            return None
+
+    def save(self, output_filename):
+        '''save the cache for an output file'''
+        with open(self.get_cache_filename(output_filename), 'w') as _f:
+            yaml.safe_dump(dict(
+                input=self._input_hash,
+                task=self._task_hash,
+                objects=self._object_hashes,
+            ), _f, default_flow_style=False)
+
+    def get_outdated_objects(self, cache):
+        '''compare to the cache `cache` of an existing output file and return the object specifications
+        that need to be (re)computed, as a dict mapping object types to lists of specifications.
+        Returns `None` if the whole output needs to be recomputed.'''
+        if cache is None:
+            return None
+
+        # input files or shared configuration changed -> rerun everything
+        if cache._input_hash != self._input_hash or cache._task_hash != self._task_hash:
+            return None
+
+        _outdated_objects = {}
+        for _object_type in self.OBJECT_TYPES:
+            _hashes = self._object_hashes[_object_type]
+            _cached_hashes = cache._object_hashes[_object_type]
+
+            # objects removed from configuration -> rerun everything to remove them from output
+            if set(_cached_hashes) - set(_hashes):
+                return None
+
+            _outdated_objects[_object_type] = sorted([
+                _spec for _spec, _hash in _hashes.items()
+                if _cached_hashes.get(_spec, None) != _hash
+            ])
+
+        return _outdated_objects
@@ -87,29 +87,33 @@ class Quantity(object):
         return _nb
 
 
-def apply_defines(data_frame, defines):
-    """Applies all 'Defines' specified in a dictionary to an data frame."""
+def apply_defines(data_frame, defines, compiled_expressions=None):
+    """Applies all 'Defines' specified in a dictionary to an data frame.
+    Expressions found in the map `compiled_expressions` are replaced by calls to the compiled functions."""
     _df = data_frame
+    compiled_expressions = compiled_expressions or {}
     for _k, _v in defines.iteritems():
         print("[apply_defines] Defining quantity '{}': {}".format(_k, _v))
         try:
-            _df = _df.Define(_k, _v)
+            _df = _df.Define(_k, compiled_expressions.get(_v, _v))
         except Exception as _e:
             print("[apply_defines] WARNING: Error defining quantity '{}': {}".format(_k, _e))
 
     return _df
 
 
-def apply_filters(data_frame, filters):
-    """Applies all 'Filters' specified in a list to an data frame."""
+def apply_filters(data_frame, filters, compiled_expressions=None):
+    """Applies all 'Filters' specified in a list to an data frame.
+    Expressions found in the map `compiled_expressions` are replaced by calls to the compiled functions."""
     _df = data_frame
+    compiled_expressions = compiled_expressions or {}
     for _filter_expr in filters:
-        _df = _df.Filter(_filter_expr)
+        _df = _df.Filter(compiled_expressions.get(_filter_expr, _filter_expr))
 
     return _df
 
 
-def define_quantities(data_frame, quantities):
+def define_quantities(data_frame, quantities, compiled_expressions=None):
     """Define aliases for quantity expressions as specified in dictionary `quantities`."""
     _define_dict = {}  # map of quantities by unique name
     for _q_key, _q in quantities.iteritems():
@@ -125,6 +129,6 @@ def define_quantities(data_frame, quantities):
 
         _define_dict[_q.name] = _q.expression
 
-    _df = apply_defines(data_frame, _define_dict)
+    _df = apply_defines(data_frame, _define_dict, compiled_expressions=compiled_expressions)
 
     return _df
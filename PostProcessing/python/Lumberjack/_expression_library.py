@@ -0,0 +1,184 @@
+from __future__ import print_function
+
+import hashlib
+import os
+import re
+import shlex
+import subprocess
+import yaml
+
+
+__all__ = ["ExpressionLibrary"]
+
+
+class ExpressionLibrary(object):
+    """A shared library containing `Define` and `Filter` expressions compiled into typed C++ functions.
+
+    Each expression is turned into a function that takes the columns it uses as arguments
+    and returns the expression value. The library is compiled once and stored in a cache
+    directory under a key that identifies the analysis configuration. On subsequent runs,
+    the library is loaded and expressions are replaced by calls to the compiled functions,
+    so that ROOT does not need to JIT-compile them again.
+
+    Three files are stored for every key: a header declaring the compiled functions, a
+    YAML file mapping each expression to the corresponding function call and the library
+    itself (which is written last). All files are written to temporary files first and then
+    moved into place, so that concurrent runs never read incomplete files. The library is
+    loaded like any other external library, after which the header is declared using `declare`.
+    """
+
+    # identifiers, except for members and namespace-qualified names
+    RE_IDENTIFIER = re.compile(r"(?<![\w.])(?<!::)(?<!->)([A-Za-z_]\w*)")
+
+    HEADER_INCLUDES = (
+        "#include <cmath>\n"
+        "#include <vector>\n"
+        "#include \"ROOT/RVec.hxx\"\n"
+        "#include \"TMath.h\"\n"
+    )
+
+    def __init__(self, cache_dir, key):
+        self._dir = os.path.join(cache_dir, key)
+        self._build_process = None
+        self._tmp_library_path = None
+
+    @property
+    def library_path(self):
+        return os.path.join(self._dir, "liblumberjack_expressions.so")
+
+    @property
+    def header_path(self):
+        return os.path.join(self._dir, "lumberjack_expressions.h")
+
+    @property
+    def source_path(self):
+        return os.path.join(self._dir, "lumberjack_expressions.cxx")
+
+    @property
+    def mapping_path(self):
+        return os.path.join(self._dir, "lumberjack_expressions.yml")
+
+    @classmethod
+    def get_expression_columns(cls, expression, column_names):
+        '''return the names of all columns used in an expression, in order of first appearance'''
+        _columns = []
+        for _identifier in cls.RE_IDENTIFIER.findall(expression):
+            if _identifier in column_names and _identifier not in _columns:
+                _columns.append(_identifier)
+        return _columns
+
+    @staticmethod
+    def _get_function_name(return_type, expression, columns, column_types):
+        _signature = "{}|{}|{}".format(return_type, expression, ",".join([column_types[_c] for _c in columns]))
+        return "lumberjack_expr_" + hashlib.sha1(_signature.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def _write_file(path, content):
+        '''write `content` to a temporary file next to `path` and move it into place'''
+        _tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(_tmp_path, 'w') as _f:
+            _f.write(content)
+        os.rename(_tmp_path, path)
+
+    def exists(self):
+        '''check if the library has been built'''
+        return os.path.exists(self.library_path)
+
+    def declare(self):
+        '''declare the compiled functions in the ROOT interpreter and return a map of expressions to function calls.
+        The library itself must be loaded separately.'''
+        import ROOT
+
+        with open(self.header_path, 'r') as _f:
+            ROOT.gInterpreter.Declare(_f.read())
+
+        with open(self.mapping_path, 'r') as _f:
+            return yaml.safe_load(_f)
+
+    def build(self, expressions, column_types, root_macros=None, include_paths=None, libraries=None):
+        '''Generate the C++ source for all expressions and start compiling it in the background.
+
+        Parameters
+        ----------
+            expressions : `list` of `tuple`
+                pairs `(expression, return_type)`, with `return_type` given as a C++ type name
+            column_types : `dict`
+                maps the names of all columns and defines available to their C++ types
+            root_macros : `str`, optional
+                C++ code to place in front of the compiled functions
+            include_paths : `list` of `str`, optional
+                additional include paths
+            libraries : `list` of `str`, optional
+                shared libraries to link against
+        '''
+        _declarations = []
+        _definitions = []
+        _mapping = {}
+        for _expression, _return_type in expressions:
+            if _expression in _mapping:
+                continue
+
+            _columns = self.get_expression_columns(_expression, column_types)
+            _func_name = self._get_function_name(_return_type, _expression, _columns, column_types)
+
+            _arguments = ", ".join(["const {}& {}".format(column_types[_c], _c) for _c in _columns])
+            _declarations.append("{} {}({});".format(_return_type, _func_name, _arguments))
+            _definitions.append(
+                "__attribute__((visibility(\"default\"))) {} {}({}) {{\n    return ({});\n}}".format(
+                    _return_type, _func_name, _arguments, _expression))
+            _mapping[_expression] = "{}({})".format(_func_name, ", ".join(_columns))
+
+        if not _mapping:
+            print("[WARNING] No expressions to compile: not building expression library.")
+            return
+
+        # compile with ROOT flags, exporting only the expression functions
+        _root_config = lambda _flag: shlex.split(subprocess.check_output(['root-config', _flag]).decode())
+        _tmp_library_path = "{}.{}.tmp".format(self.library_path, os.getpid())
+        _command = (
+            _root_config('--cxx') + _root_config('--cflags') + ["-O2", "-fPIC", "-shared", "-fvisibility=hidden"] +
+            ["-I{}".format(_path) for _path in (include_paths or [])] +
+            [self.source_path, "-o", _tmp_library_path] +
+            _root_config('--libs') + list(libraries or [])
+        )
+
+        if not os.path.exists(self._dir):
+            try:
+                os.makedirs(self._dir)
+            except OSError:
+                # created by a concurrent run
+                if not os.path.isdir(self._dir):
+                    raise
+
+        self._write_file(self.header_path, self.HEADER_INCLUDES + "\n".join(_declarations) + "\n")
+
+        self._write_file(self.source_path, (
+            "// generated by Lumberjack: do not edit\n" +
+            self.HEADER_INCLUDES +
+            ("\n// -- ROOT_MACROS\n" + root_macros + "\n" if root_macros else "") +
+            "\n// -- compiled expressions\n" + "\n\n".join(_definitions) + "\n"
+        ))
+
+        self._write_file(self.mapping_path, yaml.safe_dump(_mapping, default_flow_style=False))
+
+        print("[INFO] Compiling {} expressions into library '{}' in the background...".format(len(_mapping), self.library_path))
+        self._build_process = subprocess.Popen(_command)
+        self._tmp_library_path = _tmp_library_path
+
+    def wait(self):
+        '''wait for the library build (if any) to finish. Returns `True` on success.'''
+        if self._build_process is None:
+            return True
+        _returncode = self._build_process.wait()
+        _tmp_library_path, self._build_process, self._tmp_library_path = self._tmp_library_path, None, None
+        if _returncode != 0:
+            print("[WARNING] Compiling expression library failed (exit code {}): "
+                  "expressions will continue to be JIT-compiled. Source file: {}".format(_returncode, self.source_path))
+            if os.path.exists(_tmp_library_path):
+                os.remove(_tmp_library_path)
+            return False
+
+        # move library into place only once it is complete
+        os.rename(_tmp_library_path, self.library_path)
+        print("[INFO] Compiled expression library is ready: {}".format(self.library_path))
+        return True
@@ -1,10 +1,15 @@
 from __future__ import print_function
 
 import argparse
+import hashlib
+import itertools
+import numbers
 import numpy as np
 import os
 import ROOT
 import re
+import shutil
+import tempfile
 import time
 
 from array import array
@@ -56,12 +61,34 @@ class PostProcessor(object):
         histogram = 1
         profile = 2
 
-    def __init__(self, data_frame, splitting_spec, quantities):
+    class SplitMode(Enum):
+        filter = 1  # one chain of `Filter` nodes per split
+        index = 2   # one "split index" column per splitting key
+
+    # approximate memory used by each bin (contents and sums of squared weights; for profiles also bin entries)
+    _BYTES_PER_BIN = {ObjectType.histogram: 16, ObjectType.profile: 32}
+    # approximate memory used by each object, independent of the number of bins
+    _BYTES_PER_OBJECT = 1024
+
+    # names of C++ split index functions already declared in the ROOT interpreter
+    _declared_split_index_functions = set()
+    # counter for creating unique names of split index columns
+    _split_index_column_counter = itertools.count()
+
+    def __init__(self, data_frame, splitting_spec, quantities, split_mode=SplitMode.filter, splitting_key_specs=None, compiled_expressions=None):
         self._df_bare = data_frame
         self._splitting_spec = splitting_spec
         self._qs = quantities
+        self._split_mode = split_mode
+        self._splitting_key_specs = splitting_key_specs
+        self._compiled_expressions = compiled_expressions or {}
+
+        if self._split_mode == self.__class__.SplitMode.index and self._splitting_key_specs is None:
+            raise ValueError("Split mode 'index' requires the specifications of the individual splitting keys (`splitting_key_specs`)!")
 
         self._specs = []
+        self._split_dfs = None
+        self._root_objects = None
 
     @staticmethod
     def _get_directory_from_split_name(split_name):
@@ -71,16 +98,147 @@ class PostProcessor(object):
         _path_elements = [_pe.split(':', 1)[-1] for _pe in _path_elements]
         return '/'.join(_path_elements)
 
+    @staticmethod
+    def _get_cpp_double_literal(value):
+        '''represent a number as a C++ double literal (with full precision)'''
+        _value = float(value)
+        if np.isinf(_value):
+            return "{}std::numeric_limits<double>::infinity()".format('-' if _value < 0 else '')
+        return repr(_value)
+
+    @staticmethod
+    def _get_split_index_spec(subdivisions):
+        '''check if the subdivisions of a splitting key can be identified by a single index computed
+        from one variable. Returns a tuple `(variable, kind, edges, subdivision_names)` or `None`.'''
+
+        _variables = set()
+        for _subdivision_dict in subdivisions.values():
+            if len(_subdivision_dict) != 1:
+                return None  # multi-variable cuts not supported
+            _variables.update(_subdivision_dict.keys())
+        if len(_variables) != 1:
+            return None  # all subdivisions must cut on the same variable
+        _var = list(_variables)[0]
+
+        _bin_specs = [(_subdivision_name, _subdivision_dict[_var]) for _subdivision_name, _subdivision_dict in subdivisions.iteritems()]
+
+        if all([isinstance(_bin_spec, tuple) for _, _bin_spec in _bin_specs]):
+            # intervals: must be non-empty and non-overlapping
+            _bin_specs = sorted(_bin_specs, key=lambda _name_and_spec: _name_and_spec[1][0])
+            for (_, (_lo, _hi)), (_, (_next_lo, _)) in zip(_bin_specs, _bin_specs[1:] + [(None, (float('inf'), None))]):
+                if not _lo < _hi or _hi > _next_lo:
+                    return None
+            return (_var, 'interval', [_bin_spec for _, _bin_spec in _bin_specs], [_name for _name, _ in _bin_specs])
+
+        elif all([isinstance(_bin_spec, numbers.Real) for _, _bin_spec in _bin_specs]):
+            # discrete values: must be unique
+            _bin_specs = sorted(_bin_specs, key=lambda _name_and_spec: _name_and_spec[1])
+            _values = [_bin_spec for _, _bin_spec in _bin_specs]
+            if len(set(_values)) != len(_values):
+                return None
+            return (_var, 'value', _values, [_name for _name, _ in _bin_specs])
+
+        return None
+
+    @classmethod
+    def _declare_split_index_function(cls, kind, edges):
+        '''declare a C++ function returning the index of the interval/value matching its argument (or -1)'''
+
+        if kind == 'interval':
+            _lo = ", ".join([cls._get_cpp_double_literal(_lo) for _lo, _ in edges])
+            _hi = ", ".join([cls._get_cpp_double_literal(_hi) for _, _hi in edges])
+            _body = (
+                "static const double lo[] = {{{lo}}}; "
+                "static const double hi[] = {{{hi}}}; "
+                "const double* it = std::upper_bound(lo, lo + {n}, value); "
+                "if (it == lo) return -1; "
+                "const int idx = (it - lo) - 1; "
+                "return (value < hi[idx]) ? idx : -1;"
+            ).format(lo=_lo, hi=_hi, n=len(edges))
+        elif kind == 'value':
+            _values = ", ".join([cls._get_cpp_double_literal(_v) for _v in edges])
+            _body = (
+                "static const double values[] = {{{values}}}; "
+                "const double* it = std::lower_bound(values, values + {n}, value); "
+                "if (it == values + {n} || *it != value) return -1; "
+                "return it - values;"
+            ).format(values=_values, n=len(edges))
+        else:
+            raise ValueError("Unknown split index kind '{}'!".format(kind))
+
+        # function name is unique for each body
+        _func_name = "lumberjackSplitIndex_" + hashlib.md5(_body.encode("utf-8")).hexdigest()
+        if _func_name not in cls._declared_split_index_functions:
+            ROOT.gInterpreter.Declare(
+                "#include <algorithm>\n"
+                "#include <limits>\n"
+                "int " + _func_name + "(const double value) { " + _body + " }"
+            )
+            cls._declared_split_index_functions.add(_func_name)
+
+        return _func_name
+
+    @staticmethod
+    def _get_filter_expressions(split_dict):
+        '''get the `Filter` expressions corresponding to a splitting dict'''
+        _filter_exprs = []
+        for _var, _bin_spec in split_dict.iteritems():
+            if isinstance(_bin_spec, tuple):
+                _filter_exprs.append("{lo}<={var}&&{var}<{hi}".format(lo=_bin_spec[0], hi=_bin_spec[1], var=_var))
+            else:
+                _filter_exprs.append("{var}=={value}".format(value=_bin_spec, var=_var))
+        return _filter_exprs
+
+    def _split_df_by_index(self):
+        '''create splits using one split index column per splitting key and a tree of `Filter` nodes'''
+
+        # -- define split index columns for all keys where possible
+        _df_with_indices = self._df_bare
+        _key_filter_exprs = {}  # filter expression for each (key, subdivision)
+        for _key, _subdivisions in self._splitting_key_specs.iteritems():
+            _split_index_spec = self._get_split_index_spec(_subdivisions)
+
+            if _split_index_spec is None:
+                print("[INFO] Cannot compute a split index for splitting key '{}': falling back to filters.".format(_key))
+                for _subdivision_name, _subdivision_dict in _subdivisions.iteritems():
+                    _key_filter_exprs[(_key, _subdivision_name)] = self._get_filter_expressions(_subdivision_dict)
+                continue
+
+            _var, _kind, _edges, _subdivision_names = _split_index_spec
+            _func_name = self._declare_split_index_function(_kind, _edges)
+            _column_name = "_lumberjack_split_index_{}".format(next(self.__class__._split_index_column_counter))
+            _df_with_indices = _df_with_indices.Define(_column_name, "{}({})".format(_func_name, _var))
+
+            for _index, _subdivision_name in enumerate(_subdivision_names):
+                _key_filter_exprs[(_key, _subdivision_name)] = ["{}=={}".format(_column_name, _index)]
+
+        # -- build a tree of filters: each event only traverses the branches it belongs to
+        _filter_nodes = {'': _df_with_indices}
+        self._split_dfs = {}
+        for _split_name in self._splitting_spec:
+            _parent_path = ''
+            for _path_element in _split_name.split('/'):
+                _path = _parent_path + '/' + _path_element if _parent_path else _path_element
+                if _path not in _filter_nodes:
+                    _node = _filter_nodes[_parent_path]
+                    for _filter_expr in _key_filter_exprs[tuple(_path_element.split(':', 1))]:
+                        _node = _node.Filter(self._compiled_expressions.get(_filter_expr, _filter_expr))
+                    _filter_nodes[_path] = _node
+                _parent_path = _path
+            self._split_dfs[_split_name] = _filter_nodes[_split_name]
+
     def _split_df(self):
+        if self._split_mode == self.__class__.SplitMode.index:
+            self._split_df_by_index()
+            return
+
         # -- create splits
         self._split_dfs = {}
         for _split_name, _split_dict in self._splitting_spec.iteritems():
             self._split_dfs[_split_name] = self._df_bare
-            for _var, _bin_spec in _split_dict.iteritems():
-                if isinstance(_bin_spec, tuple):
-                    self._split_dfs[_split_name] = self._split_dfs[_split_name].Filter("{lo}<={var}&&{var}<{hi}".format(lo=_bin_spec[0], hi=_bin_spec[1], var=_var))
-                else:
-                    self._split_dfs[_split_name] = self._split_dfs[_split_name].Filter("{var}=={value}".format(value=_bin_spec, var=_var))
+            for _filter_expr in self._get_filter_expressions(_split_dict):
+                self._split_dfs[_split_name] = self._split_dfs[_split_name].Filter(
+                    self._compiled_expressions.get(_filter_expr, _filter_expr))
 
     def _get_quantity_binning(self, quantity_name, split_dict):
         '''retrieve the binning for a quantity, taking named binnings into consideration.'''
@@ -105,6 +263,23 @@ class PostProcessor(object):
         else:
             return self._qs[quantity_name].binning
 
+    @classmethod
+    def _get_object_name_and_axes(cls, obj_type, vars_xyzt, weight, option_string):
+        '''return the name of the object created for a specification, the subdirectory (list of quantity
+        names) in which it is placed and the quantities used for each of its axes'''
+        _var_x, _var_y, _var_z, _var_t = vars_xyzt
+        _vars = [_v for _v in vars_xyzt if _v is not None]
+        _name_suffix = '_'.join([_s for _s in (_var_x, weight, option_string) if _s is not None])
+
+        if obj_type == cls.ObjectType.histogram:
+            _prefix = {1: 'h_', 2: 'h2d_', 3: 'h3d_'}[len(_vars)]
+            _axis_vars = _vars
+        else:
+            _prefix = {2: 'p_', 3: 'p2d_', 4: 'p3d_'}[len(_vars)]
+            _axis_vars = _vars[:-1]  # last quantity is profiled
+
+        return _prefix + _name_suffix, _vars[1:][::-1], _axis_vars
+
     def _create_objects(self):
         # -- create quantity shape histograms for each split
         self._root_objects = {}  # keys are paths of the form 'splitting_key1:splitting_value1/.../splitting_keyN:splitting_valueN'
@@ -117,8 +292,18 @@ class PostProcessor(object):
             for _obj_type, _vars_xyzt, _weight, _option_string in self._specs:
                 _var_x, _var_y, _var_z, _var_t = _vars_xyzt
 
+                if _obj_type == self.__class__.ObjectType.histogram and _var_t is not None:
+                    raise ValueError("4D histogram requested ({}), but this is not supported!".format(_vars_xyzt))
+                if _obj_type == self.__class__.ObjectType.profile:
+                    assert _var_y is not None
+
+                # object name and subdirectory (same as for other consumers of the output, e.g. `rebin`)
+                _obj_name, _subdirs, _ = self._get_object_name_and_axes(_obj_type, _vars_xyzt, _weight, _option_string)
+                _subdict = self._root_objects[_split_name]
+                for _subdir in _subdirs:
+                    _subdict = _subdict.setdefault(_subdir, {})  # ensure subdicts exist
+
                 _var_string_for_title = '_'.join([_v for _v in _vars_xyzt if _v is not None])
-                _name_suffix = '_'.join([_s for _s in (_var_x, _weight, _option_string) if _s is not None])
                 _title = '_'.join([_s for _s in (_var_string_for_title, _weight, _option_string, _split_name) if _s is not None])
 
                 # -- determing binnings in 'x' (and 'y' and 'z', if specified)
@@ -132,59 +317,44 @@ class PostProcessor(object):
                     _y_binning = self._get_quantity_binning(quantity_name=_var_y, split_dict=_split_dict)
                     _z_binning = self._get_quantity_binning(quantity_name=_var_z, split_dict=_split_dict)
                     _t_binning = self._get_quantity_binning(quantity_name=_var_t, split_dict=_split_dict)
-
-                    _var_t_subdict = self._root_objects[_split_name].setdefault(_var_t, {})  # ensure '_var_t' subdict exists
-                    _var_z_subdict = _var_t_subdict.setdefault(_var_z, {})  # ensure '_var_z' subdict exists
-                    _var_y_subdict = _var_z_subdict.setdefault(_var_y, {})  # ensure '_var_y' subdict exists
                 elif _var_z is not None:
                     # Case 2: var 'z' specified -> 3D histogram/2D profile requested
                     assert(_var_y is not None)  # cannot have 'z' without 'y'
                     _y_binning = self._get_quantity_binning(quantity_name=_var_y, split_dict=_split_dict)
                     _z_binning = self._get_quantity_binning(quantity_name=_var_z, split_dict=_split_dict)
-
-                    _var_z_subdict = self._root_objects[_split_name].setdefault(_var_z, {})  # ensure '_var_z' subdict exists
-                    _var_y_subdict = _var_z_subdict.setdefault(_var_y, {})  # ensure '_var_y' subdict exists
                 elif _var_y is not None:
                     # Case 3: no var 'z' specified, but var 'y' specified -> 2D histogram/profile requested
                     _y_binning = self._get_quantity_binning(quantity_name=_var_y, split_dict=_split_dict)
-                    _var_y_subdict = self._root_objects[_split_name].setdefault(_var_y, {})  # ensure '_var_y' subdict exists
 
                 if _obj_type == self.__class__.ObjectType.histogram:
-                    if _var_t is not None:
-                        raise ValueError("4D histogram requested ({}), but this is not supported!".format(_vars_xyzt))
-                    elif _var_z is not None:
+                    if _var_z is not None:
                         # implied -> _var_y is also not `None`
-                        _obj_name = 'h3d_' + _name_suffix
                         _obj_model = ROOT.RDF.TH3DModel(_obj_name, _title,
                             len(_x_binning)-1, array('f', _x_binning),
                             len(_y_binning)-1, array('f', _y_binning),
                             len(_z_binning)-1, array('f', _z_binning))
                         if _weight is None:
-                            self._root_objects[_split_name][_var_z][_var_y][_obj_name] = _split_df.Histo3D(_obj_model, _var_x, _var_y, _var_z)
+                            _subdict[_obj_name] = _split_df.Histo3D(_obj_model, _var_x, _var_y, _var_z)
                         else:
-                            self._root_objects[_split_name][_var_z][_var_y][_obj_name] = _split_df.Histo3D(_obj_model, _var_x, _var_y, _var_z, _weight)
+                            _subdict[_obj_name] = _split_df.Histo3D(_obj_model, _var_x, _var_y, _var_z, _weight)
                     elif _var_y is not None:
-                        _obj_name = 'h2d_' + _name_suffix
                         _obj_model = ROOT.RDF.TH2DModel(_obj_name, _title,
                             len(_x_binning)-1, array('f', _x_binning),
                             len(_y_binning)-1, array('f', _y_binning))
                         if _weight is None:
-                            self._root_objects[_split_name][_var_y][_obj_name] = _split_df.Histo2D(_obj_model, _var_x, _var_y)
+                            _subdict[_obj_name] = _split_df.Histo2D(_obj_model, _var_x, _var_y)
                         else:
-                            self._root_objects[_split_name][_var_y][_obj_name] = _split_df.Histo2D(_obj_model, _var_x, _var_y, _weight)
+                            _subdict[_obj_name] = _split_df.Histo2D(_obj_model, _var_x, _var_y, _weight)
                     else:
-                        _obj_name = 'h_' + _name_suffix
                         _obj_model = ROOT.RDF.TH1DModel(_obj_name, _title,
                             len(_x_binning)-1, array('f', _x_binning))
                         if _weight is None:
-                            self._root_objects[_split_name][_obj_name] = _split_df.Histo1D(_obj_model, _var_x)
+                            _subdict[_obj_name] = _split_df.Histo1D(_obj_model, _var_x)
                         else:
-                            self._root_objects[_split_name][_obj_name] = _split_df.Histo1D(_obj_model, _var_x, _weight)
+                            _subdict[_obj_name] = _split_df.Histo1D(_obj_model, _var_x, _weight)
 
                 elif _obj_type == self.__class__.ObjectType.profile:
-                    assert _var_y is not None
                     if _var_t is not None:
-                        _obj_name = 'p3d_' + _name_suffix
                         _obj_model = ROOT.RDF.TProfile3DModel(_obj_name, _title,
                             len(_x_binning)-1, array('f', _x_binning),
                             len(_y_binning)-1, array('f', _y_binning),
@@ -192,30 +362,28 @@ class PostProcessor(object):
                             # profiles may have build options
                             _option_string or "")
                         if _weight is None:
-                            self._root_objects[_split_name][_var_t][_var_z][_var_y][_obj_name] = _split_df.Profile3D(_obj_model, _var_x, _var_y, _var_z, _var_t)
+                            _subdict[_obj_name] = _split_df.Profile3D(_obj_model, _var_x, _var_y, _var_z, _var_t)
                         else:
-                            self._root_objects[_split_name][_var_t][_var_z][_var_y][_obj_name] = _split_df.Profile3D(_obj_model, _var_x, _var_y, _var_z, _var_t, _weight)
+                            _subdict[_obj_name] = _split_df.Profile3D(_obj_model, _var_x, _var_y, _var_z, _var_t, _weight)
                     elif _var_z is not None:
-                        _obj_name = 'p2d_' + _name_suffix
                         _obj_model = ROOT.RDF.TProfile2DModel(_obj_name, _title,
                             len(_x_binning)-1, array('f', _x_binning),
                             len(_y_binning)-1, array('f', _y_binning),
                             # profiles may have build options
                             _option_string or "")
                         if _weight is None:
-                            self._root_objects[_split_name][_var_z][_var_y][_obj_name] = _split_df.Profile2D(_obj_model, _var_x, _var_y, _var_z)
+                            _subdict[_obj_name] = _split_df.Profile2D(_obj_model, _var_x, _var_y, _var_z)
                         else:
-                            self._root_objects[_split_name][_var_z][_var_y][_obj_name] = _split_df.Profile2D(_obj_model, _var_x, _var_y, _var_z, _weight)
+                            _subdict[_obj_name] = _split_df.Profile2D(_obj_model, _var_x, _var_y, _var_z, _weight)
                     else:
-                        _obj_name = 'p_' + _name_suffix
                         _obj_model = ROOT.RDF.TProfile1DModel(_obj_name, _title,
                             len(_x_binning)-1, array('f', _x_binning),
                             # profiles may have build options
                             _option_string or "")
                         if _weight is None:
-                            self._root_objects[_split_name][_var_y][_obj_name] = _split_df.Profile1D(_obj_model, _var_x, _var_y)
+                            _subdict[_obj_name] = _split_df.Profile1D(_obj_model, _var_x, _var_y)
                         else:
-                            self._root_objects[_split_name][_var_y][_obj_name] = _split_df.Profile1D(_obj_model, _var_x, _var_y, _weight)
+                            _subdict[_obj_name] = _split_df.Profile1D(_obj_model, _var_x, _var_y, _weight)
 
 
     def add_histograms(self, histogram_specs):
@@ -273,15 +441,270 @@ class PostProcessor(object):
                 output_file.cd(_output_dir)
             object_or_dict.Write()
 
-    def run(self, output_file_path):
+    @staticmethod
+    def _copy_objects_recursively(source_dir, target_dir):
+        '''copy all objects in `source_dir` to `target_dir`, replacing existing objects with the same path'''
+        for _key in source_dir.GetListOfKeys():
+            _obj = _key.ReadObj()
+            if _obj.InheritsFrom("TDirectory"):
+                _target_subdir = target_dir.GetDirectory(_key.GetName())
+                if not _target_subdir:
+                    _target_subdir = target_dir.mkdir(_key.GetName())
+                PostProcessor._copy_objects_recursively(_obj, _target_subdir)
+            else:
+                target_dir.WriteTObject(_obj, _key.GetName(), "Overwrite")
+
+    @staticmethod
+    def update_output_file(output_file_path, update_file_path):
+        """Copy all objects from the file `update_file_path` into an existing output file, replacing objects with identical paths."""
+        _outfile = ROOT.TFile(output_file_path, "UPDATE")
+        _updatefile = ROOT.TFile(update_file_path, "READ")
+
+        PostProcessor._copy_objects_recursively(_updatefile, _outfile)
+
+        _updatefile.Close()
+        _outfile.Close()
 
+    @staticmethod
+    def _get_buffer_array(buffer, size):
+        '''copy the contents of a C++ `double` buffer of length `size` into a NumPy array'''
+        if hasattr(buffer, 'SetSize'):
+            buffer.SetSize(size)  # PyROOT
+        else:
+            buffer.reshape((size,))  # cppyy
+        return np.frombuffer(buffer, dtype=np.float64, count=size).copy()
+
+    @staticmethod
+    def _get_axis_edges(axis):
+        '''return the bin edges of a ROOT axis'''
+        _n_bins = axis.GetNbins()
+        _xbins = axis.GetXbins()
+        if _xbins.GetSize() == _n_bins + 1:
+            return PostProcessor._get_buffer_array(_xbins.GetArray(), _n_bins + 1)
+        return np.linspace(axis.GetXmin(), axis.GetXmax(), _n_bins + 1)
+
+    @staticmethod
+    def _get_object_arrays(root_object):
+        '''return the contents of a ROOT histogram or profile as a dict of NumPy arrays. Bin contents
+        include the underflow and overflow bins and are indexed as `[x, y, z]`. The sums of profiles are
+        read via `GetBinEntries`, `GetArray`, `GetSumw2` and `GetBinSumw2`, since the corresponding
+        accessors `GetB`, `GetW` and `GetW2` are protected in ROOT.'''
+
+        _axes = (root_object.GetXaxis(), root_object.GetYaxis(), root_object.GetZaxis())[:root_object.GetDimension()]
+        _shape = tuple([_axis.GetNbins() + 2 for _axis in _axes])
+        _n_cells = root_object.GetNcells()
+
+        def _to_cell_array(flat_array):
+            # ROOT's global bin index runs fastest in 'x'
+            return np.ascontiguousarray(flat_array.reshape(_shape[::-1]).T)
+
+        def _get_cell_array(buffer):
+            return _to_cell_array(PostProcessor._get_buffer_array(buffer, _n_cells))
+
+        _arrays = {}
+        for _axis_name, _axis in zip('xyz', _axes):
+            _arrays['edges_' + _axis_name] = PostProcessor._get_axis_edges(_axis)
+
+        if root_object.IsA().GetName().startswith('TProfile'):
+            _arrays['entries'] = _to_cell_array(np.array([root_object.GetBinEntries(_i) for _i in range(_n_cells)], dtype=np.float64))  # sum of weights
+            _arrays['sumwy'] = _get_cell_array(root_object.GetArray())
+            _arrays['sumwy2'] = _get_cell_array(root_object.GetSumw2().GetArray())
+            _bin_sumw2 = root_object.GetBinSumw2()
+            _arrays['sumw2'] = _get_cell_array(_bin_sumw2.GetArray()) if _bin_sumw2.GetSize() else _arrays['entries'].copy()
+        else:
+            _arrays['sumw'] = _get_cell_array(root_object.GetArray())
+            _sumw2 = root_object.GetSumw2()
+            _arrays['sumw2'] = _get_cell_array(_sumw2.GetArray()) if _sumw2.GetSize() else _arrays['sumw'].copy()
+
+        return _arrays
+
+    @staticmethod
+    def _add_object_arrays(root_object, object_path, arrays, index):
+        '''add the arrays of a histogram or profile to `arrays`, keyed by path, and an entry to the object index'''
+        for _array_name, _array in PostProcessor._get_object_arrays(root_object).iteritems():
+            arrays["{}/{}".format(object_path, _array_name)] = _array
+        _class_name = root_object.IsA().GetName()
+        index.append((
+            object_path,
+            _class_name,
+            root_object.GetEntries(),
+            root_object.GetErrorOption() if _class_name.startswith('TProfile') else '',
+        ))
+
+    @staticmethod
+    def _collect_arrays_recursively(directory, path, arrays, index):
+        '''add the arrays of all histograms and profiles in a ROOT directory to `arrays`, keyed by path'''
+        for _key in directory.GetListOfKeys():
+            _obj = _key.ReadObj()
+            _obj_path = "{}/{}".format(path, _key.GetName()) if path else _key.GetName()
+            if _obj.InheritsFrom("TDirectory"):
+                PostProcessor._collect_arrays_recursively(_obj, _obj_path, arrays, index)
+            elif _obj.InheritsFrom("TH1"):
+                PostProcessor._add_object_arrays(_obj, _obj_path, arrays, index)
+
+    @staticmethod
+    def _collect_arrays_from_results(object_or_dict, path, arrays, index):
+        '''add the arrays of all booked objects in a (nested) dict of results to `arrays`, keyed by path'''
+        if isinstance(object_or_dict, dict):
+            for _subkey, _subobject_or_dict in object_or_dict.iteritems():
+                _subpath = "{}/{}".format(path, _subkey) if path else _subkey
+                PostProcessor._collect_arrays_from_results(_subobject_or_dict, _subpath, arrays, index)
+        else:
+            PostProcessor._add_object_arrays(object_or_dict.GetValue(), path, arrays, index)
+
+    @staticmethod
+    def _save_columnar_arrays(arrays, index, columnar_file_path):
+        '''write arrays to a columnar store (directory of `.npy` files or HDF5 file), replacing it atomically'''
+        _ext = os.path.splitext(columnar_file_path)[1].lower()
+        _is_hdf5 = _ext in ('.h5', '.hdf5')
+        if _is_hdf5:
+            try:
+                import h5py
+            except ImportError:
+                raise ImportError("Writing HDF5 output requires the 'h5py' package!")
+
+        _arrays = dict(arrays)
+        _arrays['_index_paths'] = np.array([_entry[0] for _entry in index], dtype=str)
+        _arrays['_index_classes'] = np.array([_entry[1] for _entry in index], dtype=str)
+        _arrays['_index_entries'] = np.array([_entry[2] for _entry in index], dtype=np.float64)
+        _arrays['_index_error_options'] = np.array([_entry[3] for _entry in index], dtype=str)
+
+        # write to a temporary location next to the target first, so that readers never see a partial store
+        _parent_dir = os.path.dirname(os.path.abspath(columnar_file_path))
+        _tmp_path = tempfile.mkdtemp(prefix='.' + os.path.basename(columnar_file_path) + '.', dir=_parent_dir)
+
+        try:
+            if _is_hdf5:
+                _tmp_store_path = os.path.join(_tmp_path, os.path.basename(columnar_file_path))
+                with h5py.File(_tmp_store_path, 'w') as _f:
+                    for _array_path, _array in sorted(_arrays.iteritems()):
+                        if _array.dtype.kind == 'U':
+                            _array = _array.astype('S')  # HDF5 does not support NumPy unicode strings
+                        _f.create_dataset(_array_path, data=_array)
+                os.rename(_tmp_store_path, columnar_file_path)
+            else:
+                # one uncompressed `.npy` file per array: can be memory-mapped with `np.load(..., mmap_mode='r')`
+                for _array_path, _array in _arrays.iteritems():
+                    _array_file_path = os.path.join(_tmp_path, _array_path + '.npy')
+                    if not os.path.isdir(os.path.dirname(_array_file_path)):
+                        os.makedirs(os.path.dirname(_array_file_path))
+                    np.save(_array_file_path, _array)
+                # directories cannot be replaced in one step: move existing store out of the way first
+                _old_path = None
+                if os.path.isdir(columnar_file_path):
+                    _old_path = _tmp_path + '.old'
+                    os.rename(columnar_file_path, _old_path)
+                os.rename(_tmp_path, columnar_file_path)
+                if _old_path is not None:
+                    shutil.rmtree(_old_path)
+        finally:
+            if os.path.isdir(_tmp_path):
+                shutil.rmtree(_tmp_path)
+
+    @staticmethod
+    def write_columnar_output_file(output_file_path, columnar_file_path):
+        """Write the contents of all histograms and profiles in a Lumberjack output file to a columnar store:
+        a directory containing one NumPy `.npy` file per array, or an HDF5 file (extension `.h5` or `.hdf5`).
+
+        The arrays for each object are stored under the same path as the object in the ROOT file, e.g.
+        `<split_path>/<object_name>/sumw`. Histograms are stored as bin edges (`edges_x`, `edges_y`, `edges_z`)
+        and the sums of weights (`sumw`) and squared weights (`sumw2`) in each bin, including underflow and
+        overflow. Instead of `sumw`, profiles store the sums of weights (`entries`), weighted values (`sumwy`)
+        and weighted squared values (`sumwy2`). The paths, ROOT classes, numbers of entries and error options
+        of all objects are stored in the arrays `_index_paths`, `_index_classes`, `_index_entries` and
+        `_index_error_options`.
+
+        This reads all objects back from the ROOT file. For objects which are still in memory,
+        use :py:meth:`write` with `columnar_file_path` instead.
+        """
+        _infile = ROOT.TFile(output_file_path, "READ")
+        _arrays = {}
+        _index = []
+        PostProcessor._collect_arrays_recursively(_infile, "", _arrays, _index)
+        _infile.Close()
+
+        PostProcessor._save_columnar_arrays(_arrays, _index, columnar_file_path)
+
+    def _estimate_filter_evaluations(self):
+        '''estimate the minimum and maximum number of filter evaluations (and split index computations) per event'''
+        if not self._splitting_spec:
+            return 0, 0
+
+        if self._split_mode == self.__class__.SplitMode.filter:
+            _n_filters = [len(self._get_filter_expressions(_split_dict)) for _split_dict in self._splitting_spec.values()]
+            # the first filter of each split is evaluated for every event
+            return len(_n_filters), sum(_n_filters)
+
+        # split mode 'index': one level of filter nodes per splitting key
+        _keys = [_path_element.split(':', 1)[0] for _path_element in list(self._splitting_spec.keys())[0].split('/')]
+        _n_index_columns = 0
+        _n_filters_per_level = []
+        for _key in _keys:
+            _subdivisions = self._splitting_key_specs[_key]
+            if self._get_split_index_spec(_subdivisions) is not None:
+                _n_index_columns += 1
+                _n_filters_per_level.append([1] * len(_subdivisions))
+            else:
+                _n_filters_per_level.append([len(self._get_filter_expressions(_subdivision_dict)) for _subdivision_dict in _subdivisions.values()])
+
+        # every event reaches the first level, but at most one node per level
+        return (
+            _n_index_columns + len(_n_filters_per_level[0]),
+            _n_index_columns + sum([sum(_n_filters) for _n_filters in _n_filters_per_level])
+        )
+
+    def estimate_cost(self, n_slots=1):
+        """Estimate the resources needed for the requested objects, without booking them.
+
+        RDataFrame keeps one copy of each object per processing slot, so the memory estimate is
+        proportional to `n_slots`. Returns a dict with the following keys:
+
+            * `n_objects`, `n_bins`: total number of objects and bins (including underflow/overflow)
+            * `memory_bytes`: memory taken up by the objects during the event loop
+            * `output_bytes`: size of the output file (without compression)
+            * `filter_evaluations`: tuple with the minimum and maximum number of filter evaluations per event
+        """
+        _n_objects = 0
+        _n_bins = 0
+        _n_bytes = 0
+        for _split_name in self._splitting_spec:
+            _split_dict = dict([_path_element.split(':', 1) for _path_element in _split_name.split('/')])
+            for _obj_type, _vars_xyzt, _weight, _option_string in self._specs:
+                _, _, _axis_vars = self._get_object_name_and_axes(_obj_type, _vars_xyzt, _weight, _option_string)
+                _obj_n_bins = int(np.prod([
+                    len(self._get_quantity_binning(quantity_name=_var, split_dict=_split_dict)) + 1
+                    for _var in _axis_vars
+                ]))
+                _n_objects += 1
+                _n_bins += _obj_n_bins
+                _n_bytes += _obj_n_bins * self.__class__._BYTES_PER_BIN[_obj_type] + self.__class__._BYTES_PER_OBJECT
+
+        return dict(
+            n_objects=_n_objects,
+            n_bins=_n_bins,
+            memory_bytes=_n_bytes * max(int(n_slots), 1),
+            output_bytes=_n_bytes,
+            filter_evaluations=self._estimate_filter_evaluations(),
+        )
+
+    def book(self):
+        """Book all requested objects on the data frame. The event loop is not run."""
         if not self._specs:
-            print("[WARNING] No histograms and/or profiles booked for output. No file written.")
+            print("[WARNING] No histograms and/or profiles booked for output.")
             return
 
         self._split_df()
         self._create_objects()
 
+    def write(self, output_file_path, columnar_file_path=None):
+        """Write all booked objects to a ROOT file. Triggers the event loop if it has not run yet.
+
+        If `columnar_file_path` is given, the objects are also written to a columnar store
+        (see :py:meth:`write_columnar_output_file`), directly from memory."""
+        if self._root_objects is None:
+            print("[WARNING] No objects have been booked. No file written.")
+            return
+
         _outfile = ROOT.TFile(output_file_path, "RECREATE")
         _split_names = set(self._root_objects.keys())
 
@@ -293,3 +716,19 @@ class PostProcessor(object):
 
         _outfile.Close()
 
+        if columnar_file_path is not None:
+            _arrays = {}
+            _index = []
+            for _split_name in sorted(_split_names):
+                PostProcessor._collect_arrays_from_results(
+                    self._root_objects[_split_name], self._get_directory_from_split_name(_split_name), _arrays, _index)
+            PostProcessor._save_columnar_arrays(_arrays, _index, columnar_file_path)
+
+    def run(self, output_file_path):
+
+        if not self._specs:
+            print("[WARNING] No histograms and/or profiles booked for output. No file written.")
+            return
+
+        self.book()
+        self.write(output_file_path)
@@ -0,0 +1,171 @@
+from __future__ import print_function
+
+import ctypes
+import numpy as np
+import threading
+import time
+
+from tqdm import tqdm
+
+
+__all__ = ["ProgressMonitor"]
+
+
+_PROGRESS_COUNTER_CODE = """
+#include <atomic>
+#include <cstdint>
+#include <functional>
+#include <vector>
+
+namespace lumberjack {
+
+class ProgressCounter {
+  public:
+    ProgressCounter(unsigned int nSlots, ULong64_t increment) : fIncrement(increment), fSlotCounts(nSlots) {}
+
+    // callback for `OnPartialResultSlot`: only touches the counter of its own slot
+    std::function<void(unsigned int, ULong64_t&)> GetCallback() {
+        return [this](unsigned int slot, ULong64_t& /*count*/) {
+            fSlotCounts[slot].fValue.fetch_add(fIncrement, std::memory_order_relaxed);
+        };
+    }
+
+    // memory layout of the counters, so that they can be read without calling into C++
+    unsigned int GetNSlots() const { return fSlotCounts.size(); }
+    std::uintptr_t GetCountersAddress() const { return reinterpret_cast<std::uintptr_t>(fSlotCounts.data()); }
+    std::size_t GetCounterStride() const { return sizeof(PaddedCounter); }
+
+    // run the event loop (in the calling thread)
+    void RunEventLoop({result_type}& result) { result.GetValue(); }
+
+  private:
+    // one counter per cache line, to avoid false sharing between slots
+    struct PaddedCounter {
+        std::atomic<ULong64_t> fValue{0};
+        char fPadding[64 - sizeof(std::atomic<ULong64_t>)];
+    };
+    static_assert(sizeof(std::atomic<ULong64_t>) == sizeof(ULong64_t), "atomic counters must have the layout of plain integers");
+
+    const ULong64_t fIncrement;
+    std::vector<PaddedCounter> fSlotCounts;
+};
+
+}
+"""
+
+
+class ProgressMonitor(object):
+    """Report the progress of an RDataFrame event loop.
+
+    Each processing slot increments its own atomic counter in C++ every `increment` events,
+    so no locks are taken and the Python interpreter is never called during the event loop.
+    The event loop is run in the calling thread with the GIL released, while a Python thread
+    reads the counters directly from memory at a fixed rate to update a progress bar and report
+    the event throughput. The polling thread does not call into C++ (and thus the interpreter).
+
+    Parameters
+    ----------
+        count_result : result of `Count` on the data frame
+            the event loop is triggered by retrieving its value
+        total : `int`
+            expected number of events
+        increment : `int`, optional
+            number of events processed by a slot between counter updates
+        poll_interval : `float`, optional
+            time between progress bar updates (in seconds)
+    """
+
+    _declared = False
+
+    def __init__(self, count_result, total, increment=10000, poll_interval=0.5):
+        import ROOT
+
+        self._declare_progress_counter()
+
+        if ROOT.ROOT.IsImplicitMTEnabled():
+            _n_slots = max(ROOT.ROOT.GetImplicitMTPoolSize(), 1)
+        else:
+            _n_slots = 1
+
+        self._count_result = count_result
+        self._total = total
+        self._poll_interval = poll_interval
+
+        self._counter = ROOT.lumberjack.ProgressCounter(_n_slots, increment)
+        self._count_result.OnPartialResultSlot(increment, self._counter.GetCallback())
+
+        # view of the per-slot counters: reading it does not call into C++
+        _stride = int(self._counter.GetCounterStride())
+        _buffer = (ctypes.c_char * (_n_slots * _stride)).from_address(int(self._counter.GetCountersAddress()))
+        self._slot_counts = np.ndarray(shape=(_n_slots,), dtype=np.uint64, buffer=_buffer, strides=(_stride,))
+
+    @classmethod
+    def _declare_progress_counter(cls):
+        if cls._declared:
+            return
+
+        import ROOT
+
+        try:
+            ROOT.ROOT.RDataFrame
+            _result_type = "ROOT::RDF::RResultPtr<ULong64_t>"
+        except AttributeError:
+            _result_type = "ROOT::Experimental::TDF::TResultProxy<ULong64_t>"
+
+        ROOT.gInterpreter.Declare(_PROGRESS_COUNTER_CODE.replace("{result_type}", _result_type))
+
+        # the GIL must be released during the event loop, so that the polling thread can run
+        try:
+            ROOT.lumberjack.ProgressCounter.RunEventLoop.__release_gil__ = True
+        except (AttributeError, TypeError):
+            print("[WARNING] Cannot release the GIL during the event loop with this ROOT version: "
+                  "progress will only be shown when the event loop has finished.")
+        cls._declared = True
+
+    def _get_rates(self, elapsed_time):
+        '''return the total event rate and the event rates of each slot (in events/s)'''
+        _slot_rates = [int(_slot_count) / elapsed_time for _slot_count in self._slot_counts]
+        return sum(_slot_rates), _slot_rates
+
+    def _poll_counters(self, progress, start_time, stop_event):
+        '''update the progress bar at a fixed rate until `stop_event` is set (in a Python thread)'''
+        _last_count = 0
+        while not stop_event.wait(self._poll_interval):
+            _count = int(self._slot_counts.sum())
+            _rate, _slot_rates = self._get_rates(time.time() - start_time)
+            progress.set_postfix_str("{:.0f} events/s per slot".format(_rate / len(_slot_rates)), refresh=False)
+            progress.update(_count - _last_count)
+            _last_count = _count
+
+    def run_event_loop(self):
+        """Run the event loop, showing a progress bar until it has finished."""
+        _progress = tqdm(
+            unit=" events",
+            unit_scale=False,
+            dynamic_ncols=True,
+            desc="Event loop progress",
+            total=self._total,
+        )
+
+        _start_time = time.time()
+        _stop_event = threading.Event()
+        _poller = threading.Thread(target=self._poll_counters, args=(_progress, _start_time, _stop_event), name="lumberjack_progress")
+        _poller.daemon = True
+        _poller.start()
+        try:
+            self._counter.RunEventLoop(self._count_result)
+            _elapsed_time = time.time() - _start_time
+            _stop_event.set()
+            _poller.join()
+
+            # counters are only updated every `increment` events: fill up with the final count
+            _progress.update(self._count_result.GetValue() - _progress.n)
+        finally:
+            _stop_event.set()
+            _poller.join()
+            _progress.close()
+
+        _rate, _slot_rates = self._get_rates(_elapsed_time)
+        print("[INFO] Event loop throughput: {:.0f} events/s ({} slots)".format(self._count_result.GetValue() / _elapsed_time, len(_slot_rates)))
+        for _slot, _slot_rate in enumerate(_slot_rates):
+            print("    slot {}: {:.0f} events/s".format(_slot, _slot_rate))
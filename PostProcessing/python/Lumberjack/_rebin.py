@@ -0,0 +1,162 @@
+from __future__ import print_function
+
+import numpy as np
+import ROOT
+
+from array import array
+
+from ._postprocessor import PostProcessor
+
+
+__all__ = ["is_sub_binning", "rebin_array", "rebin_output_file"]
+
+
+def is_sub_binning(new_edges, old_edges, rtol=1e-6):
+    """Check if all bin edges in `new_edges` are also bin edges in `old_edges`."""
+    _old_edges = np.asarray(old_edges, dtype=float)
+    _tolerance = rtol * max(np.max(np.abs(_old_edges)), 1.0)
+    for _edge in new_edges:
+        if np.min(np.abs(_old_edges - _edge)) > _tolerance:
+            return False
+    return True
+
+
+def rebin_array(bin_array, axis, old_edges, new_edges):
+    """Sum the bins of an array with underflow and overflow bins along `axis` to obtain a coarser
+    binning. All edges in `new_edges` must also be edges in `old_edges`. Bins outside the new
+    range are added to the underflow or overflow bins."""
+    _old_edges = np.asarray(old_edges, dtype=float)
+    _new_edges = np.asarray(new_edges, dtype=float)
+
+    # map old bin indices to new ones (use bin centers to be robust against rounding of the edges)
+    _old_centers = 0.5 * (_old_edges[:-1] + _old_edges[1:])
+    _mapping = np.concatenate([
+        [0],  # underflow
+        np.searchsorted(_new_edges, _old_centers, side='right'),
+        [len(_new_edges)],  # overflow
+    ])
+
+    _moved_array = np.moveaxis(bin_array, axis, 0)
+    _result = np.zeros((len(_new_edges) + 1,) + _moved_array.shape[1:])
+    np.add.at(_result, _mapping, _moved_array)
+    return np.moveaxis(_result, 0, axis)
+
+
+def _set_buffer_array(buffer, values):
+    '''copy the values of a NumPy array into a C++ `double` buffer'''
+    _values = np.ravel(values.T)  # ROOT's global bin index runs fastest in 'x'
+    if hasattr(buffer, 'SetSize'):
+        buffer.SetSize(len(_values))  # PyROOT
+    else:
+        buffer.reshape((len(_values),))  # cppyy
+    np.frombuffer(buffer, dtype=np.float64, count=len(_values))[:] = _values
+
+
+def _create_object(template_object, edges, arrays):
+    '''create a ROOT object like `template_object` with new bin edges and contents'''
+    _obj = template_object.Clone()
+    _obj.SetDirectory(0)
+
+    _bins_args = []
+    for _edges in edges:
+        _bins_args.extend([len(_edges) - 1, array('d', _edges)])
+    _obj.SetBins(*_bins_args)
+
+    if 'entries' in arrays:
+        # profile
+        for _i, _entries in enumerate(np.ravel(arrays['entries'].T)):  # ROOT's global bin index runs fastest in 'x'
+            _obj.SetBinEntries(_i, _entries)
+        _set_buffer_array(_obj.GetArray(), arrays['sumwy'])
+        _set_buffer_array(_obj.GetSumw2().GetArray(), arrays['sumwy2'])
+        if _obj.GetBinSumw2().GetSize():
+            _set_buffer_array(_obj.GetBinSumw2().GetArray(), arrays['sumw2'])
+    else:
+        _set_buffer_array(_obj.GetArray(), arrays['sumw'])
+        if not _obj.GetSumw2().GetSize():
+            _obj.Sumw2()
+        _set_buffer_array(_obj.GetSumw2().GetArray(), arrays['sumw2'])
+
+    return _obj
+
+
+def rebin_output_file(input_file_path, output_file_path, object_requests):
+    """Create rebinned and/or merged objects from the objects in an existing Lumberjack output file.
+
+    Parameters
+    ----------
+        input_file_path : `str`
+            path to the existing output file
+        output_file_path : `str`
+            path to the file to which the new objects are written
+        object_requests : `list` of `tuple`
+            for each new object, a tuple `(target_path, source_paths, target_edges)`, where `source_paths`
+            are the paths of the objects in the input file to add up and `target_edges` contains the
+            new bin edges for each axis.
+
+    Returns
+    -------
+        list of tuples `(target_path, reason)` for all requested objects that could not be created
+        and need a full rerun
+    """
+    _infile = ROOT.TFile(input_file_path, "READ")
+    _outfile = ROOT.TFile(output_file_path, "RECREATE")
+
+    _failed_requests = []
+    for _target_path, _source_paths, _target_edges in object_requests:
+
+        _summed_arrays = None
+        _entries = 0
+        _template_object = None
+        for _source_path in _source_paths:
+            _source_object = _infile.Get(_source_path)
+            if not _source_object:
+                _failed_requests.append((_target_path, "source object '{}' not found".format(_source_path)))
+                break
+
+            _axes = (_source_object.GetXaxis(), _source_object.GetYaxis(), _source_object.GetZaxis())[:_source_object.GetDimension()]
+            _source_edges = [PostProcessor._get_axis_edges(_axis) for _axis in _axes]
+            if len(_source_edges) != len(_target_edges):
+                _failed_requests.append((_target_path, "dimension mismatch for source object '{}'".format(_source_path)))
+                break
+
+            _non_sub_binning_axes = [
+                _axis_name for _axis_name, _new_edges, _old_edges in zip('xyz', _target_edges, _source_edges)
+                if not is_sub_binning(_new_edges, _old_edges)
+            ]
+            if _non_sub_binning_axes:
+                _failed_requests.append((_target_path, "new binning is not a subset of the binning of '{}' along axis {}".format(
+                    _source_path, ", ".join(_non_sub_binning_axes))))
+                break
+
+            # rebin all arrays to the target binning
+            _arrays = PostProcessor._get_object_arrays(_source_object)
+            for _array_name in [_k for _k in _arrays if not _k.startswith('edges_')]:
+                for _i_axis, (_new_edges, _old_edges) in enumerate(zip(_target_edges, _source_edges)):
+                    _arrays[_array_name] = rebin_array(_arrays[_array_name], _i_axis, _old_edges, _new_edges)
+
+            if _summed_arrays is None:
+                _summed_arrays = _arrays
+                _template_object = _source_object
+            else:
+                for _array_name in _summed_arrays:
+                    if not _array_name.startswith('edges_'):
+                        _summed_arrays[_array_name] += _arrays[_array_name]
+            _entries += _source_object.GetEntries()
+        else:
+            _target_object = _create_object(_template_object, _target_edges, _summed_arrays)
+            _target_object.ResetStats()
+            _target_object.SetEntries(_entries)
+
+            _target_dir, _target_name = _target_path.rsplit('/', 1) if '/' in _target_path else ('', _target_path)
+            if _target_dir:
+                if not _outfile.GetDirectory(_target_dir):
+                    _outfile.mkdir(_target_dir)
+                _outfile.cd(_target_dir)
+            else:
+                _outfile.cd()
+            _target_object.Write(_target_name)
+
+    _outfile.Close()
+    _infile.Close()
+
+    return _failed_requests
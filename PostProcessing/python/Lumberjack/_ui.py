@@ -3,17 +3,19 @@ from __future__ import print_function
 import abc
 import argparse
 import datetime
-import hashlib
-import time
+import glob
+import multiprocessing
 import numpy as np
 import os
 import re
+import shutil
+import subprocess
 import sys
+import tempfile
 import yaml
 #import ROOT
 
 from contextlib import contextmanager
-from tqdm import tqdm
 
 __all__ = ["LumberjackInterfaceBase", "LumberjackCLI"]
 
@@ -33,6 +35,57 @@ def group_by(iterable, n):
     return _grouped_iterable
 
 
+def resolve_input_files(file_specs):
+    '''Return list of input files. Specifications can be file paths, glob patterns or
+    text files (ending in '.txt' or '.list') containing one such specification per line.'''
+    _files = []
+    for _file_spec in file_specs:
+        _file_spec = _file_spec.strip()
+        if not _file_spec or _file_spec.startswith('#'):
+            continue
+
+        if '://' in _file_spec:
+            # keep URL-like paths as they are
+            _files.append(_file_spec)
+        elif _file_spec.endswith('.txt') or _file_spec.endswith('.list'):
+            # read file list and resolve its contents
+            if not os.path.exists(_file_spec):
+                raise IOError("File list does not exist: '{}'".format(_file_spec))
+            with open(_file_spec, 'r') as _f:
+                _files.extend(resolve_input_files(_f.readlines()))
+        elif glob.has_magic(_file_spec):
+            _matched_files = sorted(glob.glob(_file_spec))
+            if not _matched_files:
+                raise IOError("No input files matching pattern: '{}'".format(_file_spec))
+            _files.extend(_matched_files)
+        else:
+            if not os.path.exists(_file_spec):
+                raise IOError("Input file does not exist: '{}'".format(_file_spec))
+            _files.append(_file_spec)
+
+    return _files
+
+def format_bytes(n_bytes):
+    '''Return a human-readable representation of a number of bytes'''
+    for _unit in ('B', 'kB', 'MB', 'GB'):
+        if abs(n_bytes) < 1024.0:
+            return "{:.1f} {}".format(n_bytes, _unit)
+        n_bytes /= 1024.0
+    return "{:.1f} TB".format(n_bytes)
+
+def _get_tree_entries(file_and_tree_name):
+    '''Return the number of entries of a TTree in a file, or `None` if the tree is not found.'''
+    import ROOT
+    _file_name, _tree_name = file_and_tree_name
+    _f = ROOT.TFile.Open(_file_name, "READ")
+    if not _f or _f.IsZombie():
+        return None
+    _tree = _f.Get(_tree_name)
+    _entries = _tree.GetEntries() if isinstance(_tree, ROOT.TTree) else None
+    _f.Close()
+    return _entries
+
+
 class StreamDup:
     def __init__(self, streams):
         self._streams = streams
@@ -51,7 +104,7 @@ class StreamDup:
 
 
 @contextmanager
-def log_stdout_to_file(filename):
+def log_stdout_to_file(filename, mode='w'):
     if filename is None:
         yield
     else:
@@ -60,7 +113,7 @@ def log_stdout_to_file(filename):
             os.mkdir(_out_dir)
 
         _old_stdout = sys.stdout
-        with open(filename, 'w') as _log:
+        with open(filename, mode) as _log:
             sys.stdout = StreamDup([sys.stdout, _log])
             yield
             sys.stdout.flush()
@@ -75,6 +128,18 @@ class LumberjackInterfaceBase(object):
         # retrieve runner arguments and analysis config
         self._args, self._config = self._get_args_config(**kwargs)
 
+        # for incremental running
+        self._input_files_hash = None
+        self._task_caches = {}
+
+        # cost estimates of tasks set up so far
+        self._cost_estimates = {}
+
+        # for compiled expressions
+        self._compiled_expressions = {}
+        self._pending_expression_library = None  # to build after preparing the data frame
+        self._building_expression_library = None  # build started in this process
+
     @abc.abstractmethod
     def _get_args_config(self, **kwargs):
         '''parse CLI arguments and retrieve analysis config'''
@@ -90,6 +155,35 @@ class LumberjackInterfaceBase(object):
         except AttributeError:
             ROOT_DF_CLASS = ROOT.ROOT.Experimental.TDataFrame
 
+        # -- resolve input files
+        try:
+            _input_files = resolve_input_files(self._args.input_files)
+        except IOError as _e:
+            print("[ERROR] {}".format(_e))
+            exit(1)
+        if not _input_files:
+            print("[ERROR] No input files given!")
+            exit(1)
+
+        # -- count entries in each input file (in parallel, if several jobs requested)
+        # note: do this before enabling multithreading in ROOT
+        _n_processes = min(int(self._args.jobs), len(_input_files))
+        _files_and_tree_names = [(_file_name, self._args.tree) for _file_name in _input_files]
+        if _n_processes > 1:
+            _pool = multiprocessing.Pool(processes=_n_processes)
+            _entries = _pool.map(_get_tree_entries, _files_and_tree_names)
+            _pool.close()
+            _pool.join()
+        else:
+            _entries = list(map(_get_tree_entries, _files_and_tree_names))
+
+        # exit if tree does not exist in file
+        for _file_name, _file_entries in zip(_input_files, _entries):
+            if _file_entries is None:
+                print("[ERROR] Input file '{}' cannot be opened or does not contain TTree '{}'".format(_file_name, self._args.tree))
+                exit(1)
+        self._df_size = sum(_entries)
+
         # -- enable multithreading
         if int(self._args.jobs) > 1:
             print("[INFO] Enabling multithreading with {} threads...".format(self._args.jobs))
@@ -99,24 +193,19 @@ class LumberjackInterfaceBase(object):
 
         # -- set up data frame
         print("[INFO] Setting up data frame...")
-        print("[INFO] Sample file: {}".format(self._args.input_file))
-
-        # exit if input file does not exist
-        if not os.path.exists(self._args.input_file):
-            print("[ERROR] Input file does not exist: '{}'".format(self._args.input_file))
-            exit(1)
-
-        # exit if tree does not exist in file
-        _f = ROOT.TFile(self._args.input_file, "READ")
-        _tree = _f.Get(self._args.tree)
-        if not isinstance(_tree, ROOT.TTree):
-            print("[ERROR] Input file does not contain TTree '{}'".format(self._args.tree))
-            exit(1)
-        self._df_size = _tree.GetEntries()
-        _f.Close()
+        if len(_input_files) == 1:
+            print("[INFO] Sample file: {}".format(_input_files[0]))
+        else:
+            print("[INFO] Sample files ({}):".format(len(_input_files)))
+            for _file_name in _input_files:
+                print("    {}".format(_file_name))
+        print("[INFO] Number of entries: {}".format(self._df_size))
 
         print("[INFO] Sample type: {}".format(self._args.input_type))
-        self._df_bare = ROOT_DF_CLASS(self._args.tree, self._args.input_file)
+        self._chain = ROOT.TChain(self._args.tree)
+        for _file_name in _input_files:
+            self._chain.Add(_file_name)
+        self._df_bare = ROOT_DF_CLASS(self._chain)
 
         # -- add ROOT include paths
         if hasattr(self._config, 'ROOT_INCLUDE_PATHS'):
@@ -125,10 +214,18 @@ class LumberjackInterfaceBase(object):
                 print("    {}".format(_path))
                 ROOT.gInterpreter.AddIncludePath('{}'.format(_path))
 
+        # -- look up library of compiled expressions
+        _expression_library = None
+        if self._args.compile_expressions:
+            _expression_library = self._get_expression_library()
+
         # -- load external libraries in ROOT
-        if hasattr(self._config, 'ROOT_LOAD_EXTERNAL_LIBRARIES'):
+        _external_libraries = list(getattr(self._config, 'ROOT_LOAD_EXTERNAL_LIBRARIES', []))
+        if _expression_library is not None and _expression_library.exists():
+            _external_libraries.append(_expression_library.library_path)
+        if _external_libraries:
             print("[INFO] Loading external libraries in ROOT interpreter:")
-            for _so_path in self._config.ROOT_LOAD_EXTERNAL_LIBRARIES:
+            for _so_path in _external_libraries:
                 print("    {}".format(_so_path))
                 ROOT.gInterpreter.Load(_so_path)
 
@@ -137,9 +234,124 @@ class LumberjackInterfaceBase(object):
             print("[INFO] Defining ROOT macros...")
             ROOT.gInterpreter.Declare(self._config.ROOT_MACROS)
 
+        # -- use compiled expressions if available, otherwise build them after the first run
+        if _expression_library is not None:
+            if _expression_library.exists():
+                print("[INFO] Using compiled expressions from library: {}".format(_expression_library.library_path))
+                self._compiled_expressions = _expression_library.declare()
+            elif not self._args.dry_run:
+                print("[INFO] No compiled expressions found: library will be built after setting up the data frame.")
+                self._pending_expression_library = _expression_library
+
+    def _get_config_expressions(self):
+        '''return all `Define` and `Filter` expressions in the analysis config as a list of
+        pairs `(expression, define_name)`. The define name is `None` for filter expressions.'''
+
+        from Karma.PostProcessing.Lumberjack import PostProcessor
+
+        QUANTITIES = self._config.QUANTITIES
+        DEFINES = getattr(self._config, 'DEFINES', {})
+        SELECTIONS = getattr(self._config, 'SELECTIONS', {})
+        SPLITTINGS = self._config.SPLITTINGS
+
+        _expressions = []
+        _quantities = dict(QUANTITIES['global'], **QUANTITIES.get(self._args.input_type, {}))
+        for _q_key, _q in sorted(_quantities.iteritems()):
+            if _q.name != _q.expression:
+                _expressions.append((_q.expression, _q.name))
+        for _defines in (DEFINES.get('global', {}), DEFINES.get(self._args.input_type, {})):
+            for _name, _expression in sorted(_defines.iteritems()):
+                _expressions.append((_expression, _name))
+        for _sel in (self._args.selections or []):
+            for _expression in SELECTIONS.get(_sel, []):
+                _expressions.append((_expression, None))
+        for _splitting_key, _subdivisions in sorted(SPLITTINGS.iteritems()):
+            for _subdivision_name, _subdivision_dict in sorted(_subdivisions.iteritems()):
+                for _expression in PostProcessor._get_filter_expressions(_subdivision_dict):
+                    _expressions.append((_expression, None))
+
+        return _expressions
+
+    def _get_expression_library(self):
+        '''get the compiled expression library for the current configuration and input columns'''
+
+        import ROOT
+        from Karma.PostProcessing.Lumberjack import ExpressionLibrary, TaskCache
+
+        _expressions = self._get_config_expressions()
+
+        # types of input columns used in expressions also determine the compiled code
+        _input_columns = set([str(_c) for _c in self._df_bare.GetColumnNames()])
+        _used_input_columns = set()
+        for _expression, _ in _expressions:
+            _used_input_columns.update(ExpressionLibrary.get_expression_columns(_expression, _input_columns))
+
+        _key = TaskCache.get_hash(dict(
+            expressions=_expressions,
+            input_column_types={_c: str(self._df_bare.GetColumnType(_c)) for _c in _used_input_columns},
+            root_config={
+                _key: getattr(self._config, _key, None)
+                for _key in ('ROOT_INCLUDE_PATHS', 'ROOT_LOAD_EXTERNAL_LIBRARIES', 'ROOT_MACROS')
+            },
+            root_version=ROOT.gROOT.GetVersion(),
+        ))
+
+        return ExpressionLibrary(self._args.jit_cache_dir, _key)
+
+    def _build_expression_library(self):
+        '''start building the compiled expression library using the column types of the prepared data frame'''
+
+        from Karma.PostProcessing.Lumberjack import ExpressionLibrary
+
+        _expression_library, self._pending_expression_library = self._pending_expression_library, None
+
+        # determine the types of the columns used in or defined by the expressions
+        # (only these, since querying the type of a define triggers its JIT compilation)
+        _config_expressions = self._get_config_expressions()
+        _column_names = set([str(_c) for _c in self._df.GetColumnNames()])
+        _needed_columns = set()
+        for _expression, _define_name in _config_expressions:
+            _needed_columns.update(ExpressionLibrary.get_expression_columns(_expression, _column_names))
+            if _define_name is not None and _define_name in _column_names:
+                _needed_columns.add(_define_name)
+
+        _column_types = {}
+        for _column in sorted(_needed_columns):
+            try:
+                _column_types[_column] = str(self._df.GetColumnType(_column))
+            except Exception as _e:
+                print("[WARNING] Cannot determine type of column '{}': {}".format(_column, _e))
+
+        _expressions = []
+        for _expression, _define_name in _config_expressions:
+            if _define_name is None:
+                _expressions.append((_expression, "bool"))
+            elif _define_name in _column_types:
+                _expressions.append((_expression, _column_types[_define_name]))
+
+        try:
+            _expression_library.build(
+                _expressions,
+                _column_types,
+                root_macros=getattr(self._config, 'ROOT_MACROS', None),
+                include_paths=getattr(self._config, 'ROOT_INCLUDE_PATHS', None),
+                libraries=getattr(self._config, 'ROOT_LOAD_EXTERNAL_LIBRARIES', None),
+            )
+        except (OSError, subprocess.CalledProcessError) as _e:
+            print("[WARNING] Cannot build compiled expression library: {}".format(_e))
+            return
+
+        self._building_expression_library = _expression_library
+
+    def _wait_for_expression_library(self):
+        '''wait for the compiled expression library build started in this process (if any)'''
+        if self._building_expression_library is not None:
+            self._building_expression_library.wait()
+            self._building_expression_library = None
+
     def _prepare_data_frame(self):
 
-        from Karma.PostProcessing.Lumberjack import apply_defines, apply_filters, define_quantities
+        from Karma.PostProcessing.Lumberjack import apply_defines, apply_filters, define_quantities, ProgressMonitor
 
         QUANTITIES = self._config.QUANTITIES
         DEFINES = self._config.DEFINES
@@ -150,45 +362,12 @@ class LumberjackInterfaceBase(object):
             print("[INFO] Limiting number of processed events to: ".format(self._args.num_events))
             self._df_bare = self._df_bare.Range(0, int(self._args.num_events))
             self._df_size = min(self._df_size, int(self._args.num_events))
-            self._df_count_increment = max(self._df_size//100, 10)
 
         # -- set up event counter (for progress reporting)
         self._df_count = self._df_bare.Count()
-        self._df_count_increment = 100000
-
+        self._progress_monitor = None
         if self._args.progress:
-            self._progress = tqdm(
-                unit=" events",
-                unit_scale=False,
-                dynamic_ncols=True,
-                desc="Event loop progress",
-                total=self._df_size,
-            )
-            def _progress_callback(count):
-                self._progress.update(self._df_count_increment)
-
-            _func_basename = "my_callback_py_f"
-            _func_idstring = hashlib.md5(hex(id(_progress_callback))).hexdigest()  # unique ID
-            _func_fullname = _func_basename + '_' + _func_idstring
-            _func_slotcallback_fullname = _func_basename + '_slot_' + _func_idstring
-
-            import ROOT
-
-            # black magic to obtain pointer to Python function in ROOT's interpreter
-            ROOT.gInterpreter.ProcessLine("#include <Python.h>")
-            ROOT.gInterpreter.ProcessLine("long long "+_func_fullname+"_addr = " + hex(id(_progress_callback)) + ";")
-            ROOT.gInterpreter.ProcessLine("PyObject* "+_func_fullname+" = reinterpret_cast<PyObject*>("+_func_fullname+"_addr);")
-            ROOT.gInterpreter.ProcessLine("Py_INCREF("+_func_fullname+");")  # prevent garbage collection
-
-            # define a thread-safe std::function for the progress callback and register it
-            ROOT.gInterpreter.ProcessLine("std::mutex partialResultMutex_"+_func_idstring+";")
-            ROOT.gInterpreter.ProcessLine(
-                "std::function<void(unsigned int, ULong64_t&)> "+_func_slotcallback_fullname+" = [](unsigned int /*slot*/, ULong64_t& count) { "
-                    "std::lock_guard<std::mutex> lock(partialResultMutex_"+_func_idstring+"); "
-                    "PyEval_CallObject("+_func_fullname+", Py_BuildValue(\"(i)\", count)); "
-                "};"
-            )
-            self._df_count.OnPartialResultSlot(self._df_count_increment, getattr(ROOT, _func_slotcallback_fullname))
+            self._progress_monitor = ProgressMonitor(self._df_count, total=self._df_size)
 
         # -- apply basic analysis selection
 
@@ -197,12 +376,12 @@ class LumberjackInterfaceBase(object):
         print("[INFO] Defining quantities...")
         # "main" quantities (with binning)
         _quantities =  dict(QUANTITIES['global'], **QUANTITIES.get(self._args.input_type, {}))
-        self._df = define_quantities(self._df, _quantities)
+        self._df = define_quantities(self._df, _quantities, compiled_expressions=self._compiled_expressions)
 
         # other quantities (only given as expressions, no binning)
-        self._df = apply_defines(self._df, DEFINES['global'])
+        self._df = apply_defines(self._df, DEFINES['global'], compiled_expressions=self._compiled_expressions)
         if self._args.input_type in DEFINES:
-            self._df = apply_defines(self._df, DEFINES[self._args.input_type])
+            self._df = apply_defines(self._df, DEFINES[self._args.input_type], compiled_expressions=self._compiled_expressions)
 
         if self._args.selections is not None:
             for _sel in self._args.selections:
@@ -210,7 +389,18 @@ class LumberjackInterfaceBase(object):
                     print("[ERROR] Applying global selection '{}'...".format(_sel))
                     raise ValueError("Unknown selection '{}'".format(_sel))
                 print("[INFO] Applying global selection '{}': {}".format(_sel, ' && '.join(SELECTIONS[_sel])))
-                self._df = apply_filters(self._df, SELECTIONS[_sel])
+                self._df = apply_filters(self._df, SELECTIONS[_sel], compiled_expressions=self._compiled_expressions)
+
+        # compile expressions for subsequent runs, if requested
+        if self._pending_expression_library is not None:
+            self._build_expression_library()
+
+    def _run_event_loop(self):
+        '''run the event loop for all objects booked on the data frame, reporting progress if requested'''
+        if self._progress_monitor is not None:
+            self._progress_monitor.run_event_loop()
+        else:
+            self._df_count.GetValue()
 
     def _cleanup_data_frame(self):
         pass  # what to do here?
@@ -273,19 +463,232 @@ class LumberjackInterfaceBase(object):
         return task_configs
 
 
-    def _run_tasks(self, task_configs):
+    def _get_splitting_specs(self, task_spec):
+        '''resolve the splitting keys of a task and create the combined splitting specification'''
+        SPLITTINGS = self._config.SPLITTINGS
 
-        from Karma.PostProcessing.Lumberjack import PostProcessor, Timer
+        _splittings_key_specs = task_spec.get('splittings')
+
+        _splitting_specs = {}
+        _splittings_keys = []
+        for _key_spec in _splittings_key_specs:
+            # support for slicing of individual splittings
+            # key can be '<name>' (no slicing) or '<name>[<splitting_value_1>,<splitting_value_2>,...]'
+            _key_spec_groups = re.match(self.RE_SPLITTING_KEY_SPEC, _key_spec).groups()
+            if _key_spec_groups[2] is None:
+                _key = _key_spec
+                # no slicing -> direct lookup
+                if _key not in SPLITTINGS:
+                    raise KeyError("[ERROR] Cannot find splitting for key '{}'".format(_key))
+                _splitting_specs[_key] = SPLITTINGS[_key]
+            else:
+                # slicing -> lookup and slice
+                _key = _key_spec_groups[0]
+                if _key not in SPLITTINGS:
+                    raise KeyError("[ERROR] Cannot find splitting for key '{}'".format(_key))
+
+                _subkeys = [_subkey.strip() for _subkey in _key_spec_groups[2].split(',')]
+                try:
+                    _splitting_specs[_key] = {_subkey: SPLITTINGS[_key][_subkey] for _subkey in _subkeys}
+                except KeyError as e:
+                    raise KeyError("[ERROR] Cannot find splitting for subkey '{}[{}]'".format(_key, e))
 
-        SPLITTINGS = self._config.SPLITTINGS
+            _splittings_keys.append(_key)  # store key w/o slicing syntax
 
-        task_configs = self._expand_subtasks(task_configs)
+        # create combined splitting specification out of the cross product
+        # of specified keys
+        _combined_splittings = {}
+        for _splitting_combination in product_dict(**_splitting_specs):
+            _splitting_dict = {}
+            for _key in _splittings_keys:
+                _splitting_dict.update(SPLITTINGS[_key][_splitting_combination[_key]])
+            _splitting_name = "/".join([_key + ':' + _splitting_combination[_key] for _key in _splittings_keys])
 
-        # -- run all queued tasks
+            _combined_splittings[_splitting_name] = _splitting_dict
+
+        return _splitting_specs, _combined_splittings
+
+    def _get_memory_multiplier(self):
+        '''number of copies of each booked object kept in memory (one per slot in each worker process)'''
+        return max(int(self._args.jobs), 1) * max(int(self._args.processes), 1)
+
+    def _check_memory_budget(self, memory_bytes, description):
+        '''check an estimated memory footprint against the budget. Returns `False` if the task should not be run.'''
+        if self._args.memory_budget is None or memory_bytes <= self._args.memory_budget * 1024**3:
+            return True
+
+        _message = "Estimated memory footprint of {} ({}) exceeds the memory budget of {} GB".format(
+            description, format_bytes(memory_bytes), self._args.memory_budget)
+        if self._args.dry_run:
+            print("[WARNING] {}!".format(_message))
+            return True
+
+        print("[ERROR] {}: refusing to run. Reduce the number of objects, subdivisions or threads, "
+              "or increase `--memory-budget`.".format(_message))
+        return False
+
+    def _set_up_post_processor(self, task_name, task_spec, check_memory_budget=True):
+        '''create a PostProcessor for a task on the current data frame. Returns `None` if nothing is requested
+        or if the estimated memory footprint of the task exceeds the budget.'''
+
+        from Karma.PostProcessing.Lumberjack import PostProcessor
+
+        _splitting_specs, _combined_splittings = self._get_splitting_specs(task_spec)
+
+        _hs = task_spec.get('histograms', None)
+        _ps = task_spec.get('profiles', None)
+
+        if _hs is None and _ps is None:
+            print("[ERROR] No `histograms` or `profiles` configured for task '{}': skipping...".format(task_name))
+            return None
+
+        if _hs:
+            print("[INFO] Requested histograms:")
+            for _h in _hs:
+                print("    - {}".format(_h))
+        else:
+            print("[INFO] Requested histograms: <none>")
+
+        if _ps:
+            print("[INFO] Requested profiles:")
+            for _p in _ps:
+                print("    - {}".format(_p))
+        else:
+            print("[INFO] Requested profiles: <none>")
+
+        print("[INFO] Setting up PostProcessor...")
+        _pp = PostProcessor(
+            data_frame=self._df,
+            splitting_spec=_combined_splittings,
+            quantities=task_spec['_quantities'],
+            split_mode=PostProcessor.SplitMode[self._args.split_mode],
+            splitting_key_specs=_splitting_specs,
+            compiled_expressions=self._compiled_expressions,
+        )
+
+        _n_obj = 0
+        if _hs is not None:
+            _pp.add_histograms(_hs)
+            _n_obj += len(_hs)
+        if _ps is not None:
+            _pp.add_profiles(_ps)
+            _n_obj += len(_ps)
+
+        _n_subdiv = np.prod([len(_splitting) for _splitting in _splitting_specs.values()])
+
+        print("[INFO] Running Task '{}':".format(task_name))
+        print("    - splitting RDataFrame by keys: {}".format(
+            ", ".join(["{} ({} subdivisions)".format(_key, len(_splitting)) for _key, _splitting in _splitting_specs.iteritems()])
+        ))
+        print("        -> total number of subdivisions: {}\n".format(_n_subdiv))
+        print("    - requested number of objects per subdivision: {}\n".format(_n_obj))
+        print("    -> total number of objects: {}\n".format(_n_obj * _n_subdiv))
+        print("    - output file: {}".format(task_spec['_filename']))
+
+        _cost = _pp.estimate_cost(n_slots=self._get_memory_multiplier())
+        self._cost_estimates[task_name] = _cost
+        print("    - estimated cost:")
+        print("        memory: {} ({} bins in {} objects, {} copies: {} thread(s) x {} process(es))".format(
+            format_bytes(_cost['memory_bytes']), _cost['n_bins'], _cost['n_objects'],
+            self._get_memory_multiplier(), self._args.jobs, self._args.processes))
+        print("        output file size (uncompressed): {}".format(format_bytes(_cost['output_bytes'])))
+        print("        filter evaluations per event: {} to {}".format(*_cost['filter_evaluations']))
+
+        if check_memory_budget and not self._check_memory_budget(_cost['memory_bytes'], "task '{}'".format(task_name)):
+            return None
+
+        return _pp
+
+    def _get_task_cache(self, task_spec):
+        '''create a record of the inputs and the resolved configuration of a task'''
+
+        from Karma.PostProcessing.Lumberjack import TaskCache
+
+        # hash input files only once
+        if self._input_files_hash is None:
+            self._input_files_hash = TaskCache.get_input_files_hash(resolve_input_files(self._args.input_files))
+
+        SELECTIONS = getattr(self._config, 'SELECTIONS', {})
+        DEFINES = getattr(self._config, 'DEFINES', {})
+
+        _, _combined_splittings = self._get_splitting_specs(task_spec)
+        _quantities = task_spec['_quantities']
+
+        # configuration shared by all objects
+        _task_hash = TaskCache.get_hash(dict(
+            tree=self._args.tree,
+            input_type=self._args.input_type,
+            num_events=int(self._args.num_events),
+            selections=[(_sel, SELECTIONS.get(_sel, None)) for _sel in (self._args.selections or [])],
+            defines=[DEFINES.get('global', None), DEFINES.get(self._args.input_type, None)],
+            quantity_expressions={_q_key: (_q.name, _q.expression) for _q_key, _q in _quantities.iteritems()},
+            splittings=_combined_splittings,
+            root_config={
+                _key: getattr(self._config, _key, None)
+                for _key in ('ROOT_INCLUDE_PATHS', 'ROOT_LOAD_EXTERNAL_LIBRARIES', 'ROOT_MACROS')
+            },
+        ))
+
+        # configuration of individual objects, including binnings of the quantities involved
+        _object_hashes = {}
+        for _object_type in TaskCache.OBJECT_TYPES:
+            _object_hashes[_object_type] = {
+                _spec: TaskCache.get_hash(dict(
+                    object_type=_object_type,
+                    spec=_spec,
+                    quantities=[_quantities[_token] for _token in re.split('[:@!]', _spec) if _token in _quantities],
+                ))
+                for _spec in (task_spec.get(_object_type, None) or [])
+            }
+
+        return TaskCache(
+            input_hash=self._input_files_hash,
+            task_hash=_task_hash,
+            object_hashes=_object_hashes,
+        )
+
+    def _queue_task_outputs(self, task_configs):
+        '''skip tasks with existing output files, create output directories and dump task configurations'''
+
+        from Karma.PostProcessing.Lumberjack import TaskCache
+
+        _queued_task_configs = []
         for _task_name, _task_spec in task_configs:
 
+            _output_exists = os.path.exists(_task_spec['_filename'])
+
+            if self._args.incremental:
+                # compare to cache of existing output to determine what needs to be (re)computed
+                _task_cache = self._get_task_cache(_task_spec)
+                self._task_caches[_task_name] = _task_cache
+                _existing_task_cache = TaskCache.load(_task_spec['_filename']) if _output_exists else None
+                if _output_exists and _existing_task_cache is None:
+                    # output not produced incrementally: only replace it if requested
+                    if not self._args.overwrite:
+                        print("[WARNING] Task output file exists: '{}', but its cache is missing and `--overwrite` "
+                              "not set. Skipping...".format(_task_spec['_filename']))
+                        continue
+                elif _output_exists:
+                    _outdated_objects = _task_cache.get_outdated_objects(_existing_task_cache)
+                    if _outdated_objects is None:
+                        print("[INFO] Task output file exists: '{}', but inputs or task configuration have "
+                              "changed. Rerunning task in full...".format(_task_spec['_filename']))
+                    elif not any(_outdated_objects.values()):
+                        print("[INFO] Task output file is up to date: '{}'. Skipping...".format(_task_spec['_filename']))
+                        continue
+                    else:
+                        print("[INFO] Task output file exists: '{}'. Running task only for new or "
+                              "changed objects: {}".format(_task_spec['_filename'], _outdated_objects))
+                        # write new objects to a separate file and merge into existing output later
+                        _partial_filename = _task_spec['_filename'].split('.')
+                        _partial_filename[-2] += '_partial'
+                        _task_spec = dict(_task_spec,
+                            _filename='.'.join(_partial_filename),
+                            _update_target=_task_spec['_filename'],
+                            **_outdated_objects)
+
             # skip task if output file exists
-            if os.path.exists(_task_spec['_filename']) and not self._args.overwrite:
+            elif _output_exists and not self._args.overwrite:
                 print("[INFO] Task output file exists: '{}' and `--overwrite` not set. Skipping...".format(_task_spec['_filename']))
                 continue
 
@@ -300,106 +703,221 @@ class LumberjackInterfaceBase(object):
                 with open(_yaml_dump_filename, 'w') as _f:
                     yaml.dump(_task_spec, _f, default_flow_style=False)
 
+            _queued_task_configs.append((_task_name, _task_spec))
+
+        return _queued_task_configs
+
+    def _run_tasks(self, task_configs):
+
+        if not self._args.input_files:
+            print("[ERROR] No input files given! Use `--input-files` to specify them.")
+            exit(1)
+
+        # each worker process would apply the event limit to its own input files
+        if int(self._args.num_events) >= 0 and int(self._args.processes) > 1:
+            print("[ERROR] `--num-events` cannot be used together with `--processes` > 1.")
+            exit(1)
+
+        task_configs = self._expand_subtasks(task_configs)
+        task_configs = self._queue_task_outputs(task_configs)
+
+        if not task_configs:
+            print("[INFO] No tasks left to run. Exiting...")
+            return
+
+        if int(self._args.processes) > 1:
+            self._run_tasks_sharded(task_configs)
+        else:
+            self._prepare_bare_data_frame()
+            self._run_task_configs(task_configs)
+            self._wait_for_expression_library()
+
+        if not self._args.dry_run:
+            self._finalize_task_outputs(task_configs)
+
+    def _finalize_task_outputs(self, task_configs):
+        '''merge partial outputs into existing output files, store task caches and write columnar outputs'''
+
+        from Karma.PostProcessing.Lumberjack import PostProcessor
+
+        for _task_name, _task_spec in task_configs:
+            _output_filename = _task_spec['_filename']
+            if not os.path.exists(_output_filename):
+                continue
+
+            _update_target = _task_spec.get('_update_target', None)
+            if _update_target is not None:
+                print("[INFO] Merging new objects for task '{}' into existing output file '{}'...".format(_task_name, _update_target))
+                PostProcessor.update_output_file(_update_target, _output_filename)
+                os.remove(_output_filename)
+                _output_filename = _update_target
+
+            _task_cache = self._task_caches.get(_task_name, None)
+            if _task_cache is not None:
+                _task_cache.save(_output_filename)
+
+            # columnar outputs of merged files have to be read back from the merged file
+            if self._args.columnar_output is not None and self._get_direct_columnar_filename(_task_spec) is None:
+                _columnar_filename = self._get_columnar_filename(_output_filename)
+                print("[INFO] Writing columnar output for task '{}' to '{}'...".format(_task_name, _columnar_filename))
+                PostProcessor.write_columnar_output_file(_output_filename, _columnar_filename)
+
+    def _get_columnar_filename(self, output_filename):
+        '''return the path of the columnar store for an output file'''
+        return ".".join(output_filename.split('.')[:-1]) + {'npy': '_columnar', 'hdf5': '.h5'}[self._args.columnar_output]
+
+    def _get_direct_columnar_filename(self, task_spec):
+        '''return the path of the columnar store to be written directly from the objects in memory,
+        or `None` if the output is merged from several files afterwards'''
+        if self._args.columnar_output is None or task_spec.get('_update_target', None) is not None or int(self._args.processes) > 1:
+            return None
+        return self._get_columnar_filename(task_spec['_filename'])
+
+    def _run_task_configs(self, task_configs):
+        '''run tasks on the bare data frame, which must have been prepared beforehand'''
+        if self._args.fused:
+            self._run_tasks_fused(task_configs)
+        else:
+            self._run_tasks_sequentially(task_configs)
+
+    @staticmethod
+    def _get_shard_filename(filename, i_shard, shard_dir=None):
+        '''add a shard index to a filename and (optionally) move it to a separate directory'''
+        _shard_filename = filename.split('.')
+        _shard_filename[-2] += '_shard' + str(i_shard)
+        _shard_filename = '.'.join(_shard_filename)
+        if shard_dir is not None:
+            _shard_filename = os.path.join(shard_dir, os.path.basename(_shard_filename))
+        return _shard_filename
+
+    def _run_shard(self, input_files, task_configs, build_expression_library=False):
+        '''run all tasks on a subset of the input files (in a worker process)'''
+        self._args.input_files = input_files
+        self._args.progress = False  # progress bars of different workers would overlap
+        self._prepare_bare_data_frame()
+        if not build_expression_library:
+            self._pending_expression_library = None  # only one worker needs to build the library
+        self._run_task_configs(task_configs)
+        self._wait_for_expression_library()
+
+    def _run_tasks_sharded(self, task_configs):
+        '''split the input files across several worker processes and merge their outputs'''
+
+        try:
+            _input_files = resolve_input_files(self._args.input_files)
+        except IOError as _e:
+            print("[ERROR] {}".format(_e))
+            exit(1)
+
+        _n_shards = min(int(self._args.processes), len(_input_files))
+        if _n_shards < int(self._args.processes):
+            print("[INFO] Only {} input file(s) available: using {} worker process(es) instead of {}.".format(
+                len(_input_files), _n_shards, self._args.processes))
+
+        # -- distribute files among shards, largest files first, balancing the total size
+        def _get_file_size(file_name):
+            return os.path.getsize(file_name) if os.path.exists(file_name) else 0
+
+        _shard_files = [[] for _ in range(_n_shards)]
+        _shard_sizes = [0] * _n_shards
+        for _file_name in sorted(_input_files, key=_get_file_size, reverse=True):
+            _i_shard = _shard_sizes.index(min(_shard_sizes))
+            _shard_files[_i_shard].append(_file_name)
+            _shard_sizes[_i_shard] += _get_file_size(_file_name)
+
+        # -- worker outputs go into a temporary directory next to the first output file
+        _shard_dir = tempfile.mkdtemp(
+            prefix='.lumberjack_shards_',
+            dir=os.path.dirname(task_configs[0][1]['_filename']) or '.')
+
+        _shard_task_configs = []
+        for _i_shard in range(_n_shards):
+            _shard_task_configs.append([
+                (_task_name, dict(_task_spec,
+                    _filename=self._get_shard_filename(_task_spec['_filename'], _i_shard, shard_dir=_shard_dir),
+                    _log_filename=(self._get_shard_filename(_task_spec['_log_filename'], _i_shard)
+                                   if _task_spec.get('_log_filename', None) is not None else None),
+                ))
+                for _task_name, _task_spec in task_configs
+            ])
+
+        # -- run workers
+        print("[INFO] Running tasks in {} worker processes...".format(_n_shards))
+        _workers = []
+        for _i_shard in range(_n_shards):
+            _worker = multiprocessing.Process(
+                target=self._run_shard,
+                args=(_shard_files[_i_shard], _shard_task_configs[_i_shard], _i_shard == 0),
+                name="lumberjack_shard_{}".format(_i_shard),
+            )
+            _worker.start()
+            _workers.append(_worker)
+
+        for _worker in _workers:
+            _worker.join()
+
+        _failed_workers = [_worker.name for _worker in _workers if _worker.exitcode != 0]
+        if _failed_workers:
+            print("[ERROR] Worker process(es) failed: {}. Partial outputs kept in '{}'.".format(
+                ", ".join(_failed_workers), _shard_dir))
+            exit(1)
+
+        if self._args.dry_run:
+            shutil.rmtree(_shard_dir)
+            return
+
+        # -- merge worker outputs (keeps the directory layout of the output files)
+        import ROOT
+
+        for _i_task, (_task_name, _task_spec) in enumerate(task_configs):
+            _shard_output_files = [
+                _shard_task_configs[_i_shard][_i_task][1]['_filename']
+                for _i_shard in range(_n_shards)
+            ]
+            _shard_output_files = [_f for _f in _shard_output_files if os.path.exists(_f)]
+            if not _shard_output_files:
+                print("[WARNING] No worker outputs found for task '{}'. No file written.".format(_task_name))
+                continue
+
+            print("[INFO] Merging {} worker output(s) for task '{}' into '{}'...".format(
+                len(_shard_output_files), _task_name, _task_spec['_filename']))
+            _merger = ROOT.TFileMerger(False)
+            _merger.OutputFile(_task_spec['_filename'], "RECREATE")
+            for _shard_output_file in _shard_output_files:
+                _merger.AddFile(_shard_output_file)
+            if not _merger.Merge():
+                print("[ERROR] Merging worker outputs for task '{}' failed. Partial outputs kept in '{}'.".format(
+                    _task_name, _shard_dir))
+                exit(1)
+
+        shutil.rmtree(_shard_dir)
+
+    def _run_tasks_sequentially(self, task_configs):
+        '''run each task in its own event loop'''
+
+        from Karma.PostProcessing.Lumberjack import Timer
+
+        # -- run all queued tasks
+        for _task_name, _task_spec in task_configs:
+
             with log_stdout_to_file(_task_spec['_log_filename']):
                 print("[INFO] Running task '{}'...".format(_task_name))
 
                 # apply defines, basic selection, etc.
                 self._prepare_data_frame()
 
-                _splittings_key_specs = _task_spec.get('splittings')
-
-                _splitting_specs = {}
-                _splittings_keys = []
-                for _key_spec in _splittings_key_specs:
-                    # support for slicing of individual splittings
-                    # key can be '<name>' (no slicing) or '<name>[<splitting_value_1>,<splitting_value_2>,...]'
-                    _key_spec_groups = re.match(self.RE_SPLITTING_KEY_SPEC, _key_spec).groups()
-                    if _key_spec_groups[2] is None:
-                        _key = _key_spec
-                        # no slicing -> direct lookup
-                        if _key not in SPLITTINGS:
-                            raise KeyError("[ERROR] Cannot find splitting for key '{}'".format(_key))
-                        _splitting_specs[_key] = SPLITTINGS[_key]
-                    else:
-                        # slicing -> lookup and slice
-                        _key = _key_spec_groups[0]
-                        if _key not in SPLITTINGS:
-                            raise KeyError("[ERROR] Cannot find splitting for key '{}'".format(_key))
-
-                        _subkeys = [_subkey.strip() for _subkey in _key_spec_groups[2].split(',')]
-                        try:
-                            _splitting_specs[_key] = {_subkey: SPLITTINGS[_key][_subkey] for _subkey in _subkeys}
-                        except KeyError as e:
-                            raise KeyError("[ERROR] Cannot find splitting for subkey '{}[{}]'".format(_key, e))
-
-                    _splittings_keys.append(_key)  # store key w/o slicing syntax
-
-                # create combined splitting specification out of the cross product
-                # of specified keys
-                _combined_splittings = {}
-                for _splitting_combination in product_dict(**_splitting_specs):
-                    _splitting_dict = {}
-                    for _key in _splittings_keys:
-                        _splitting_dict.update(SPLITTINGS[_key][_splitting_combination[_key]])
-                    _splitting_name = "/".join([_key + ':' + _splitting_combination[_key] for _key in _splittings_keys])
-
-                    _combined_splittings[_splitting_name] = _splitting_dict
-
-                _hs = _task_spec.get('histograms', None)
-                _ps = _task_spec.get('profiles', None)
-
-                if _hs is None and _ps is None:
-                    print("[ERROR] No `histograms` or `profiles` configured for task '{}': skipping...".format(_task_name))
+                _pp = self._set_up_post_processor(_task_name, _task_spec)
+                if _pp is None:
                     continue
 
-
-                if _hs:
-                    print("[INFO] Requested histograms:")
-                    for _h in _hs:
-                        print("    - {}".format(_h))
-                else:
-                    print("[INFO] Requested histograms: <none>")
-
-                if _ps:
-                    print("[INFO] Requested profiles:")
-                    for _p in _ps:
-                        print("    - {}".format(_p))
-                else:
-                    print("[INFO] Requested profiles: <none>")
-
-                print("[INFO] Setting up PostProcessor...")
-                _pp = PostProcessor(
-                    data_frame=self._df,
-                    splitting_spec=_combined_splittings,
-                    quantities=_task_spec['_quantities'],
-                )
-
-                _n_obj = 0
-                if _hs is not None:
-                    _pp.add_histograms(_hs)
-                    _n_obj += len(_hs)
-                if _ps is not None:
-                    _pp.add_profiles(_ps)
-                    _n_obj += len(_ps)
-
-                _n_subdiv = np.prod([len(_splitting) for _splitting in _splitting_specs.values()])
-
-                print("[INFO] Running Task '{}':".format(_task_name))
-                print("    - splitting RDataFrame by keys: {}".format(
-                    ", ".join(["{} ({} subdivisions)".format(_key, len(_splitting)) for _key, _splitting in _splitting_specs.iteritems()])
-                ))
-                print("        -> total number of subdivisions: {}\n".format(_n_subdiv))
-                print("    - requested number of objects per subdivision: {}\n".format(_n_obj))
-                print("    -> total number of objects: {}\n".format(_n_obj * _n_subdiv))
-                print("    - output file: {}".format(_task_spec['_filename']))
-
                 # run PostProcessor and time execution
                 with Timer(_task_name) as _t:
                     if self._args.dry_run:
                         print("[INFO] `--dry-run` has been specified: not running task '{}'".format(_task_name))
-                        time.sleep(0.1)
                     else:
-                        _pp.run(output_file_path=_task_spec['_filename'])
+                        _pp.book()
+                        self._run_event_loop()
+                        _pp.write(output_file_path=_task_spec['_filename'], columnar_file_path=self._get_direct_columnar_filename(_task_spec))
 
                 # print report
                 if not self._args.dry_run:
@@ -409,6 +927,67 @@ class LumberjackInterfaceBase(object):
                 print("[INFO] Cleaning up after task '{}'...".format(_task_name))
                 self._cleanup_data_frame()
 
+    def _run_tasks_fused(self, task_configs):
+        '''book the objects for all tasks on a single data frame and run one event loop for all of them'''
+
+        from Karma.PostProcessing.Lumberjack import Timer
+
+        # apply defines, basic selection, etc. (once for all tasks)
+        self._prepare_data_frame()
+
+        # -- set up all queued tasks
+        _booked_tasks = []
+        for _task_name, _task_spec in task_configs:
+            with log_stdout_to_file(_task_spec['_log_filename']):
+                print("[INFO] Setting up task '{}' (fused mode)...".format(_task_name))
+
+                _pp = self._set_up_post_processor(_task_name, _task_spec, check_memory_budget=False)
+                if _pp is None:
+                    continue
+
+            _booked_tasks.append((_task_name, _task_spec, _pp))
+
+        if not _booked_tasks:
+            print("[INFO] No tasks booked. Exiting...")
+            return
+
+        # -- objects of all tasks are in memory at the same time
+        _total_memory_bytes = sum([self._cost_estimates[_task_name]['memory_bytes'] for _task_name, _, _ in _booked_tasks])
+        print("[INFO] Estimated total memory footprint of fused tasks: {}".format(format_bytes(_total_memory_bytes)))
+        if not self._check_memory_budget(_total_memory_bytes, "fused tasks"):
+            return
+
+        # -- book objects for all tasks
+        if not self._args.dry_run:
+            for _task_name, _task_spec, _pp in _booked_tasks:
+                with log_stdout_to_file(_task_spec['_log_filename'], mode='a'):
+                    print("[INFO] Booking objects for task '{}' (fused mode)...".format(_task_name))
+                    _pp.book()
+
+        # -- run the shared event loop and write out the results of each task
+        print("[INFO] Running shared event loop for tasks: {}".format(
+            ", ".join([_task_name for _task_name, _, _ in _booked_tasks])))
+        with Timer("fused event loop") as _t:
+            if not self._args.dry_run:
+                self._run_event_loop()
+
+            for _task_name, _task_spec, _pp in _booked_tasks:
+                if self._args.dry_run:
+                    print("[INFO] `--dry-run` has been specified: not running task '{}'".format(_task_name))
+                    continue
+
+                with log_stdout_to_file(_task_spec['_log_filename'], mode='a'):
+                    print("[INFO] Writing output for task '{}'...".format(_task_name))
+                    _pp.write(output_file_path=_task_spec['_filename'], columnar_file_path=self._get_direct_columnar_filename(_task_spec))
+
+        # print report
+        if not self._args.dry_run:
+            print("[INFO] Processed a total of {} events.".format(self._df_count.GetValue()))
+        _t.report()
+
+        print("[INFO] Cleaning up after fused tasks...")
+        self._cleanup_data_frame()
+
 
     # -- subcommand methods
 
@@ -436,7 +1015,6 @@ class LumberjackInterfaceBase(object):
         )
         _tasks = [("Freestyle", _task_spec)]
 
-        self._prepare_bare_data_frame()
         self._run_tasks(_tasks)
 
 
@@ -471,10 +1049,95 @@ class LumberjackInterfaceBase(object):
             print("[INFO] No tasks in queue. Exiting...")
             exit(1)
 
-        self._prepare_bare_data_frame()
         self._run_tasks(_tasks)
 
 
+    def _subcommand_rebin(self):
+
+        import itertools
+        from Karma.PostProcessing.Lumberjack import PostProcessor, rebin_output_file
+
+        QUANTITIES = self._config.QUANTITIES
+        TASKS = self._config.TASKS
+
+        # exit if output filename exists
+        if os.path.exists(self._args.output_file) and not self._args.overwrite:
+            print("[INFO] Output file exists: '{}' and `--overwrite` not set. Exiting...".format(self._args.output_file))
+            exit(1)
+
+        _task_spec = dict(TASKS[self._args.TASK_NAME],
+            _quantities=dict(QUANTITIES['global'], **QUANTITIES.get(self._args.input_type, {})),
+        )
+
+        # ignore subtask syntax: objects of all subtasks are looked up in the same file
+        _task_spec['splittings'] = [_key_spec.split('@', 1)[0] for _key_spec in _task_spec['splittings']]
+        _splitting_specs, _ = self._get_splitting_specs(_task_spec)
+        _splitting_keys = [re.match(self.RE_SPLITTING_KEY_SPEC, _key_spec).groups()[0] for _key_spec in _task_spec['splittings']]
+
+        # -- determine the subdivisions to merge for each splitting key
+        _merges = {}
+        for _merge_spec in (self._args.merge_splittings or []):
+            try:
+                _key, _merge_spec = _merge_spec.split(':', 1)
+                _new_value, _old_values = _merge_spec.split('=', 1)
+            except ValueError:
+                print("[ERROR] Invalid splitting merge specification '{}': expected 'KEY:NEW_VALUE=VALUE1,VALUE2,...'".format(_merge_spec))
+                exit(1)
+            _old_values = [_old_value.strip() for _old_value in _old_values.split(',')]
+            if _key not in _splitting_specs:
+                print("[ERROR] Splitting key '{}' is not used by task '{}'".format(_key, self._args.TASK_NAME))
+                exit(1)
+            for _old_value in _old_values:
+                if _old_value not in _splitting_specs[_key]:
+                    print("[ERROR] Unknown subdivision '{}' for splitting key '{}'".format(_old_value, _key))
+                    exit(1)
+            _merges.setdefault(_key, []).append((_new_value, _old_values))
+
+        _key_targets = {}  # list of tuples (new_value, old_values) for each splitting key
+        for _key in _splitting_keys:
+            _key_targets[_key] = list(_merges.get(_key, []))
+            _merged_values = set([_value for _, _old_values in _key_targets[_key] for _value in _old_values])
+            for _value in sorted(_splitting_specs[_key]):
+                if _value not in _merged_values:
+                    _key_targets[_key].append((_value, [_value]))
+
+        # -- determine the source objects and the target binning of each requested object
+        _pp = PostProcessor(
+            data_frame=None,
+            splitting_spec={},
+            quantities=_task_spec['_quantities'],
+        )
+        _pp.add_histograms(_task_spec.get('histograms', None) or [])
+        _pp.add_profiles(_task_spec.get('profiles', None) or [])
+
+        _object_requests = []
+        for _targets in itertools.product(*[_key_targets[_key] for _key in _splitting_keys]):
+            _target_split_dict = {_key: _new_value for _key, (_new_value, _) in zip(_splitting_keys, _targets)}
+            _target_dir = "/".join([_new_value for _new_value, _ in _targets])
+            _source_dirs = ["/".join(_old_values) for _old_values in itertools.product(*[_old_values for _, _old_values in _targets])]
+
+            for _obj_type, _vars_xyzt, _weight, _option_string in _pp._specs:
+                _obj_name, _subdirs, _axis_vars = PostProcessor._get_object_name_and_axes(_obj_type, _vars_xyzt, _weight, _option_string)
+                _subpath = "/".join(_subdirs + [_obj_name])
+                _object_requests.append((
+                    "{}/{}".format(_target_dir, _subpath),
+                    ["{}/{}".format(_source_dir, _subpath) for _source_dir in _source_dirs],
+                    [_pp._get_quantity_binning(quantity_name=_var, split_dict=_target_split_dict) for _var in _axis_vars],
+                ))
+
+        # -- rebin/merge and report objects which require rerunning the task
+        print("[INFO] Rebinning/merging {} object(s) from '{}' into '{}'...".format(
+            len(_object_requests), self._args.TASK_OUTPUT_FILE, self._args.output_file))
+        _failed_requests = rebin_output_file(self._args.TASK_OUTPUT_FILE, self._args.output_file, _object_requests)
+
+        print("[INFO] Wrote {} object(s) to '{}'.".format(len(_object_requests) - len(_failed_requests), self._args.output_file))
+        if _failed_requests:
+            print("[WARNING] {} object(s) cannot be obtained from the existing output and require a full rerun "
+                  "of task '{}':".format(len(_failed_requests), self._args.TASK_NAME))
+            for _target_path, _reason in _failed_requests:
+                print("    - {}: {}".format(_target_path, _reason))
+
+
     # -- public API
 
     def run(self):
@@ -485,6 +1148,9 @@ class LumberjackInterfaceBase(object):
         elif self._args.subparser_name == 'freestyle':
             self._subcommand_freestyle()
 
+        elif self._args.subparser_name == 'rebin':
+            self._subcommand_rebin()
+
         else:
             raise ValueError("Unknown operation '{}'! Exiting...".format(_args.subparser_name))
 
@@ -563,19 +1229,41 @@ class LumberjackCLI(LumberjackInterfaceBase):
             help="Name of the analysis configuration to load (must have a configuration module under 'Lumberjack/cfg/ANALYSIS_NAME')",
             required=True,
             choices=_available_analysis_configs.keys())
-        _required_args.add_argument('-i', '--input-file', metavar='FILE', type=str, help='Input file', required=True)
+        _required_args.add_argument('-i', '--input-file', '--input-files', metavar='FILE', type=str, dest='input_files',
+                                    help="Input file. Can be a path, a glob pattern or a text file ending in '.txt' "
+                                         "or '.list' which contains one path or pattern per line. Can be given several times "
+                                         "for several input files. Not needed for subcommand 'rebin'", action='append')
         _required_args.add_argument('--selections', metavar='SELECTION', help='Specification of event selection cuts', nargs='+')
 
         _optional_args = _top_parser.add_argument_group('optional arguments', '')
         _optional_args.add_argument('-h', '--help', action=self.__class__._LumberjackCLIHelpAction, help="Display help and exit")
         _optional_args.add_argument('-t', '--tree', metavar='TREE', help="Name of the TTree containng the ntuple (default: 'Events')", default='Events')
         _optional_args.add_argument('-j', '--jobs', help="Number of jobs (threads) to use with EnableImplicitMT (default: 1)", default=1)
-        _optional_args.add_argument('-n', '--num-events', help="Number of events to process. Incompatible with multithreading. Use 0 or negative for all (default)", default=-1)
-        _optional_args.add_argument('--dry-run', help="Set up post-processing tasks, but do not execute", action='store_true')
+        _optional_args.add_argument('-p', '--processes', help="Number of worker processes. The input files are distributed among the workers "
+                                    "and their outputs are merged at the end (default: 1)", default=1)
+        _optional_args.add_argument('-n', '--num-events', help="Number of events to process. Incompatible with multithreading and `--processes`. Use 0 or negative for all (default)", default=-1)
+        _optional_args.add_argument('--dry-run', help="Set up post-processing tasks and estimate their cost, but do not execute", action='store_true')
+        _optional_args.add_argument('--memory-budget', metavar='GB', type=float, help="Refuse to run tasks for which the estimated memory "
+                                    "footprint of the booked objects exceeds this many GB (only warn in dry runs). "
+                                    "Default: $LUMBERJACK_MEMORY_BUDGET_GB, if set", default=os.getenv('LUMBERJACK_MEMORY_BUDGET_GB') or None)
         _optional_args.add_argument('--overwrite', help="Overwrite output file, if it exists.", action='store_true')
+        _optional_args.add_argument('--incremental', help="Record the inputs and configuration of each task next to its output file. "
+                                    "If the output file exists, only rerun the task if these have changed, and only for new or changed objects, "
+                                    "if possible. Output files without a cache are only replaced if `--overwrite` is given.", action='store_true')
         _optional_args.add_argument('--log', help="Whether to output a log file.", action="store_true")
         _optional_args.add_argument('--dump-yaml', help="Whether to dump the task configuration as a YAML file.", action="store_true")
         _optional_args.add_argument('--progress', help="Whether to show a progress bar.", action="store_true")
+        _optional_args.add_argument('--split-mode', help="How to split the data frame into subdivisions: 'filter' applies one chain of filters "
+                                    "per subdivision, 'index' computes one split index per splitting key (default: 'filter')", choices=('filter', 'index'), default='filter')
+        _optional_args.add_argument('--fused', help="Book the objects of all tasks on a single data frame and fill them in one shared event loop.", action="store_true")
+        _optional_args.add_argument('--columnar-output', help="Also write the contents of each output file as NumPy arrays: to a directory "
+                                    "of '.npy' files named like the output file with the suffix '_columnar' (format 'npy'), or to a file with "
+                                    "the extension '.h5' (format 'hdf5', requires h5py)", choices=('npy', 'hdf5'), default=None)
+        _optional_args.add_argument('--compile-expressions', help="Compile all `Define` and `Filter` expressions in the analysis config into a "
+                                    "shared library, which is cached and loaded in subsequent runs with the same configuration.", action="store_true")
+        _optional_args.add_argument('--jit-cache-dir', help="Directory in which to cache compiled expression libraries "
+                                    "(default: $LUMBERJACK_JIT_CACHE_DIR or '~/.cache/lumberjack')",
+                                    default=os.getenv('LUMBERJACK_JIT_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'lumberjack'))
 
         # retrieve analysis config (tasks, splittings, quantities, etc.)
         if _analysis_name is not None:
@@ -617,6 +1305,14 @@ class LumberjackCLI(LumberjackInterfaceBase):
         _parsers['freestyle'].add_argument('--profiles', metavar='PROFILE', help='Specification of profiles', nargs='+')
         _parsers['freestyle'].add_argument('--output-file', metavar='OUTPUT', help="Name of the output file.", required=True)
 
+        # subcommand 'rebin' for obtaining objects with coarser binnings or merged splittings from an existing output file
+        _parsers['rebin'] = _subparsers.add_parser('rebin', help='Rebin objects and/or merge subdivisions in an existing task output file')
+        _parsers['rebin'].add_argument('TASK_NAME', type=str, help='Name of the task which produced the output file. Choices: {%(choices)s}', choices=TASKS, metavar='TASK')
+        _parsers['rebin'].add_argument('TASK_OUTPUT_FILE', type=str, help='Existing output file of the task.')
+        _parsers['rebin'].add_argument('--merge-splittings', metavar='KEY:NEW_VALUE=VALUE1,VALUE2', help="Subdivisions of a splitting key to merge "
+                                       "into a new subdivision. Unmerged subdivisions are kept as they are.", nargs='+')
+        _parsers['rebin'].add_argument('--output-file', metavar='OUTPUT', help="Name of the output file.", required=True)
+
         _args = _top_parser.parse_args()
 
         return _top_parser.parse_args(), _analysis_config
@@ -2,7 +2,6 @@ from __future__ import print_function
 
 import math
 import os
-import ROOT
 import six
 
 from copy import deepcopy
@@ -16,15 +15,8 @@ from matplotlib.ticker import LogFormatter
 from matplotlib.colors import LogNorm, Normalize
 
 
-from rootpy import asrootpy
-from rootpy.context import preserve_current_directory
-from rootpy.io import root_open, DoesNotExist, File
-from rootpy.plotting import Hist1D, Hist2D, Profile1D, Efficiency
-from rootpy.plotting.hist import _Hist, _Hist2D
-from rootpy.plotting.profile import _ProfileBase
-
-
 from .._input import InputROOT
+from .._root import ROOT, rootpy, rootpy_context, rootpy_io
 from .._colormaps import viridis
 
 from ._base import ContextValue, LiteralString, _ProcessorBase, _make_directory
@@ -32,6 +24,76 @@ from ._base import ContextValue, LiteralString, _ProcessorBase, _make_directory
 __all__ = ['AnalyzeProcessor']
 
 
+class _BufferedOutputFile(object):
+    '''an output ROOT file to which objects are written in one go when the file is flushed or closed'''
+
+    # ROOT compression algorithms, by name (see `ROOT::RCompressionSetting::EAlgorithm`)
+    _COMPRESSION_ALGORITHMS = dict(zlib=1, lzma=2, lz4=4, zstd=5)
+
+    def __init__(self, path, compression_level=None, compression_algorithm=None, buffer_size=None):
+        self._settings = (compression_level, compression_algorithm, buffer_size)
+        self._buffer_size = buffer_size or 0  # zero: ROOT default
+        self._objects = []
+        self._directories = {}
+
+        self._tfile = rootpy_io.File.Open(path, 'w')
+        if compression_algorithm is not None:
+            self._tfile.SetCompressionAlgorithm(self._COMPRESSION_ALGORITHMS.get(compression_algorithm, compression_algorithm))
+        if compression_level is not None:
+            self._tfile.SetCompressionLevel(compression_level)
+
+    def check_settings(self, compression_level=None, compression_algorithm=None, buffer_size=None):
+        '''warn if any of the given settings differs from the one the file was opened with'''
+        for _name, _value, _file_value in zip(
+                ('compression_level', 'compression_algorithm', 'buffer_size'),
+                (compression_level, compression_algorithm, buffer_size),
+                self._settings):
+            if _value is not None and _value != _file_value:
+                print("[WARNING] Output file '{}' has already been opened with setting '{}' = {}: "
+                      "ignoring value {}!".format(self._tfile.GetName(), _name, _file_value, _value))
+
+    def add(self, path, obj):
+        '''add an object to be written to the path `path` inside the file'''
+        try:
+            # detach object from any directory: it is kept in the buffer until written out
+            obj.SetDirectory(0)
+        except AttributeError:
+            # skip objects without 'SetDirectory' method (e.g. TGraph)
+            pass
+        else:
+            # no directory deletes the object on closing: leave it to Python
+            ROOT.SetOwnership(obj, True)
+        self._objects.append((os.path.dirname(path), os.path.basename(path), obj))
+
+    def _get_directory(self, dirname):
+        '''return a directory inside the file, creating it if needed'''
+        try:
+            return self._directories[dirname]
+        except KeyError:
+            pass
+
+        try:
+            _dir = self._tfile.GetDirectory(dirname)
+        except rootpy_io.DoesNotExist:
+            _dir = self._tfile.mkdir(dirname, recurse=True)
+
+        self._directories[dirname] = _dir
+        return _dir
+
+    def flush(self):
+        '''write out all buffered objects, sorted by path'''
+        with rootpy_context.preserve_current_directory():
+            # stable sort: objects written several times to the same path keep their order
+            for _dirname, _basename, _obj in sorted(self._objects, key=lambda _entry: _entry[:2]):
+                self._get_directory(_dirname).WriteTObject(_obj, _basename, '', self._buffer_size)
+        self._objects = []
+
+    def close(self):
+        '''write out all buffered objects and close the file'''
+        self.flush()
+        self._tfile.Close()
+
+
 
 class AnalyzeProcessor(_ProcessorBase):
     """Processor for analyzing objects from ROOT files.
@@ -43,6 +105,7 @@ class AnalyzeProcessor(_ProcessorBase):
 
     CONFIG_KEY_FOR_TEMPLATES = "tasks"
     SUBKEYS_FOR_CONTEXT_REPLACING = ["subtasks"]
+    SUBKEY_FOR_EXPRESSIONS = "subtasks"
     CONFIG_KEY_FOR_CONTEXTS = "expansions"
 
     _CONFIG_KEYS_ROOT_OBJECT_METHODS = dict(
@@ -57,6 +120,9 @@ class AnalyzeProcessor(_ProcessorBase):
         ),
     )
 
+    # task configuration keys passed on to the output file (see `_BufferedOutputFile`)
+    _CONFIG_KEYS_OUTPUT_FILE_SETTINGS = ('compression_level', 'compression_algorithm', 'buffer_size')
+
     def __init__(self, config, output_folder):
         super(AnalyzeProcessor, self).__init__(config, output_folder)
 
@@ -71,38 +137,38 @@ class AnalyzeProcessor(_ProcessorBase):
             _input_controller=[self._input_controller]
         )
 
-    def _get_file(self, filename):
+    def _get_file(self, filename, config=None):
+        _settings = {_k: config.get(_k, None) for _k in self._CONFIG_KEYS_OUTPUT_FILE_SETTINGS} if config is not None else {}
         if filename not in self._files:
             _fullpath = os.path.join(self._output_folder, filename)
             _make_directory(os.path.dirname(_fullpath))
-            self._files[filename] = File.Open(_fullpath, 'w')
+            self._files[filename] = _BufferedOutputFile(_fullpath, **_settings)
+        elif _settings:
+            self._files[filename].check_settings(**_settings)
         return self._files[filename]
 
 
     # -- actions
 
-    def _request(self, config):
-        '''request all objects encountered in all subplot expressions'''
-        for _subplot_cfg in config['subtasks']:
-            request_params = dict(self._global_request_params, **_subplot_cfg.get('request_params', {}))
-            self._input_controller._request_all_objects_in_expression(_subplot_cfg['expression'], **request_params)
-            #print('REQ', _subplot_cfg['expression'])
-
     def _process(self, config):
         '''process all tasks'''
 
-        _tfile = self._get_file(config['filename'])
+        _output_file = self._get_file(config['filename'], config)
 
-        with preserve_current_directory():
+        with rootpy_context.preserve_current_directory():
             for _subtask_config in config['subtasks']:
                 _expression = _subtask_config['expression']
                 _output_path = _subtask_config['output_path']
 
                 _basename = os.path.basename(_output_path)
-                _dirname = os.path.dirname(_output_path)
 
                 ROOT.gROOT.cd()
-                _plot_object = asrootpy(self._input_controller.get_expr(_expression).Clone(_basename))
+                _plot_object = self._input_controller.get_expr(_expression)
+                if hasattr(_plot_object, 'to_root'):
+                    # array-backed objects are converted to ROOT objects only for writing
+                    _plot_object = _plot_object.to_root(_basename)
+                else:
+                    _plot_object = rootpy.asrootpy(_plot_object.Clone(_basename))
 
                 # ROOT object customization (e.g. axis labels)
                 for _prop_name, _meth_dict in six.iteritems(self._CONFIG_KEYS_ROOT_OBJECT_METHODS):
@@ -110,29 +176,17 @@ class AnalyzeProcessor(_ProcessorBase):
                     if _prop_val is not None:
                         getattr(_plot_object, _meth_dict['method'])(_prop_val)
 
-                try:
-                    _dir = _tfile.GetDirectory(_dirname)
-                except DoesNotExist:
-                    _dir = _tfile.mkdir(_dirname, recurse=True)
-
-                _dir.cd()
-                try:
-                    _plot_object.SetDirectory(_dir)
-                except AttributeError:
-                    # skip objects without 'SetDirectory' method (e.g. TGraph)
-                    pass
-                _plot_object.Write()
+                # objects are written when the file is closed
+                _output_file.add(_output_path, _plot_object)
 
                 #print("{} -> {}".format(_expression, _output_path))
 
     def _close_files(self, config):
         '''close all files opened by expanded configs'''
         if config['filename'] in self._files:
-            _tfile = self._get_file(config['filename'])
-            _tfile.Close()
-            del self._files[config['filename']]
+            self._files.pop(config['filename']).close()
 
 
     # -- register action slots
 
-    _ACTIONS = [_request, _process, _close_files]
+    _ACTIONS = [_process, _close_files]
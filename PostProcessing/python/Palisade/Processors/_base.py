@@ -3,18 +3,23 @@ from __future__ import print_function
 import abc
 import ast
 import itertools
+import multiprocessing
+import numbers
 import os
 import six
+import string
 import warnings
-import ROOT
 
-from copy import deepcopy
+from copy import copy, deepcopy
 from tqdm import tqdm
 
 import numpy as np
 
-from .._input import InputROOT
-from .._lazy import LazyNodeBase, lazify, String
+from .._input import InputROOT, InputROOTFile
+from .._root import ROOT
+from .._lazy import (
+    LazyNodeBase, lazify, intern_nodes, evaluation_cache,
+    Lazy, Map, List, String, FormatString, If, Try, BinOp, Op, Call, Attribute)
 from .._colormaps import viridis
 
 __all__ = ['ContextValue', 'LiteralString', 'InputValue']
@@ -40,47 +45,124 @@ class ConfigurationError(Exception):
     pass
 
 
+# state of the current parallel run, inherited by the worker processes when forking
+_parallel_run_state = {}
+
+def _init_worker():
+    '''initialize a worker process: files opened by the parent process must not be shared'''
+    InputROOTFile.reset_file_handle_pools()
+
+def _run_context_in_worker(context_index):
+    '''run an action for a single expansion context in a worker process'''
+    _processor, _action_method, _expansion_contexts = _parallel_run_state['run']
+    with evaluation_cache():
+        _processor._run_with_context(_action_method, _expansion_contexts[context_index])
+    return context_index
+
+
+class _StringTemplate(object):
+    '''a string template filled using `str.format`, with the replacement fields parsed only once'''
+
+    # templates already parsed, by template string
+    _templates = {}
+
+    def __init__(self, template):
+        self.template = template
+        try:
+            self.field_names = self._get_field_names(template)
+        except ValueError:
+            # malformed template: error is raised when formatting
+            self.field_names = None
+
+        # templates without replacement fields always give the same string
+        self.constant = template.format() if self.field_names == frozenset() else None
+
+    @staticmethod
+    def _get_field_names(template):
+        '''return the names of the keyword arguments referenced by the replacement fields in a template'''
+        _field_names = set()
+        for _, _field_name, _format_spec, _ in string.Formatter().parse(template):
+            if _field_name is not None:
+                _field_names.add(_field_name.split('.', 1)[0].split('[', 1)[0])
+            if _format_spec:
+                # format specifications can contain nested replacement fields
+                _field_names.update(_StringTemplate._get_field_names(_format_spec))
+        return frozenset(_field_names)
+
+    @classmethod
+    def get(cls, template):
+        '''return the parsed template for a template string'''
+        try:
+            return cls._templates[template]
+        except KeyError:
+            _template = cls._templates[template] = cls(template)
+            return _template
+
+    def format(self, context):
+        '''fill the template with the values in `context`'''
+        if self.constant is not None:
+            return self.constant
+        return self.template.format(**context)
+
+
 class ContextValue(LazyNodeBase):
     """Configuration object. Is replaced by the value corresponding to the specification `spec`
     dispatched over the current context."""
 
     _fields = ('spec',)
 
+    # specifications already parsed, mapped to the sequence of keys to look up
+    _compiled_specs = {}
+
     def __init__(self, spec):
         LazyNodeBase.__init__(self, spec)
 
     @staticmethod
-    def _eval(node, context):
-        """Evaluate an AST node"""
+    def _get_keys(node):
+        """Return the sequence of keys to look up successively for an AST node"""
         if isinstance(node, ast.Str): # <string> : simple lookup
-            return context[node.s]
+            return [node.s]
 
         elif isinstance(node, ast.Name): # <identifier> : same treatment as string
-            return context[node.id]
+            return [node.id]
 
         elif isinstance(node, ast.Subscript):  # <left>[<right>]
 
             _lnode = node.value
-            _rnode = node.slice.value
+            _rnode = node.slice.value if isinstance(node.slice, ast.Index) else node.slice
 
-            _inner_ctx = ContextValue._eval(_lnode, context)
-            return ContextValue._eval(_rnode, _inner_ctx)
+            # right-hand side is looked up in the result of the left-hand side
+            return ContextValue._get_keys(_lnode) + ContextValue._get_keys(_rnode)
 
         else:
             raise TypeError(type(node).__name__)
 
+    @classmethod
+    def _compile_spec(cls, spec):
+        '''return the sequence of keys to look up for a specification, parsing it only once'''
+        try:
+            return cls._compiled_specs[spec]
+        except KeyError:
+            pass
+
+        _keys = tuple(cls._get_keys(ast.parse(spec, mode='eval').body))
+        cls._compiled_specs[spec] = _keys
+        return _keys
+
     def eval(self, context):
         # interpret path using AST and dispatch with context
         _spec = self._spec.eval(context)
         try:
-            return self._eval(ast.parse(_spec, mode='eval').body, context)
+            _value = context
+            for _key in self._compile_spec(_spec):
+                _value = _value[_key]
+            return _value
         except KeyError as e:
             raise ConfigurationError("Key '{}' not found when dispatching expression '{}' over context: {}".format(e.args[0], _spec, context))
         except TypeError as e:
             raise ConfigurationError("Unsupported node type '{}' encountered in expression '{}'.".format(e.args[0], _spec))
 
 
-
 class InputValue(LazyNodeBase):
     """Configuration object. It is replaced by an the result of evaluating
     `expression` as an expression involving input file objects. The expression
@@ -98,9 +180,12 @@ class InputValue(LazyNodeBase):
     def __init__(self, expression):
         LazyNodeBase.__init__(self, expression)
 
+    def get_expression(self, context):
+        """Return the expression, dispatched over the context `context`."""
+        return _StringTemplate.get(self._expression.eval()).format(context)
+
     def eval(self, context):
-        _expr = self._expression.eval().format(**context)
-        return context['_input_controller'].get_expr(_expr)
+        return context['_input_controller'].get_expr(self.get_expression(context))
 
 
 # deprecated: keep for backwards compatibility
@@ -124,8 +209,14 @@ class _ProcessorBase(object):
     SUBKEYS_FOR_CONTEXT_REPLACING = None
     CONFIG_KEY_FOR_TEMPLATES = None  # 'figures'
     CONFIG_KEY_FOR_CONTEXTS = None # 'expansions'
+    SUBKEY_FOR_EXPRESSIONS = None  # 'subplots'
 
     _ACTIONS = []
+    # actions which can be run for several expansion contexts in parallel
+    _PARALLEL_ACTIONS = []
+
+    # number of worker processes used by `run` if not given explicitly
+    _default_n_jobs = 1
 
     def __init__(self, config, output_folder):
         """Initialize the processor.
@@ -143,48 +234,245 @@ class _ProcessorBase(object):
 
 
     @staticmethod
-    def _resolve_context(var, context):
-        '''recursively replace string templates and ``LazyNodeBase`` with contextual values'''
-        if isinstance(var, dict):
-            # thread over dictionaries
-            for _k, _v in six.iteritems(var):
-                var[_k] = _ProcessorBase._resolve_context(_v, context)
-        elif isinstance(var, list):
-            # thread over lists
-            for _idx, _v in enumerate(var):
-                var[_idx] = _ProcessorBase._resolve_context(_v, context)
-        elif isinstance(var, str):
+    def _resolve_value(var, context):
+        '''replace a string template or ``LazyNodeBase`` with its contextual value'''
+        if isinstance(var, str):
             # replace within string using 'format'
             try:
-                return var.format(**context)
+                return _StringTemplate.get(var).format(context)
             except KeyError as e:
                 raise ConfigurationError("Key '{}' not found when dispatching expression '{}' over context: {}".format(e.args[0], var, context))
 
         elif isinstance(var, LazyNodeBase):
             return var.eval(context)
+
+        # direct passthrough: no replacement
+        return var
+
+    @staticmethod
+    def _resolve_context(var, context, resolve_value=None):
+        '''recursively replace string templates and ``LazyNodeBase`` with contextual values'''
+        if resolve_value is None:
+            resolve_value = _ProcessorBase._resolve_value
+
+        if isinstance(var, dict):
+            # thread over dictionaries
+            for _k, _v in six.iteritems(var):
+                var[_k] = _ProcessorBase._resolve_context(_v, context, resolve_value)
+        elif isinstance(var, list):
+            # thread over lists
+            for _idx, _v in enumerate(var):
+                var[_idx] = _ProcessorBase._resolve_context(_v, context, resolve_value)
         else:
-            # direct passthrough: no replacement
-            pass
+            return resolve_value(var, context)
 
         return var
 
+    @staticmethod
+    def _get_context_dependencies(var, memo):
+        '''return the context keys on which the resolved value of a configuration entry depends,
+        or `None` if these cannot be determined'''
+        if isinstance(var, str):
+            return _StringTemplate.get(var).field_names
+        elif not isinstance(var, LazyNodeBase):
+            return frozenset()
+
+        try:
+            return memo[id(var)][1]
+        except KeyError:
+            pass
+
+        _dependencies = None
+        _children = [var.__dict__.get('_' + _f) for _f in var._fields]
+        if isinstance(var, Lazy):
+            # contained value is returned as-is
+            _dependencies = frozenset()
+        elif isinstance(var, ContextValue):
+            if isinstance(var._spec, Lazy):
+                try:
+                    _dependencies = frozenset(ContextValue._compile_spec(var._spec.eval())[:1])
+                except (TypeError, SyntaxError):
+                    pass
+        elif isinstance(var, InputValue):
+            if isinstance(var._expression, Lazy):
+                _field_names = _StringTemplate.get(var._expression.eval()).field_names
+                if _field_names is not None:
+                    _dependencies = _field_names | {'_input_controller'}
+        elif isinstance(var, (Map, List, If, Try, BinOp, Op, Call, Attribute, FormatString, String)):
+            # node depends only on its children
+            _dependencies = frozenset()
+            for _child in _children:
+                for _node in (_child if isinstance(_child, list) else [_child]):
+                    _child_dependencies = (
+                        _ProcessorBase._get_context_dependencies(_node, memo)
+                        if isinstance(_node, LazyNodeBase) else frozenset())
+                    if _child_dependencies is None:
+                        _dependencies = None
+                        break
+                    _dependencies |= _child_dependencies
+                if _dependencies is None:
+                    break
+
+        # keep a reference to `var`, so that its `id` is not reused
+        memo[id(var)] = (var, _dependencies)
+        return _dependencies
+
+    @staticmethod
+    def _is_immutable(value):
+        '''whether a value is a string, number or `None`, or a tuple containing only these'''
+        if isinstance(value, tuple):
+            return all(_ProcessorBase._is_immutable(_v) for _v in value)
+        return value is None or isinstance(value, six.string_types + (numbers.Number,))
+
+    def _resolve_value_cached(self, var, context):
+        '''resolve a configuration entry, reusing the value from a previous context
+        if it does not depend on any context key which varies in this run'''
+        _invariant_values = getattr(self, '_invariant_values', None)
+        if _invariant_values is None:
+            return self._resolve_value(var, context)
+
+        try:
+            return _invariant_values[id(var)][1]
+        except KeyError:
+            pass
+
+        _value = self._resolve_value(var, context)
+
+        # only share immutable values between contexts: actions may modify other objects
+        if self._is_immutable(_value):
+            _dependencies = self._get_context_dependencies(var, self._context_dependencies)
+            if _dependencies is not None and not (_dependencies & self._varying_context_keys):
+                _invariant_values[id(var)] = (var, _value)
+
+        return _value
+
+    @staticmethod
+    def _find_input_values(var, visited=None):
+        '''return all ``InputValue`` nodes contained in `var`, including those inside other lazy nodes'''
+        if visited is None:
+            visited = set()
+        if id(var) in visited:
+            return []
+        visited.add(id(var))
+
+        if isinstance(var, InputValue):
+            return [var]
+        elif isinstance(var, dict):
+            _children = list(var.values())
+        elif isinstance(var, (list, tuple)):
+            _children = var
+        elif isinstance(var, LazyNodeBase):
+            _children = [var.__dict__.get('_' + _f) for _f in var._fields]
+        else:
+            return []
+
+        return [_input_value for _child in _children for _input_value in _ProcessorBase._find_input_values(_child, visited)]
+
+    def _get_input_expressions(self, template, context):
+        '''return tuples `(expression, request_params)` for all input expressions in a template, dispatched
+        over a context. The input expressions themselves are not evaluated.'''
+        _global_request_params = getattr(self, '_global_request_params', {})
+        _expressions = []
+
+        # expressions given explicitly (e.g. for subplots)
+        if self.SUBKEY_FOR_EXPRESSIONS is not None:
+            _expression_configs = template.get(self.SUBKEY_FOR_EXPRESSIONS, [])
+            if isinstance(_expression_configs, LazyNodeBase):
+                # the list of expressions may itself depend on the context
+                _expression_configs = self._resolve_value(_expression_configs, context)
+            for _expression_config in _expression_configs:
+                _expression = _ProcessorBase._resolve_context(_expression_config['expression'], context)
+                _request_params = _ProcessorBase._resolve_context(deepcopy(_expression_config.get('request_params', {})), context)
+                _expressions.append((_expression, dict(_global_request_params, **_request_params)))
+
+        # expressions contained in `InputValue` objects
+        for _input_value in self._find_input_values(template):
+            _expressions.append((_input_value.get_expression(context), {}))
+
+        return _expressions
+
+    def _prefetch(self, expansion_contexts):
+        '''request the objects needed for all templates in all expansion contexts and retrieve them in one go'''
+        _input_controller = getattr(self, '_input_controller', None)
+        if _input_controller is None:
+            return
+
+        # with a memory budget, objects for later contexts would be evicted before they are
+        # used: retrieve them for each context instead
+        if _input_controller._cache.max_bytes is not None:
+            return
+
+        for _context in expansion_contexts:
+            for _template in self._config[self.CONFIG_KEY_FOR_TEMPLATES]:
+                for _expression, _request_params in self._get_input_expressions(_template, _context):
+                    _input_controller._request_all_objects_in_expression(_expression, **_request_params)
+
+        _input_controller.process_requests()
+
+    def _compile_entry(self, var, resolve):
+        '''return a function which builds the value of a configuration entry for a context, or `None` if
+        the value from the template can be used as-is. Dictionaries and lists are copied, but only the
+        entries which differ from the template are replaced. If `resolve` is True, string templates and
+        ``LazyNodeBase`` objects are replaced with their contextual values.'''
+        if isinstance(var, (dict, list)):
+            _builders = [
+                (_k, _builder)
+                for _k, _builder in (
+                    (_k, self._compile_entry(_v, resolve))
+                    for _k, _v in (six.iteritems(var) if isinstance(var, dict) else enumerate(var)))
+                if _builder is not None
+            ]
+
+            def _build_container(context):
+                # containers are always copied: actions may modify them
+                _container = copy(var)
+                for _k, _builder in _builders:
+                    _container[_k] = _builder(context)
+                return _container
+
+            return _build_container
+
+        elif resolve and isinstance(var, (str, LazyNodeBase)):
+            if isinstance(var, str) and _StringTemplate.get(var).constant == var:
+                return None
+            return lambda context: self._resolve_value_cached(var, context)
+
+        return None
+
+    def _make_nested_resolver(self, var):
+        '''return a function which resolves a lazy node for a context, followed by its result'''
+        return lambda context: self._resolve_context(
+            self._resolve_value_cached(var, context), context, self._resolve_value_cached)
+
+    def _compile_template(self, template):
+        '''return a function which builds the configuration for a context from a template'''
+        _builders = []
+        for _k, _v in six.iteritems(template):
+            if _k in self.SUBKEYS_FOR_CONTEXT_REPLACING and isinstance(_v, LazyNodeBase):
+                # the contextual value may itself contain string templates and lazy nodes
+                _builder = self._make_nested_resolver(_v)
+            else:
+                # replace context in top-level keys and only in children of specific subkeys
+                _builder = self._compile_entry(_v, resolve=(
+                    isinstance(_v, (str, LazyNodeBase)) or _k in self.SUBKEYS_FOR_CONTEXT_REPLACING))
+            if _builder is not None:
+                _builders.append((_k, _builder))
+
+        def _build_config(context):
+            _config = copy(template)
+            for _k, _builder in _builders:
+                _config[_k] = _builder(context)
+            return _config
+
+        return _build_config
 
     def _run_with_context(self, action_method, context):
-        for _template in self._config[self.CONFIG_KEY_FOR_TEMPLATES]:
-            _config = deepcopy(_template)
-
-            # replace context in top-level keys
-            for _k, _v in six.iteritems(_config):
-                if isinstance(_v, str):
-                    _config[_k] = _v.format(**context)
-                elif isinstance(_v, LazyNodeBase):
-                    _config[_k] = _v.eval(context)
-
-            # replace context only in children of specific subkeys
-            for _subkey_for_context_replacing in self.SUBKEYS_FOR_CONTEXT_REPLACING:
-                if _subkey_for_context_replacing not in _config:
-                    continue
-                _config[_subkey_for_context_replacing] = _ProcessorBase._resolve_context(_config[_subkey_for_context_replacing], context)
+        _template_builders = getattr(self, '_template_builders', None)
+        if _template_builders is None:
+            _template_builders = [self._compile_template(_template) for _template in self._config[self.CONFIG_KEY_FOR_TEMPLATES]]
+
+        for _build_config in _template_builders:
+            _config = _build_config(context)
 
             try:
                 action_method(self, _config)
@@ -192,9 +480,38 @@ class _ProcessorBase(object):
                 print("{} encountered while processing job with config: {}".format(e.__class__.__name__, _config))
                 raise
 
+    def _run_parallel(self, action_method, expansion_contexts, n_jobs, show_progress):
+        '''run an action for each expansion context, distributing the contexts over `n_jobs` worker processes'''
+        # retrieve any outstanding requests before forking, so that the workers can share the objects
+        _input_controller = getattr(self, '_input_controller', None)
+        if _input_controller is not None:
+            _input_controller.process_requests()
+
+        # workers are forked, so that they inherit the processor (with the input objects)
+        _multiprocessing = multiprocessing.get_context('fork') if hasattr(multiprocessing, 'get_context') else multiprocessing
+        _parallel_run_state['run'] = (self, action_method, expansion_contexts)
+        _pool = _multiprocessing.Pool(processes=n_jobs, initializer=_init_worker)
+        try:
+            _results = _pool.imap_unordered(_run_context_in_worker, range(len(expansion_contexts)))
+            for _ in (tqdm(_results, total=len(expansion_contexts)) if show_progress else _results):
+                pass
+            _pool.close()
+        except:
+            _pool.terminate()
+            raise
+        finally:
+            _pool.join()
+            del _parallel_run_state['run']
+
     # -- public API
 
-    def run(self, show_progress=True):
+    @classmethod
+    def set_default_n_jobs(cls, n_jobs):
+        """Set the number of worker processes used by :py:meth:`run` for all processors if
+        `n_jobs` is not given explicitly. Called by ``palisade.py`` with the value of ``--jobs``."""
+        _ProcessorBase._default_n_jobs = n_jobs
+
+    def run(self, show_progress=True, n_jobs=None):
         """Run the processor.
 
         Parameters
@@ -202,17 +519,51 @@ class _ProcessorBase(object):
 
             show_progress : `bool`
                 if :py:const:`True`, a progress bar will be shown
+            n_jobs : `int`
+                number of worker processes over which the expansion contexts are distributed
+                for actions which support this (e.g. producing figures in the
+                :py:class:`~Palisade.PlotProcessor`). Objects requested from input files
+                are retrieved beforehand. If smaller than one, the number of CPUs is used.
+                If not given, the value set via :py:meth:`set_default_n_jobs` is used (default: 1).
         """
 
-        # Disable graphical output of ROOT
-        ROOT.gROOT.SetBatch(True)
+        # Disable graphical output of ROOT (once it is needed)
+        ROOT.on_import(lambda _root: _root.gROOT.SetBatch(True))
 
-        # -- run over cross product of expansion
+        if n_jobs is None:
+            n_jobs = self._default_n_jobs
+        if n_jobs < 1:
+            n_jobs = multiprocessing.cpu_count()
+
+        # merge identical lazy subtrees in all templates, so that they are evaluated only once per context
+        intern_nodes(self._config[self.CONFIG_KEY_FOR_TEMPLATES])
+
+        # request all input objects needed in any context and retrieve them (one pass per input file)
+        self._prefetch(list(product_dict(**self._config[self.CONFIG_KEY_FOR_CONTEXTS])))
+
+        # configuration entries which only depend on context keys with a single value are resolved only once
+        self._varying_context_keys = frozenset(
+            _k for _k, _v in six.iteritems(self._config[self.CONFIG_KEY_FOR_CONTEXTS]) if len(_v) > 1)
+        self._context_dependencies = {}
+        self._invariant_values = {}
 
-        # go through each configured action
-        for _action_method in self._ACTIONS:
-            # run the action once for each expansion context
-            _expansion_contexts = list(product_dict(**self._config[self.CONFIG_KEY_FOR_CONTEXTS]))
-            for _expansion_context in (tqdm(_expansion_contexts) if show_progress else _expansion_contexts):
-                self._run_with_context(_action_method, _expansion_context)
+        # configurations are built from the templates for each context, sharing all unchanged entries
+        self._template_builders = [self._compile_template(_template) for _template in self._config[self.CONFIG_KEY_FOR_TEMPLATES]]
 
+        # -- run over cross product of expansion
+
+        try:
+            # go through each configured action
+            for _action_method in self._ACTIONS:
+                # run the action once for each expansion context
+                _expansion_contexts = list(product_dict(**self._config[self.CONFIG_KEY_FOR_CONTEXTS]))
+                if n_jobs > 1 and _action_method in self._PARALLEL_ACTIONS:
+                    self._run_parallel(_action_method, _expansion_contexts, n_jobs, show_progress)
+                    continue
+                for _expansion_context in (tqdm(_expansion_contexts) if show_progress else _expansion_contexts):
+                    # results of lazy node evaluations are kept only until the context is done
+                    with evaluation_cache():
+                        self._run_with_context(_action_method, _expansion_context)
+        finally:
+            self._invariant_values = None
+            self._template_builders = None
@@ -1,6 +1,7 @@
 from __future__ import print_function
 
 import colorsys  # for rgb_to_hls
+import hashlib
 import math
 import os
 import six
@@ -19,11 +20,8 @@ from matplotlib.gridspec import GridSpec
 from matplotlib.ticker import LogFormatterSciNotation
 from matplotlib.colors import LogNorm, Normalize, colorConverter
 
-from rootpy.plotting import Hist1D, Hist2D, Profile1D, Efficiency, F1
-from rootpy.plotting.hist import _Hist, _Hist2D
-from rootpy.plotting.profile import _ProfileBase
-
-from .._input import InputROOT
+from .._input import InputROOT, PersistentCache
+from .._root import rootpy_plotting
 from .._colormaps import viridis
 
 from ._base import ContextValue, LiteralString, _ProcessorBase, _make_directory
@@ -72,6 +70,15 @@ class LogFormatterSciNotationForceSublabels(LogFormatterSciNotation):
         return _ret
 
 
+def _get_property_array(plot_object, property_name):
+    """retrieve values of a property (e.g. 'x', 'yerr') of a plot object as a NumPy array"""
+    _values = getattr(plot_object, property_name)()
+    if isinstance(_values, np.ndarray):
+        # array-backed objects: copy, since plot data may be modified in place
+        return np.array(_values)
+    return np.array(list(_values))
+
+
 def _plot_with_error_band(ax, *args, **kwargs):
     """display data as line. If `yerr` is given, an `y` +/- `yerr` error band is also drawn.
     You can use custom `_band_kwargs` to format the error band."""
@@ -181,6 +188,7 @@ class PlotProcessor(_ProcessorBase):
 
     CONFIG_KEY_FOR_TEMPLATES = "figures"
     SUBKEYS_FOR_CONTEXT_REPLACING = ["subplots", "pads", "texts"]
+    SUBKEY_FOR_EXPRESSIONS = "subplots"
     CONFIG_KEY_FOR_CONTEXTS = "expansions"
 
     _EXTERNAL_PLOT_METHODS = dict(
@@ -231,6 +239,9 @@ class PlotProcessor(_ProcessorBase):
         linestyle='--', color='gray', linewidth=1, zorder=-99
     )
 
+    # maximum number of released figures kept for reuse, for each figure layout
+    _MAX_POOLED_FIGURES_PER_LAYOUT = 1
+
 
     def __init__(self, config, output_folder):
         super(PlotProcessor, self).__init__(config, output_folder)
@@ -239,7 +250,11 @@ class PlotProcessor(_ProcessorBase):
             files_spec=self._config['input_files']
         )
         self._figures = {}
+        self._figure_axes = {}  # tuples `(layout_key, axes)` for each figure
+        self._figure_pool = {}  # released figures available for reuse, by layout
         self._global_request_params = self._config.get("global_request_params", {})
+        self._object_content_hashes = {}  # content hashes of input objects, by (file path, object path)
+        self._warned_unhashable_fingerprint = False
 
         # introduce pseudo-context for accessing input file content
         self._config[self.CONFIG_KEY_FOR_CONTEXTS].update(
@@ -253,6 +268,42 @@ class PlotProcessor(_ProcessorBase):
             self._figures[figure_name] = plt.figure(figsize=figsize)
         return self._figures[figure_name]
 
+    def _get_figure_and_axes(self, figure_name, gridspec, figsize=None):
+        '''return a figure and one `Axes` object per cell of `gridspec`, reusing a released figure with the same layout, if available'''
+        _layout_key = (
+            None if figsize is None else tuple(figsize),
+            gridspec.get_geometry(),
+            tuple(gridspec.get_height_ratios() or ()),
+            tuple(getattr(gridspec, _attr) for _attr in ('left', 'bottom', 'right', 'top', 'wspace', 'hspace')),
+        )
+        if figure_name not in self._figures:
+            _pooled_figures = self._figure_pool.get(_layout_key)
+            if _pooled_figures:
+                _fig, _axes = _pooled_figures.pop()
+                self._figures[figure_name] = _fig
+                self._figure_axes[figure_name] = (_layout_key, _axes)
+                return _fig, _axes
+
+        _fig = self._get_figure(figure_name, figsize=figsize)
+        _axes = [_fig.add_subplot(gridspec[_i_cell]) for _i_cell in range(gridspec.get_geometry()[0])]
+        self._figure_axes[figure_name] = (_layout_key, _axes)
+        return _fig, _axes
+
+    def _release_figure(self, figure_name):
+        '''clear a figure and keep it for reuse in a figure with the same layout, or close it if it cannot be reused'''
+        _fig = self._figures.pop(figure_name)
+        _layout_key, _axes = self._figure_axes.pop(figure_name)
+        _pooled_figures = self._figure_pool.setdefault(_layout_key, [])
+
+        # figures with additional elements (e.g. colorbars) are not reused
+        if len(_pooled_figures) >= self._MAX_POOLED_FIGURES_PER_LAYOUT or len(_fig.axes) != len(_axes) or _fig.texts or _fig.legends:
+            plt.close(_fig)
+            return
+
+        for _ax in _axes:
+            _ax.cla()
+        _pooled_figures.append((_fig, _axes))
+
     @staticmethod
     def _merge_legend_handles_labels(handles, labels):
         '''merge handles for identical labels'''
@@ -293,15 +344,46 @@ class PlotProcessor(_ProcessorBase):
         # return as lists
         return list(_hs), list(_ls)
 
-    # -- actions
+    def _get_object_content_hash(self, object_spec):
+        '''return a hash of the contents of an input object, computed once per run for each object'''
+        _file_nickname, _object_path = self._input_controller._get_file_nickname_and_obj_path(object_spec)
+        _key = (self._input_controller._file_nick_to_realpath.get(_file_nickname, _file_nickname), _object_path)
+        _content_hash = self._object_content_hashes.get(_key, None)
+        if _content_hash is None:
+            _hasher = hashlib.sha1()
+            PersistentCache._update_hash(_hasher, self._input_controller.get(object_spec))
+            _content_hash = self._object_content_hashes[_key] = _hasher.hexdigest()
+        return _content_hash
+
+    def _get_fingerprint(self, config):
+        '''return a fingerprint of a figure computed from its configuration and the contents of all input
+        objects referenced in its expressions, or `None` if it cannot be computed'''
+        _hasher = hashlib.sha1()
+        try:
+            PersistentCache._update_hash(_hasher, config)
+            for _subplot_cfg in config['subplots']:
+                for _object_spec in self._input_controller._compile_expr(_subplot_cfg['expression']).object_specs:
+                    PersistentCache._update_hash(_hasher, [_object_spec, self._get_object_content_hash(_object_spec)])
+        except TypeError as _e:
+            if not self._warned_unhashable_fingerprint:
+                print("[WARNING] Cannot compute fingerprint of figure '{}' ({}): figures with such configuration "
+                      "values or input objects are always replotted.".format(config.get('filename'), _e))
+                self._warned_unhashable_fingerprint = True
+            return None
+        return _hasher.hexdigest()
 
-    def _request(self, config):
-        '''request all objects encountered in all subplot expressions'''
-        for _subplot_cfg in config['subplots']:
-            request_params = dict(self._global_request_params, **_subplot_cfg.get('request_params', {}))
-            self._input_controller._request_all_objects_in_expression(_subplot_cfg['expression'], **request_params)
-            #print('REQ', _subplot_cfg['expression'])
+    @staticmethod
+    def _is_up_to_date(fingerprint, fingerprint_filename, output_filenames):
+        '''check if the output files exist and were produced from a figure with the same fingerprint'''
+        if fingerprint is None or not all(os.path.exists(_filename) for _filename in output_filenames):
+            return False
+        try:
+            with open(fingerprint_filename) as _fingerprint_file:
+                return _fingerprint_file.read().strip() == fingerprint
+        except IOError:
+            return False
 
+    # -- actions
 
     def _plot(self, config):
         '''plot all figures'''
@@ -311,6 +393,20 @@ class PlotProcessor(_ProcessorBase):
         self._input_controller.register_local('expressions', [_subplot_cfg['expression'] for _subplot_cfg in config['subplots']], override=True)
 
         _filename = os.path.join(self._output_folder, config['filename'])
+        _basename = '.'.join(_filename.split('.')[:-1])
+
+        # skip figure if it has been produced from the same configuration and inputs before
+        _incremental = config.pop('incremental', False)
+        if _incremental:
+            _fingerprint = self._get_fingerprint(config)
+            _fingerprint_filename = _basename + '.fingerprint'
+            _output_filenames = [_filename]
+            if config.get('dump_yaml', False):
+                _output_filenames.append(_basename + '.yml')
+            if config.get('text_output', False):
+                _output_filenames.append(_basename + '.txt')
+            if self._is_up_to_date(_fingerprint, _fingerprint_filename, _output_filenames):
+                return
 
         # prepare dict for YAML dump, if requested
         _dump_yaml = config.pop('dump_yaml', False)
@@ -326,7 +422,7 @@ class PlotProcessor(_ProcessorBase):
         # step 1: create figure and pads
 
         _figsize = config.pop('figsize', None)
-        _fig = self._get_figure(_filename, figsize=_figsize)
+        _keep_figure = config.pop('keep_figure', False)
 
         # obtain configuration of pads
         _pad_configs = config.get('pads', None)
@@ -342,9 +438,10 @@ class PlotProcessor(_ProcessorBase):
         _gridspec_kwargs.pop('height_ratios', None)   # ignore explicit user-provided `height_ratios`
         _gs = GridSpec(nrows=len(_pad_configs), ncols=1, height_ratios=_height_ratios, **_gridspec_kwargs)
 
-        # store `Axes` objects in pad configuration
-        for _i_pad, _pad_config in enumerate(_pad_configs):
-            _pad_config['axes'] = _fig.add_subplot(_gs[_i_pad])
+        # obtain figure (reused, if one with the same layout has been released) and store `Axes` objects in pad configuration
+        _fig, _axes = self._get_figure_and_axes(_filename, _gs, figsize=_figsize)
+        for _pad_config, _ax in zip(_pad_configs, _axes):
+            _pad_config['axes'] = _ax
 
         _stack_bottoms = _pad_config.setdefault('stack_bottoms', {})
         _bin_labels = _pad_config.setdefault('bin_labels', {})
@@ -384,7 +481,7 @@ class PlotProcessor(_ProcessorBase):
 
             # extract arrays for keys which could be masked by 'mask_zero_errors'
             _plot_data = {
-                _property_name : np.array(list(getattr(_plot_object, _property_name)()))
+                _property_name : _get_property_array(_plot_object, _property_name)
                 for _property_name in ('x', 'xerr', 'y', 'yerr', 'xwidth', 'efficiencies', 'errors')
                 if hasattr(_plot_object, _property_name)
             }
@@ -399,8 +496,11 @@ class PlotProcessor(_ProcessorBase):
                     _axis_nbins_method = getattr(_plot_object, "GetNbins{}".format(_axis.upper()))
                     _plot_data['{}binlabels'.format(_axis)] = [_root_obj_axis.GetBinLabel(_i_bin) for _i_bin in range(1, _axis_nbins_method() + 1)]
 
+            # rootpy objects can only exist if rootpy has been imported
+            _rootpy_imported = rootpy_plotting.imported
+
             # map fields for TEfficiency objects
-            if isinstance(_plot_object, Efficiency):
+            if _rootpy_imported and isinstance(_plot_object, rootpy_plotting.Efficiency):
                 _total_hist = _plot_object.total
                 _plot_data['x'] = np.array(list(_total_hist.x()))
                 _plot_data['xerr'] = np.array(list(_total_hist.xerr()))
@@ -408,7 +508,7 @@ class PlotProcessor(_ProcessorBase):
                 _plot_data['yerr'] = _plot_data.pop('errors', None)
 
             # map fields for TF1 objects
-            elif isinstance(_plot_object, F1):
+            elif _rootpy_imported and isinstance(_plot_object, rootpy_plotting.F1):
                 _xmin, _xmax = _plot_object.xaxis.get_xmin(), _plot_object.xaxis.get_xmax()
                 # compute support points (evenly-spaced)
                 _plot_data['x'] = np.linspace(_xmin, _xmax, 100)  # TODO: make configurable
@@ -428,7 +528,7 @@ class PlotProcessor(_ProcessorBase):
 
             # extract arrays for keys which cannot be masked
             _plot_data.update({
-                _property_name : np.array(list(getattr(_plot_object, _property_name)()))
+                _property_name : _get_property_array(_plot_object, _property_name)
                 for _property_name in ('xedges', 'yedges', 'z')
                 if hasattr(_plot_object, _property_name)
             })
@@ -767,19 +867,31 @@ class PlotProcessor(_ProcessorBase):
         # step 6: save figures
         _make_directory(os.path.dirname(_filename))
         _fig.savefig('{}'.format(_filename))
-        #plt.close(_fig)  # close figure to save memory
+
+        # release figure to save memory, unless requested otherwise
+        if not _keep_figure:
+            self._release_figure(_filename)
 
         # dump YAML to file, if requested
         if _dump_yaml:
             with open(_yaml_filename, 'w') as _yaml_file:
                 yaml.dump(_config_for_dump, _yaml_file)
 
+        # store fingerprint for skipping the figure in subsequent runs
+        if _incremental:
+            if _fingerprint is not None:
+                with open(_fingerprint_filename, 'w') as _fingerprint_file:
+                    _fingerprint_file.write(_fingerprint)
+            elif os.path.exists(_fingerprint_filename):
+                os.remove(_fingerprint_filename)
+
         # de-register all the locals after a plot is done
         # self._input_controller.clear_locals()
 
 
     # -- register action slots
-    _ACTIONS = [_request, _plot]
+    _ACTIONS = [_plot]
+    _PARALLEL_ACTIONS = [_plot]
 
     # -- additional public API
 
@@ -788,4 +900,9 @@ class PlotProcessor(_ProcessorBase):
 
         for _fign, _fig in six.iteritems(self._figures):
             plt.close(_fig)
+        for _pooled_figures in six.itervalues(self._figure_pool):
+            for _fig, _ in _pooled_figures:
+                plt.close(_fig)
         self._figures = {}
+        self._figure_axes = {}
+        self._figure_pool = {}
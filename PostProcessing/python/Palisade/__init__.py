@@ -1,5 +1,7 @@
 from ._ui import *
 from ._input import *
+from ._array_objects import *
+from ._columnar_store import *
 from ._lazy import *
 
 from .Processors import *
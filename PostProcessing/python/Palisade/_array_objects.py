@@ -0,0 +1,654 @@
+from __future__ import print_function
+
+import numbers
+import operator as op
+import numpy as np
+import uuid
+
+from array import array
+
+from ._root import ROOT, rootpy
+
+
+__all__ = ['ArrayHist', 'ArrayProfile', 'ArrayGraph', 'to_array_object', 'to_root_object']
+
+
+# NumPy types of histogram bin contents which can be read directly from the ROOT buffers
+_BUFFER_DTYPES = {'D': np.float64, 'F': np.float32}
+
+
+def _get_buffer_view(buffer, size, dtype):
+    '''return a NumPy array sharing memory with a C++ buffer'''
+    if hasattr(buffer, 'SetSize'):
+        buffer.SetSize(size)  # PyROOT
+    else:
+        buffer.reshape((size,))  # cppyy
+    return np.frombuffer(buffer, dtype=dtype, count=size)
+
+
+def _get_root_axes(tobject):
+    '''return the ROOT axes of a histogram'''
+    return (tobject.GetXaxis(), tobject.GetYaxis(), tobject.GetZaxis())[:tobject.GetDimension()]
+
+
+def _get_root_axis_edges(axis):
+    '''return the bin edges of a ROOT axis as a NumPy array'''
+    if axis.GetXbins().GetSize():
+        return np.array(_get_buffer_view(axis.GetXbins().GetArray(), axis.GetNbins() + 1, np.float64))
+    return np.linspace(axis.GetXmin(), axis.GetXmax(), axis.GetNbins() + 1)
+
+
+def _get_root_hist_arrays(tobject):
+    '''return bin contents and squared bin errors of a ROOT histogram (including flow bins)'''
+    tobject.BufferEmpty()
+    _n_cells = tobject.GetNcells()
+    _dtype = _BUFFER_DTYPES.get(tobject.IsA().GetName()[-1])
+    if _dtype is None or isinstance(tobject, ROOT.TProfile) or tobject.GetBinErrorOption() != ROOT.TH1.kNormal:
+        # cannot read buffers directly: use ROOT accessors
+        _values = np.array([tobject.GetBinContent(_i) for _i in range(_n_cells)], dtype=np.float64)
+        _variances = np.square([tobject.GetBinError(_i) for _i in range(_n_cells)])
+        return _values, _variances
+
+    _values = np.array(_get_buffer_view(tobject.GetArray(), _n_cells, _dtype), dtype=np.float64)
+    if tobject.GetSumw2N():
+        _variances = np.array(_get_buffer_view(tobject.GetSumw2().GetArray(), _n_cells, np.float64))
+    else:
+        _variances = np.abs(_values)
+    return _values, _variances
+
+
+def _get_root_profile_arrays(tobject):
+    '''return the per-bin sums of a ROOT profile (including flow bins)'''
+    _n_cells = tobject.GetNcells()
+    # the sums of weights (bin entries) have no public buffer accessor: read them bin by bin
+    _sum_arrays = dict(
+        sumw=np.array([tobject.GetBinEntries(_i) for _i in range(_n_cells)], dtype=np.float64),
+        sumwy=np.array(_get_buffer_view(tobject.GetArray(), _n_cells, np.float64)),
+        sumwy2=np.array(_get_buffer_view(tobject.GetSumw2().GetArray(), _n_cells, np.float64)),
+    )
+    if tobject.GetBinSumw2().GetSize():
+        _sum_arrays['sumw2'] = np.array(_get_buffer_view(tobject.GetBinSumw2().GetArray(), _n_cells, np.float64))
+    return _sum_arrays
+
+
+def _get_root_graph_arrays(tobject):
+    '''return the x and y values and the (low, high) x and y errors of a ROOT graph'''
+    _n_points = tobject.GetN()
+
+    def _get_array(buffer):
+        if not _n_points:
+            return np.zeros(0)
+        return np.array(_get_buffer_view(buffer, _n_points, np.float64))
+
+    _x, _y = _get_array(tobject.GetX()), _get_array(tobject.GetY())
+    if isinstance(tobject, ROOT.TGraphAsymmErrors):
+        _errors = [_get_array(_getter()) for _getter in (tobject.GetEXlow, tobject.GetEXhigh, tobject.GetEYlow, tobject.GetEYhigh)]
+    elif isinstance(tobject, ROOT.TGraphErrors):
+        _x_errors, _y_errors = _get_array(tobject.GetEX()), _get_array(tobject.GetEY())
+        _errors = [_x_errors, _x_errors, _y_errors, _y_errors]
+    elif tobject.IsA() == ROOT.TGraph.Class():
+        _errors = [np.zeros(_n_points)] * 4
+    else:
+        # other graph types: use ROOT accessors
+        _errors = [
+            np.array([_getter(_i) for _i in range(_n_points)], dtype=np.float64)
+            for _getter in (tobject.GetErrorXlow, tobject.GetErrorXhigh, tobject.GetErrorYlow, tobject.GetErrorYhigh)
+        ]
+    return _x, _y, np.stack(_errors[:2], axis=1), np.stack(_errors[2:], axis=1)
+
+
+def _root_binary_op(operator, left, right):
+    '''apply a binary operator to the ROOT equivalents of two objects and convert the result back'''
+    return to_array_object(operator(to_root_object(left), to_root_object(right)))
+
+
+class _ArrayObjectBase(object):
+    '''Base class for array-backed objects. Operations not implemented natively
+    are delegated to the equivalent ROOT objects.'''
+
+    __slots__ = ('name', 'title')
+
+    @classmethod
+    def from_root(cls, tobject):
+        raise NotImplementedError
+
+    def to_root(self, name=None):
+        raise NotImplementedError
+
+    def Clone(self, name=None):
+        raise NotImplementedError
+
+    def Delete(self):
+        '''no-op, for compatibility with ROOT objects'''
+        pass
+
+    def GetName(self):
+        return self.name
+
+    def GetTitle(self):
+        return self.title
+
+    # arithmetic operations (unless overridden) are performed on ROOT objects
+    def __add__(self, other):
+        return _root_binary_op(op.add, self, other)
+
+    def __radd__(self, other):
+        return _root_binary_op(op.add, other, self)
+
+    def __sub__(self, other):
+        return _root_binary_op(op.sub, self, other)
+
+    def __rsub__(self, other):
+        return _root_binary_op(op.sub, other, self)
+
+    def __mul__(self, other):
+        return _root_binary_op(op.mul, self, other)
+
+    def __rmul__(self, other):
+        return _root_binary_op(op.mul, other, self)
+
+    def __truediv__(self, other):
+        return _root_binary_op(op.truediv, self, other)
+
+    def __rtruediv__(self, other):
+        return _root_binary_op(op.truediv, other, self)
+
+    __div__ = __truediv__
+    __rdiv__ = __rtruediv__
+
+
+class ArrayHist(_ArrayObjectBase):
+    """A histogram with one to three dimensions, backed by NumPy arrays.
+
+    Bin contents and their squared errors are stored as flat arrays including the underflow
+    and overflow bins, in the same order as ROOT's global bin index (i.e. the index along `x`
+    runs fastest). Arithmetic operations between histograms with identical binning and with
+    numbers are performed on the arrays, with errors propagated as for ROOT histograms
+    with ``Sumw2`` enabled.
+
+    For plotting, the same accessors as for *rootpy* histograms are available
+    (e.g. `x`, `xerr`, `y`, `yerr`, `xedges`, `z`), excluding the flow bins.
+
+    Parameters
+    ----------
+        edges : `list` of arrays
+            bin edges for each axis
+        values : array, optional
+            bin contents, including flow bins (default: all zero)
+        variances : array, optional
+            squared bin errors, including flow bins (default: all zero)
+        entries : `float`, optional
+            number of entries
+    """
+
+    __slots__ = ('edges', 'values', 'variances', 'entries')
+
+    def __init__(self, edges, values=None, variances=None, entries=0, name=None, title=""):
+        self.edges = tuple(np.asarray(_e, dtype=np.float64) for _e in edges)
+        _n_cells = int(np.prod([len(_e) + 1 for _e in self.edges]))
+        self.values = np.zeros(_n_cells) if values is None else np.asarray(values, dtype=np.float64)
+        self.variances = np.zeros(_n_cells) if variances is None else np.asarray(variances, dtype=np.float64)
+        self.entries = entries
+        self.name = name or uuid.uuid4().hex
+        self.title = title
+
+        if len(self.values) != _n_cells or len(self.variances) != _n_cells:
+            raise ValueError("Cannot create ArrayHist: expected {} bins (including flow bins), got {} values and {} variances!".format(
+                _n_cells, len(self.values), len(self.variances)))
+
+    @classmethod
+    def from_root(cls, tobject):
+        """Create from a ROOT histogram."""
+        _values, _variances = _get_root_hist_arrays(tobject)
+        return cls(
+            edges=[_get_root_axis_edges(_axis) for _axis in _get_root_axes(tobject)],
+            values=_values,
+            variances=_variances,
+            entries=tobject.GetEntries(),
+            name=tobject.GetName(),
+            title=tobject.GetTitle(),
+        )
+
+    def to_root(self, name=None):
+        """Create an equivalent ROOT histogram (`TH1D`, `TH2D` or `TH3D`)."""
+        _class = (ROOT.TH1D, ROOT.TH2D, ROOT.TH3D)[self.dimension - 1]
+        _bins_args = []
+        for _edges in self.edges:
+            _bins_args.extend([len(_edges) - 1, array('d', _edges)])
+        _tobject = _class(name or self.name, self.title, *_bins_args)
+        _tobject.SetDirectory(0)
+        _tobject.Sumw2()
+
+        _n_cells = _tobject.GetNcells()
+        _get_buffer_view(_tobject.GetArray(), _n_cells, np.float64)[:] = self.values
+        _get_buffer_view(_tobject.GetSumw2().GetArray(), _n_cells, np.float64)[:] = self.variances
+        _tobject.SetEntries(self.entries)
+
+        return rootpy.asrootpy(_tobject)
+
+    def Clone(self, name=None):
+        return self.__class__(self.edges, self.values.copy(), self.variances.copy(), self.entries, name=name, title=self.title)
+
+    def _new_with_arrays(self, values, variances, entries=None):
+        '''return a histogram with the same binning and new contents'''
+        return self.__class__(self.edges, values, variances, self.entries if entries is None else entries, title=self.title)
+
+    @property
+    def dimension(self):
+        return len(self.edges)
+
+    @property
+    def nbytes(self):
+        """Memory taken up by the arrays, in bytes."""
+        return self.values.nbytes + self.variances.nbytes + sum([_e.nbytes for _e in self.edges])
+
+    # -- ROOT-like interface (subset used by the input functions)
+
+    def GetDimension(self):
+        return self.dimension
+
+    def GetNcells(self):
+        return len(self.values)
+
+    def _get_n_bins(self, i_axis):
+        return len(self.edges[i_axis]) - 1 if i_axis < self.dimension else 1
+
+    def GetNbinsX(self):
+        return self._get_n_bins(0)
+
+    def GetNbinsY(self):
+        return self._get_n_bins(1)
+
+    def GetNbinsZ(self):
+        return self._get_n_bins(2)
+
+    def GetEntries(self):
+        return self.entries
+
+    def ProjectionX(self, name=None, *args):
+        """Sum over the `y` axis (including flow bins). Only for 2D histograms."""
+        if self.dimension != 2:
+            raise ValueError("`ProjectionX` only available for 2D histograms, not for {}D!".format(self.dimension))
+        _shape = (self.GetNbinsY() + 2, self.GetNbinsX() + 2)
+        return self.__class__(
+            self.edges[:1],
+            self.values.reshape(_shape).sum(axis=0),
+            self.variances.reshape(_shape).sum(axis=0),
+            self.entries,
+            name=name,
+            title=self.title,
+        )
+
+    def rebin(self, factor):
+        """Return a histogram with groups of `factor` adjacent bins merged. Only for 1D histograms.
+        As for ROOT's ``Rebin``, if `factor` does not divide the number of bins, the remaining
+        bins are added to the overflow bin."""
+        if self.dimension != 1:
+            raise NotImplementedError("`rebin` only available for 1D histograms, not for {}D!".format(self.dimension))
+        _n_groups = (len(self.edges[0]) - 1) // factor
+        _end = 1 + _n_groups * factor
+
+        def _merge(flat_array):
+            return np.concatenate([
+                flat_array[:1],
+                flat_array[1:_end].reshape(_n_groups, factor).sum(axis=1),
+                [flat_array[_end:].sum()],
+            ])
+
+        return self.__class__([self.edges[0][:_end:factor]], _merge(self.values), _merge(self.variances), self.entries, name=self.name, title=self.title)
+
+    def __len__(self):
+        return len(self.values)
+
+    def integral(self, overflow=False):
+        return self._get_inner(self.values).sum() if not overflow else self.values.sum()
+
+    # -- arithmetic
+
+    def _check_compatible(self, other):
+        if len(self.edges) != len(other.edges) or not all(np.array_equal(_e1, _e2) for _e1, _e2 in zip(self.edges, other.edges)):
+            raise ValueError("Cannot combine histograms with different binning!")
+
+    def __add__(self, other):
+        if isinstance(other, ArrayHist):
+            self._check_compatible(other)
+            return self._new_with_arrays(self.values + other.values, self.variances + other.variances, self.entries + other.entries)
+        elif isinstance(other, numbers.Real):
+            return self._new_with_arrays(self.values + other, self.variances.copy())
+        return super(ArrayHist, self).__add__(other)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, ArrayHist):
+            self._check_compatible(other)
+            return self._new_with_arrays(self.values - other.values, self.variances + other.variances, self.entries + other.entries)
+        elif isinstance(other, numbers.Real):
+            return self._new_with_arrays(self.values - other, self.variances.copy())
+        return super(ArrayHist, self).__sub__(other)
+
+    def __rsub__(self, other):
+        if isinstance(other, numbers.Real):
+            return self._new_with_arrays(other - self.values, self.variances.copy())
+        return super(ArrayHist, self).__rsub__(other)
+
+    def __neg__(self):
+        return self._new_with_arrays(-self.values, self.variances.copy())
+
+    def __mul__(self, other):
+        if isinstance(other, ArrayHist):
+            self._check_compatible(other)
+            return self._new_with_arrays(
+                self.values * other.values,
+                self.variances * np.square(other.values) + other.variances * np.square(self.values),
+            )
+        elif isinstance(other, numbers.Real):
+            return self._new_with_arrays(self.values * other, self.variances * other ** 2)
+        return super(ArrayHist, self).__mul__(other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, ArrayHist):
+            self._check_compatible(other)
+            # as `TH1::Divide`: bins with zero denominator are set to zero
+            _nonzero = other.values != 0
+            _denominator = np.where(_nonzero, other.values, 1.0)
+            return self._new_with_arrays(
+                np.where(_nonzero, self.values / _denominator, 0.0),
+                np.where(_nonzero, (self.variances * np.square(other.values) + other.variances * np.square(self.values)) / _denominator ** 4, 0.0),
+            )
+        elif isinstance(other, numbers.Real):
+            if other == 0:
+                raise ZeroDivisionError("Cannot divide histogram by zero!")
+            return self._new_with_arrays(self.values / other, self.variances / other ** 2)
+        return super(ArrayHist, self).__truediv__(other)
+
+    __div__ = __truediv__
+
+    # -- rootpy-like accessors for plotting (flow bins excluded)
+
+    def _get_inner(self, flat_array):
+        '''return an array with the inner bins (without flow bins), indexed as [x, y, z]'''
+        _shape = tuple(len(_e) + 1 for _e in reversed(self.edges))
+        _array = flat_array.reshape(_shape).T
+        return _array[(slice(1, -1),) * self.dimension]
+
+    def _centers(self, i_axis):
+        return 0.5 * (self.edges[i_axis][1:] + self.edges[i_axis][:-1])
+
+    def _widths(self, i_axis):
+        return np.diff(self.edges[i_axis])
+
+    def _half_widths(self, i_axis):
+        _half_widths = 0.5 * self._widths(i_axis)
+        return np.column_stack([_half_widths, _half_widths])
+
+    def x(self):
+        return self._centers(0)
+
+    def xerr(self):
+        return self._half_widths(0)
+
+    def xwidth(self, overflow=False):
+        if overflow:
+            # as `TAxis::GetBinWidth`: flow bins have the width of the first/last bin
+            _widths = self._widths(0)
+            return np.concatenate([_widths[:1], _widths, _widths[-1:]])
+        return self._widths(0)
+
+    def xedges(self):
+        return self.edges[0]
+
+    def y(self):
+        if self.dimension == 1:
+            return self._get_inner(self.values)
+        return self._centers(1)
+
+    def yerr(self):
+        if self.dimension == 1:
+            _errors = np.sqrt(self._get_inner(self.variances))
+            return np.column_stack([_errors, _errors])
+        return self._half_widths(1)
+
+    def yedges(self):
+        if self.dimension < 2:
+            raise AttributeError("'yedges' not available for 1D histograms")
+        return self.edges[1]
+
+    def z(self):
+        if self.dimension != 2:
+            raise AttributeError("'z' only available for 2D histograms")
+        return self._get_inner(self.values)
+
+
+class ArrayProfile(_ArrayObjectBase):
+    """A profile histogram backed by NumPy arrays.
+
+    The per-bin sums needed to reconstruct the ROOT profile are kept. For plotting and
+    in the input functions, the profile is represented by its projection, an
+    :py:class:`ArrayHist` containing the mean values and their errors in each bin.
+    """
+
+    __slots__ = ('sum_arrays', 'error_option', 'entries', 'projection')
+
+    @classmethod
+    def from_root(cls, tobject):
+        """Create from a ROOT profile."""
+        _obj = cls()
+        _obj.name = tobject.GetName()
+        _obj.title = tobject.GetTitle()
+        _obj.error_option = tobject.GetErrorOption()
+        _obj.entries = tobject.GetEntries()
+        _obj.sum_arrays = _get_root_profile_arrays(tobject)
+
+        # means and their errors, as computed by ROOT
+        _values, _variances = _get_root_hist_arrays(tobject)
+        _obj.projection = ArrayHist(
+            edges=[_get_root_axis_edges(_axis) for _axis in _get_root_axes(tobject)],
+            values=_values, variances=_variances, entries=_obj.entries, name=_obj.name, title=_obj.title,
+        )
+        return _obj
+
+    def to_root(self, name=None):
+        """Create an equivalent ROOT profile (`TProfile`, `TProfile2D` or `TProfile3D`)."""
+        _class = (ROOT.TProfile, ROOT.TProfile2D, ROOT.TProfile3D)[self.projection.dimension - 1]
+        _bins_args = []
+        for _edges in self.projection.edges:
+            _bins_args.extend([len(_edges) - 1, array('d', _edges)])
+        _tobject = _class(name or self.name, self.title, *_bins_args)
+        _tobject.SetDirectory(0)
+        _tobject.SetErrorOption(self.error_option)
+
+        _n_cells = _tobject.GetNcells()
+        for _i, _sumw in enumerate(self.sum_arrays['sumw']):
+            _tobject.SetBinEntries(_i, _sumw)
+        _get_buffer_view(_tobject.GetArray(), _n_cells, np.float64)[:] = self.sum_arrays['sumwy']
+        _get_buffer_view(_tobject.GetSumw2().GetArray(), _n_cells, np.float64)[:] = self.sum_arrays['sumwy2']
+        if 'sumw2' in self.sum_arrays:
+            _tobject.Sumw2()
+            _get_buffer_view(_tobject.GetBinSumw2().GetArray(), _n_cells, np.float64)[:] = self.sum_arrays['sumw2']
+        _tobject.SetEntries(self.entries)
+
+        return rootpy.asrootpy(_tobject)
+
+    @classmethod
+    def from_sum_arrays(cls, edges, sum_arrays, error_option='', entries=0, name=None, title=""):
+        """Create from the per-bin sums of weights (``sumw``), weighted values (``sumwy``), weighted
+        squared values (``sumwy2``) and, optionally, squared weights (``sumw2``), given as flat arrays
+        in ROOT's global bin order. Mean values and their errors are computed as in ROOT."""
+        _sumw = np.asarray(sum_arrays['sumw'], dtype=np.float64)
+        _sumwy = np.asarray(sum_arrays['sumwy'], dtype=np.float64)
+        _sumwy2 = np.asarray(sum_arrays['sumwy2'], dtype=np.float64)
+
+        _filled = _sumw != 0
+        _safe_sumw = np.where(_filled, _sumw, 1.0)
+        _means = np.where(_filled, _sumwy / _safe_sumw, 0.0)
+        _spreads = np.sqrt(np.abs(_sumwy2 / _safe_sumw - np.square(_means)))
+
+        # effective number of entries
+        if 'sumw2' in sum_arrays:
+            _sumw2 = np.asarray(sum_arrays['sumw2'], dtype=np.float64)
+            _n_eff = np.where(_sumw2 != 0, np.square(_sumw) / np.where(_sumw2 != 0, _sumw2, 1.0), 0.0)
+        else:
+            _n_eff = _sumw
+        _safe_n_eff = np.where(_n_eff > 0, _n_eff, 1.0)
+
+        if error_option == 's':
+            _errors = _spreads
+        elif error_option == 'i':
+            _errors = np.where(_spreads != 0, _spreads, 1.0 / np.sqrt(12.0)) / np.sqrt(_safe_n_eff)
+        elif error_option == 'g':
+            _errors = 1.0 / np.sqrt(np.abs(_safe_sumw))
+        else:
+            _errors = _spreads / np.sqrt(_safe_n_eff)
+        _errors = np.where(_filled & (_n_eff > 0), _errors, 0.0)
+
+        _obj = cls()
+        _obj.name = name or uuid.uuid4().hex
+        _obj.title = title
+        _obj.error_option = error_option
+        _obj.entries = entries
+        _obj.sum_arrays = {_key: np.asarray(_array, dtype=np.float64) for _key, _array in sum_arrays.items()}
+        _obj.projection = ArrayHist(
+            edges=edges, values=_means, variances=np.square(_errors), entries=entries, name=_obj.name, title=title,
+        )
+        return _obj
+
+    def Clone(self, name=None):
+        _obj = self.__class__()
+        _obj.name = name or self.name
+        _obj.title = self.title
+        _obj.error_option = self.error_option
+        _obj.entries = self.entries
+        _obj.sum_arrays = {_key: _array.copy() for _key, _array in self.sum_arrays.items()}
+        _obj.projection = self.projection.Clone(name)
+        return _obj
+
+    @property
+    def nbytes(self):
+        """Memory taken up by the arrays, in bytes."""
+        return self.projection.nbytes + sum([_array.nbytes for _array in self.sum_arrays.values()])
+
+    def __len__(self):
+        return len(self.projection)
+
+    # rootpy-like accessors for plotting
+    def x(self):
+        return self.projection.x()
+
+    def xerr(self):
+        return self.projection.xerr()
+
+    def xwidth(self):
+        return self.projection.xwidth()
+
+    def xedges(self):
+        return self.projection.xedges()
+
+    def y(self):
+        return self.projection.y()
+
+    def yerr(self):
+        return self.projection.yerr()
+
+
+class ArrayGraph(_ArrayObjectBase):
+    """A graph with (asymmetric) errors, backed by NumPy arrays.
+
+    For plotting, the same accessors as for *rootpy* graphs (`x`, `xerr`, `y`, `yerr`) are available.
+    """
+
+    __slots__ = ('x_values', 'y_values', 'x_errors', 'y_errors')
+
+    def __init__(self, x_values, y_values, x_errors=None, y_errors=None, name=None, title=""):
+        self.x_values = np.asarray(x_values, dtype=np.float64)
+        self.y_values = np.asarray(y_values, dtype=np.float64)
+        # errors are stored as arrays with shape (N, 2): low and high errors
+        self.x_errors = np.zeros((len(self.x_values), 2)) if x_errors is None else np.asarray(x_errors, dtype=np.float64)
+        self.y_errors = np.zeros((len(self.y_values), 2)) if y_errors is None else np.asarray(y_errors, dtype=np.float64)
+        self.name = name or uuid.uuid4().hex
+        self.title = title
+
+    @classmethod
+    def from_root(cls, tobject):
+        """Create from a ROOT graph."""
+        _x_values, _y_values, _x_errors, _y_errors = _get_root_graph_arrays(tobject)
+        return cls(
+            x_values=_x_values,
+            y_values=_y_values,
+            x_errors=_x_errors,
+            y_errors=_y_errors,
+            name=tobject.GetName(),
+            title=tobject.GetTitle(),
+        )
+
+    def to_root(self, name=None):
+        """Create an equivalent ROOT graph (`TGraphAsymmErrors`)."""
+        _tobject = ROOT.TGraphAsymmErrors(
+            len(self.x_values),
+            array('d', self.x_values), array('d', self.y_values),
+            array('d', self.x_errors[:, 0]), array('d', self.x_errors[:, 1]),
+            array('d', self.y_errors[:, 0]), array('d', self.y_errors[:, 1]),
+        )
+        _tobject.SetName(name or self.name)
+        _tobject.SetTitle(self.title)
+        return rootpy.asrootpy(_tobject)
+
+    def Clone(self, name=None):
+        return self.__class__(self.x_values.copy(), self.y_values.copy(), self.x_errors.copy(), self.y_errors.copy(), name=name, title=self.title)
+
+    @property
+    def nbytes(self):
+        """Memory taken up by the arrays, in bytes."""
+        return self.x_values.nbytes + self.y_values.nbytes + self.x_errors.nbytes + self.y_errors.nbytes
+
+    def __len__(self):
+        return len(self.x_values)
+
+    def __mul__(self, other):
+        if isinstance(other, numbers.Real):
+            return self.__class__(self.x_values.copy(), self.y_values * other, self.x_errors.copy(), np.abs(other) * self.y_errors, title=self.title)
+        return super(ArrayGraph, self).__mul__(other)
+
+    __rmul__ = __mul__
+
+    # rootpy-like accessors for plotting
+    def x(self):
+        return self.x_values
+
+    def xerr(self):
+        return self.x_errors
+
+    def y(self):
+        return self.y_values
+
+    def yerr(self):
+        return self.y_errors
+
+
+def to_array_object(obj):
+    """Convert ROOT histograms, profiles and graphs (also inside lists and tuples) to the
+    equivalent array-backed objects. All other objects are returned unchanged."""
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(to_array_object(_o) for _o in obj)
+    elif not ROOT.imported:
+        # no ROOT objects can exist
+        return obj
+    elif isinstance(obj, ROOT.TProfile) or isinstance(obj, ROOT.TProfile2D) or isinstance(obj, ROOT.TProfile3D):
+        return ArrayProfile.from_root(obj)
+    elif isinstance(obj, ROOT.TH1):
+        return ArrayHist.from_root(obj)
+    elif isinstance(obj, ROOT.TGraph):
+        return ArrayGraph.from_root(obj)
+    return obj
+
+
+def to_root_object(obj):
+    """Convert array-backed objects (also inside lists and tuples) to the equivalent
+    *rootpy* objects. All other objects are returned unchanged."""
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(to_root_object(_o) for _o in obj)
+    elif isinstance(obj, _ArrayObjectBase):
+        return obj.to_root()
+    return obj
@@ -0,0 +1,128 @@
+"""Reading the columnar stores written by *Lumberjack* (option ``--columnar-output``).
+
+A store is either a directory containing one NumPy ``.npy`` file per array, which
+can be memory-mapped, or an HDF5 file (requires *h5py*). Objects are returned as
+array-backed objects (see :py:mod:`._array_objects`), without using ROOT.
+"""
+from __future__ import print_function
+
+import numpy as np
+import os
+
+from ._array_objects import ArrayHist, ArrayProfile
+
+
+__all__ = ['ColumnarStore']
+
+
+def _to_global_bin_order(array):
+    '''flatten an array of bins, indexed as [x, y, z], so that the x index runs fastest (no copy for 1D arrays)'''
+    return np.ravel(array, order='F')
+
+
+class ColumnarStore(object):
+    """Read-only access to a columnar store written by *Lumberjack*.
+
+    Parameters
+    ----------
+        path : `str`
+            path to the store: a directory of ``.npy`` files or an HDF5 file (extension ``.h5`` or ``.hdf5``)
+        mmap_mode : `str` or `None`
+            memory-map mode used for ``.npy`` files (see :py:func:`numpy.load`). With the default
+            ``'r'``, bin contents are only read from disk when accessed.
+
+    Objects are retrieved by their path in the corresponding ROOT output file:
+
+    .. code:: python
+
+       >>> with ColumnarStore('MyTask_columnar') as store:
+       ...     hist = store.get('runB/h_jet1pt')
+    """
+
+    def __init__(self, path, mmap_mode='r'):
+        self._path = path
+        self._mmap_mode = mmap_mode
+        self._h5_file = None
+        if os.path.splitext(path)[1].lower() in ('.h5', '.hdf5'):
+            try:
+                import h5py
+            except ImportError:
+                print("[ERROR] Reading HDF5 columnar store requested, but `h5py` is not installed!")
+                raise
+            self._h5_file = h5py.File(path, 'r')
+        elif not os.path.isdir(path):
+            raise IOError("Columnar store '{}' not found!".format(path))
+
+        _index_arrays = [
+            self._get_array(_name)
+            for _name in ('_index_paths', '_index_classes', '_index_entries', '_index_error_options')
+        ]
+        self._index = {
+            _path: (_class_name, _entries, _error_option)
+            for _path, _class_name, _entries, _error_option in zip(*[
+                [self._to_str(_v) for _v in _array] if _array.dtype.kind in 'SU' else list(_array)
+                for _array in _index_arrays
+            ])
+        }
+
+    @staticmethod
+    def _to_str(value):
+        '''convert a string read from the store (possibly `bytes` for HDF5) to `str`'''
+        if isinstance(value, bytes) and not isinstance(value, str):
+            return value.decode('utf-8')
+        return str(value)
+
+    def _get_array(self, array_path):
+        '''read (or memory-map) an array from the store'''
+        if self._h5_file is not None:
+            return self._h5_file[array_path][()]
+        return np.load(os.path.join(self._path, array_path + '.npy'), mmap_mode=self._mmap_mode)
+
+    def keys(self):
+        """Return the paths of all objects in the store."""
+        return sorted(self._index.keys())
+
+    def __contains__(self, object_path):
+        return object_path in self._index
+
+    def get(self, object_path):
+        """Return the object stored under `object_path` as an
+        :py:class:`~Palisade.ArrayHist` or :py:class:`~Palisade.ArrayProfile`."""
+        try:
+            _class_name, _entries, _error_option = self._index[object_path]
+        except KeyError:
+            raise KeyError("No object '{}' in columnar store '{}'!".format(object_path, self._path))
+
+        _is_profile = _class_name.startswith('TProfile')
+        _array_names = ('entries', 'sumwy', 'sumwy2', 'sumw2') if _is_profile else ('sumw', 'sumw2')
+        _arrays = {
+            _array_name: self._get_array("{}/{}".format(object_path, _array_name))
+            for _array_name in _array_names
+        }
+
+        # bin contents are stored with one array dimension per axis
+        _dimension = _arrays[_array_names[0]].ndim
+        _edges = [self._get_array("{}/edges_{}".format(object_path, _axis_name)) for _axis_name in 'xyz'[:_dimension]]
+        _arrays = {_array_name: _to_global_bin_order(_array) for _array_name, _array in _arrays.items()}
+        _name = object_path.split('/')[-1]
+
+        if _is_profile:
+            return ArrayProfile.from_sum_arrays(
+                _edges,
+                dict(sumw=_arrays['entries'], sumwy=_arrays['sumwy'], sumwy2=_arrays['sumwy2'], sumw2=_arrays['sumw2']),
+                error_option=_error_option, entries=_entries, name=_name,
+            )
+
+        return ArrayHist(_edges, values=_arrays['sumw'], variances=_arrays['sumw2'], entries=_entries, name=_name)
+
+    def close(self):
+        """Close the store."""
+        if self._h5_file is not None:
+            self._h5_file.close()
+            self._h5_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
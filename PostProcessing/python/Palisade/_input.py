@@ -2,21 +2,23 @@ from __future__ import print_function
 
 import ast
 import functools
-import ROOT
+import hashlib
+import inspect
 import numpy as np
 import operator as op
 import os
 import pandas as pd
 import six
+import sys
+import tempfile
+import threading
 import uuid
 
 from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from six.moves import cPickle as pickle
 
-from rootpy import asrootpy
-from rootpy.io import root_open
-from rootpy.plotting import Hist1D, Hist2D, Profile1D, Efficiency, Graph
-from rootpy.plotting.hist import _Hist, _Hist2D
-from rootpy.plotting.profile import _ProfileBase
 
 if six.PY2:
     from collections import Mapping
@@ -25,8 +27,16 @@ elif six.PY3:
 
 import scipy.stats as stats
 
+from ._array_objects import (
+    ArrayHist, ArrayProfile, ArrayGraph, to_array_object, to_root_object,
+    _ArrayObjectBase, _BUFFER_DTYPES, _get_buffer_view, _get_root_axes, _get_root_axis_edges,
+    _get_root_graph_arrays, _get_root_hist_arrays, _get_root_profile_arrays,
+)
+from ._native_reader import open_native_file, read_array_object
+from ._root import ROOT, rootpy, rootpy_io, rootpy_plotting, rootpy_plotting_hist, rootpy_plotting_profile
 
-__all__ = ['InputROOTFile', 'InputROOT']
+
+__all__ = ['TFileHandlePool', 'NativeFileHandlePool', 'ObjectCache', 'PersistentCache', 'InputROOTFile', 'InputROOT']
 
 
 class HashableMap(Mapping):
@@ -90,6 +100,15 @@ class HashableMap(Mapping):
 
 class _ROOTObjectFunctions(object):
 
+    # if True, use vectorized NumPy implementations for histograms where available
+    use_arrays = True
+
+    # functions which accept array-backed histograms (`ArrayHist`) directly
+    _ARRAY_HIST_FUNCTIONS = (
+        'atleast', 'bin_width', 'max', 'max_val_min_err', 'max_yield_index',
+        'mask_if_less', 'normalize_x', 'select', 'threshold', 'yerr',
+    )
+
     @staticmethod
     def get_all():
         """return all methods not beginning with a '_'"""
@@ -102,15 +121,77 @@ class _ROOTObjectFunctions(object):
     @staticmethod
     def _project_or_clone(tobject, projection_options=None):
 
-        if isinstance(tobject, _ProfileBase):
+        if isinstance(tobject, ArrayProfile):
+            return tobject.projection.Clone()
+        elif rootpy_plotting_profile.imported and isinstance(tobject, rootpy_plotting_profile._ProfileBase):
             # create an "x-projection" with a unique suffix
             if projection_options is None:
-                return asrootpy(tobject.ProjectionX(uuid.uuid4().get_hex()))
+                return rootpy.asrootpy(tobject.ProjectionX(uuid.uuid4().get_hex()))
             else:
-                return asrootpy(tobject.ProjectionX(uuid.uuid4().get_hex(), projection_options))
+                return rootpy.asrootpy(tobject.ProjectionX(uuid.uuid4().get_hex(), projection_options))
         else:
             return tobject.Clone()
 
+    @staticmethod
+    def _supports_arrays(*tobjects):
+        '''check if the vectorized implementations can be used for all `tobjects`'''
+        for _tobj in tobjects:
+            # array-backed histograms are always supported
+            if isinstance(_tobj, ArrayHist):
+                continue
+            if not _ROOTObjectFunctions.use_arrays:
+                return False
+            if not ROOT.imported or not isinstance(_tobj, ROOT.TH1) or isinstance(_tobj, ROOT.TProfile):
+                return False
+            if _tobj.IsA().GetName()[-1] not in _BUFFER_DTYPES:
+                return False
+            if _tobj.GetBinErrorOption() != ROOT.TH1.kNormal:
+                return False
+        return True
+
+    @staticmethod
+    def _get_arrays(tobject):
+        '''return the bin contents and errors of a histogram (including flow bins) as NumPy arrays'''
+        if isinstance(tobject, ArrayHist):
+            return tobject.values.copy(), np.sqrt(tobject.variances)
+        _contents, _variances = _get_root_hist_arrays(tobject)
+        return _contents, np.sqrt(_variances)
+
+    @staticmethod
+    def _get_stacked_arrays(tobjects):
+        '''return the bin contents and errors of several histograms with identical binning as 2D NumPy arrays'''
+        _contents, _errors = zip(*[_ROOTObjectFunctions._get_arrays(_tobj) for _tobj in tobjects])
+        return np.array(_contents), np.array(_errors)
+
+    @staticmethod
+    def _set_arrays(tobject, contents, errors, n_set_bins=None):
+        '''write bin contents and errors to a histogram. `n_set_bins` is the number of bins
+        whose contents have changed (default: all).'''
+        _n_cells = tobject.GetNcells()
+        if isinstance(tobject, ArrayHist):
+            tobject.values = np.array(contents, dtype=np.float64)
+            tobject.variances = np.square(errors, dtype=np.float64)
+            tobject.entries += _n_cells if n_set_bins is None else n_set_bins
+            return
+
+        _dtype = _BUFFER_DTYPES[tobject.IsA().GetName()[-1]]
+        _get_buffer_view(tobject.GetArray(), _n_cells, _dtype)[:] = contents
+        if not tobject.GetSumw2N():
+            tobject.Sumw2()
+        _get_buffer_view(tobject.GetSumw2().GetArray(), _n_cells, np.float64)[:] = np.square(errors)
+
+        # update statistics as `SetBinContent` would: one entry per bin set and
+        # statistics recomputed from bin contents
+        tobject.SetEntries(tobject.GetEntries() + (_n_cells if n_set_bins is None else n_set_bins))
+        tobject.PutStats(array('d', [0.0] * 13))
+
+    @staticmethod
+    def _get_axis_bin_indices(tobject, i_axis):
+        '''return the index along axis `i_axis` for each global bin index'''
+        _n_bins_per_axis = [tobject.GetNbinsX() + 2, tobject.GetNbinsY() + 2, tobject.GetNbinsZ() + 2]
+        _stride = int(np.prod(_n_bins_per_axis[:i_axis]))
+        return (np.arange(tobject.GetNcells()) // _stride) % _n_bins_per_axis[i_axis]
+
     @staticmethod
     def histdivide(tobject_1, tobject_2, option=""):
         """divide two histograms, taking error calculation option into account"""
@@ -133,6 +214,17 @@ class _ROOTObjectFunctions(object):
 
         _new_tobject = _ROOTObjectFunctions._project_or_clone(yields[0])
 
+        if _ROOTObjectFunctions._supports_arrays(_new_tobject, *(list(yields) + list(efficiencies))):
+            _yields, _ = _ROOTObjectFunctions._get_stacked_arrays(yields)
+            _effs, _ = _ROOTObjectFunctions._get_stacked_arrays(efficiencies)
+
+            # only positive yields with efficiency above threshold are considered
+            _yields = np.where(~(_effs < eff_threshold) & (_yields > 0), _yields, 0)
+            _indices = np.where(_yields.max(axis=0) > 0, _yields.argmax(axis=0), -1)
+
+            _ROOTObjectFunctions._set_arrays(_new_tobject, _indices, np.zeros_like(_indices))
+            return _new_tobject
+
         for _bin_idx in range(len(yields[0])):
             _max_yield_for_bin = 0
             _max_yield_obj_idx = -1
@@ -188,6 +280,20 @@ class _ROOTObjectFunctions(object):
 
         _new_tobject = _ROOTObjectFunctions._project_or_clone(tobjects[0])
 
+        if _ROOTObjectFunctions._supports_arrays(_new_tobject, indices, *tobjects):
+            _indices = _ROOTObjectFunctions._get_arrays(indices)[0]
+            _contents, _errors = _ROOTObjectFunctions._get_stacked_arrays(tobjects)
+
+            _in_range = (_indices >= 0) & (_indices < len(tobjects))
+            _obj_indices = np.where(_in_range, _indices, 0).astype(int)
+            _bin_indices = np.arange(len(_indices))
+            _ROOTObjectFunctions._set_arrays(
+                _new_tobject,
+                np.where(_in_range, _contents[_obj_indices, _bin_indices], 0),
+                np.where(_in_range, _errors[_obj_indices, _bin_indices], 0),
+            )
+            return _new_tobject
+
         for _i_bin, (_bin_proxy, _obj_idx) in enumerate(zip(_new_tobject, indices)):
             # range check
             if _obj_idx.value >= 0 and _obj_idx.value < len(tobjects):
@@ -234,21 +340,21 @@ class _ROOTObjectFunctions(object):
     def efficiency(tobject_numerator, tobject_denominator):
         """Compute TEfficiency"""
 
-        return Efficiency(tobject_numerator, tobject_denominator)
+        return rootpy_plotting.Efficiency(tobject_numerator, tobject_denominator)
 
     @staticmethod
     def efficiency_graph(tobject_numerator, tobject_denominator):
         """Compute TEfficiency with proper clopper-pearson intervals"""
 
-        _eff = Efficiency(tobject_numerator, tobject_denominator)
-        return asrootpy(_eff.CreateGraph())
+        _eff = rootpy_plotting.Efficiency(tobject_numerator, tobject_denominator)
+        return rootpy.asrootpy(_eff.CreateGraph())
 
     @staticmethod
     def project_x(tobject):
         """Apply ProjectionX() operation."""
 
         if hasattr(tobject, 'ProjectionX'):
-            _new_tobject = asrootpy(tobject.ProjectionX(uuid.uuid4().get_hex()))
+            _new_tobject = rootpy.asrootpy(tobject.ProjectionX(uuid.uuid4().get_hex()))
         else:
             print("[INFO] `project_x` not available for object with type {}".format(type(tobject)))
             return tobject
@@ -260,7 +366,7 @@ class _ROOTObjectFunctions(object):
         """Apply ProjectionY() operation."""
 
         if hasattr(tobject, 'ProjectionY'):
-            _new_tobject = asrootpy(tobject.ProjectionY(uuid.uuid4().get_hex()))
+            _new_tobject = rootpy.asrootpy(tobject.ProjectionY(uuid.uuid4().get_hex()))
         else:
             raise ValueError("`project_y` not available for object with type {}".format(type(tobject)))
 
@@ -271,7 +377,7 @@ class _ROOTObjectFunctions(object):
         """Return a TH1D containing the main diagonal of an input TH2D."""
 
         if hasattr(th2d, 'ProjectionX'):
-            _new_tobject = asrootpy(th2d.ProjectionX(uuid.uuid4().get_hex()))
+            _new_tobject = rootpy.asrootpy(th2d.ProjectionX(uuid.uuid4().get_hex()))
         else:
             raise ValueError("`diagonal` not available for object with type {}".format(type(tobject)))
 
@@ -289,6 +395,11 @@ class _ROOTObjectFunctions(object):
         # project preserving errors
         _new_tobject = _ROOTObjectFunctions._project_or_clone(tobject, "e")
 
+        if _ROOTObjectFunctions._supports_arrays(_new_tobject):
+            _, _errors = _ROOTObjectFunctions._get_arrays(_new_tobject)
+            _ROOTObjectFunctions._set_arrays(_new_tobject, _errors, np.zeros_like(_errors))
+            return _new_tobject
+
         for _bin_proxy in _new_tobject:
             _bin_proxy.value, _bin_proxy.error = _bin_proxy.error, 0
 
@@ -301,6 +412,13 @@ class _ROOTObjectFunctions(object):
         # project preserving errors
         _new_tobject = _ROOTObjectFunctions._project_or_clone(tobject, "e")
 
+        if _ROOTObjectFunctions._supports_arrays(_new_tobject):
+            _contents, _errors = _ROOTObjectFunctions._get_arrays(_new_tobject)
+            _mask = _contents < min_value
+            _contents[_mask], _errors[_mask] = 0, 0
+            _ROOTObjectFunctions._set_arrays(_new_tobject, _contents, _errors, n_set_bins=np.count_nonzero(_mask))
+            return _new_tobject
+
         for _bin_proxy in _new_tobject:
             if hasattr(_bin_proxy, 'graph_'):
                 # for TGraph etc.
@@ -325,6 +443,11 @@ class _ROOTObjectFunctions(object):
         # project preserving errors
         _new_tobject = _ROOTObjectFunctions._project_or_clone(tobject)
 
+        if _ROOTObjectFunctions._supports_arrays(_new_tobject):
+            _contents, _errors = _ROOTObjectFunctions._get_arrays(_new_tobject)
+            _ROOTObjectFunctions._set_arrays(_new_tobject, np.where(_contents < min_value, 0.0, 1.0), np.zeros_like(_errors))
+            return _new_tobject
+
         for _bin_proxy in _new_tobject:
             if _bin_proxy.value < min_value:
                 _bin_proxy.value, _bin_proxy.error = 0, 0
@@ -357,6 +480,16 @@ class _ROOTObjectFunctions(object):
 
         _new_tobject = _ROOTObjectFunctions._project_or_clone(tobject)
 
+        if _ROOTObjectFunctions._supports_arrays(_new_tobject):
+            if isinstance(_new_tobject, ArrayHist):
+                _x_widths = _new_tobject.xwidth(overflow=True)
+            else:
+                _x_axis = _new_tobject.GetXaxis()
+                _x_widths = np.array([_x_axis.GetBinWidth(_i) for _i in range(_x_axis.GetNbins() + 2)])
+            _contents = _x_widths[_ROOTObjectFunctions._get_axis_bin_indices(_new_tobject, 0)]
+            _ROOTObjectFunctions._set_arrays(_new_tobject, _contents, np.zeros_like(_contents))
+            return _new_tobject
+
         for _bin_proxy in _new_tobject:
             _bin_proxy.value, _bin_proxy.error = _bin_proxy.x.width, 0
 
@@ -372,10 +505,16 @@ class _ROOTObjectFunctions(object):
         for _tobj in tobjects:
             _tobj_clones.append(_ROOTObjectFunctions._project_or_clone(_tobj, "e"))
 
-        for _bin_proxies in zip(_new_tobject, *_tobj_clones):
-            _argmax = max(range(1, len(_bin_proxies)), key=lambda idx: _bin_proxies[idx].value)
-            _bin_proxies[0].value = _bin_proxies[_argmax].value
-            _bin_proxies[0].error = _bin_proxies[_argmax].error
+        if _ROOTObjectFunctions._supports_arrays(_new_tobject, *_tobj_clones):
+            _contents, _errors = _ROOTObjectFunctions._get_stacked_arrays(_tobj_clones)
+            _argmax = _contents.argmax(axis=0)
+            _bin_indices = np.arange(_contents.shape[1])
+            _ROOTObjectFunctions._set_arrays(_new_tobject, _contents[_argmax, _bin_indices], _errors[_argmax, _bin_indices])
+        else:
+            for _bin_proxies in zip(_new_tobject, *_tobj_clones):
+                _argmax = max(range(1, len(_bin_proxies)), key=lambda idx: _bin_proxies[idx].value)
+                _bin_proxies[0].value = _bin_proxies[_argmax].value
+                _bin_proxies[0].error = _bin_proxies[_argmax].error
 
         # cleanup
         for _tobj_clone in _tobj_clones:
@@ -393,16 +532,22 @@ class _ROOTObjectFunctions(object):
         for _tobj in tobjects:
             _tobj_clones.append(_ROOTObjectFunctions._project_or_clone(_tobj, "e"))
 
-        for _bin_proxies in zip(_new_tobject, *_tobj_clones):
-            _maxval = None
-            for _bin_proxy in _bin_proxies[1:]:
-                if _maxval is None or _bin_proxy.value > _maxval:
-                    _maxval = _bin_proxy.value
-                    _minerr = _bin_proxy.error
-                elif _maxval == _bin_proxy.value and _bin_proxy.error < _minerr:
-                    _minerr = _bin_proxy.error
-            _bin_proxies[0].value = _maxval
-            _bin_proxies[0].error = _minerr
+        if _ROOTObjectFunctions._supports_arrays(_new_tobject, *_tobj_clones):
+            _contents, _errors = _ROOTObjectFunctions._get_stacked_arrays(_tobj_clones)
+            _maxval = _contents.max(axis=0)
+            _minerr = np.where(_contents == _maxval, _errors, np.inf).min(axis=0)
+            _ROOTObjectFunctions._set_arrays(_new_tobject, _maxval, _minerr)
+        else:
+            for _bin_proxies in zip(_new_tobject, *_tobj_clones):
+                _maxval = None
+                for _bin_proxy in _bin_proxies[1:]:
+                    if _maxval is None or _bin_proxy.value > _maxval:
+                        _maxval = _bin_proxy.value
+                        _minerr = _bin_proxy.error
+                    elif _maxval == _bin_proxy.value and _bin_proxy.error < _minerr:
+                        _minerr = _bin_proxy.error
+                _bin_proxies[0].value = _maxval
+                _bin_proxies[0].error = _minerr
 
         # cleanup
         for _tobj_clone in _tobj_clones:
@@ -419,18 +564,24 @@ class _ROOTObjectFunctions(object):
         _new_tobject = _ROOTObjectFunctions._project_or_clone(tobject, "e")
         _new_tobject_ref = _ROOTObjectFunctions._project_or_clone(tobject_ref, "e")
 
-        for _bin_proxy, _bin_proxy_ref in zip(_new_tobject, _new_tobject_ref):
-            if hasattr(_bin_proxy, 'graph_'):
-                # for TGraph etc.
-                if _bin_proxy.y < _bin_proxy_ref.y:
-                    _bin_proxy.y.value = 0
-                    _bin_proxy.y.error_hi = 0
-                    # 'low' error setter has a bug in rootpy. workaround:
-                    _bin_proxy.graph_.SetPointEYlow(_bin_proxy.idx_, 0)
-            else:
-                # for TH1D etc.
-                if _bin_proxy.value < _bin_proxy_ref.value:
-                    _bin_proxy.value, _bin_proxy.error = 0, 0
+        if _ROOTObjectFunctions._supports_arrays(_new_tobject, _new_tobject_ref):
+            _contents, _errors = _ROOTObjectFunctions._get_arrays(_new_tobject)
+            _mask = _contents < _ROOTObjectFunctions._get_arrays(_new_tobject_ref)[0]
+            _contents[_mask], _errors[_mask] = 0, 0
+            _ROOTObjectFunctions._set_arrays(_new_tobject, _contents, _errors, n_set_bins=np.count_nonzero(_mask))
+        else:
+            for _bin_proxy, _bin_proxy_ref in zip(_new_tobject, _new_tobject_ref):
+                if hasattr(_bin_proxy, 'graph_'):
+                    # for TGraph etc.
+                    if _bin_proxy.y < _bin_proxy_ref.y:
+                        _bin_proxy.y.value = 0
+                        _bin_proxy.y.error_hi = 0
+                        # 'low' error setter has a bug in rootpy. workaround:
+                        _bin_proxy.graph_.SetPointEYlow(_bin_proxy.idx_, 0)
+                else:
+                    # for TH1D etc.
+                    if _bin_proxy.value < _bin_proxy_ref.value:
+                        _bin_proxy.value, _bin_proxy.error = 0, 0
 
         # cleanup
         _new_tobject_ref.Delete()
@@ -447,7 +598,7 @@ class _ROOTObjectFunctions(object):
                              "have different number or bins ({} and {})".format(
                                 len(tprofile_x)-2, len(tprofile_y)-2))
 
-        _dp_graph = Graph(len(tprofile_x)-2, type='errors')  # symmetric errors
+        _dp_graph = rootpy_plotting.Graph(len(tprofile_x)-2, type='errors')  # symmetric errors
 
         _i_point = 0
         for _i_bin, (_bin_proxy_x, _bin_proxy_y) in enumerate(zip(tprofile_x, tprofile_y)):
@@ -491,20 +642,33 @@ class _ROOTObjectFunctions(object):
     def normalize_x(tobject):
         """Normalize bin contents of each x slice of a TH2D by dividing by the y integral over each x slice."""
 
-        if not isinstance(tobject, _Hist2D):
+        if isinstance(tobject, ArrayHist) and tobject.dimension == 2:
+            _new_tobject = tobject.Clone()
+            _projection = tobject.ProjectionX()
+        elif rootpy_plotting_hist.imported and isinstance(tobject, rootpy_plotting_hist._Hist2D):
+            _new_tobject = rootpy.asrootpy(tobject.Clone())
+            #_projection = rootpy.asrootpy(tobject.ProjectionX(uuid.uuid4().get_hex(), 1, len(list(tobject.y()))-1))
+            _projection = rootpy.asrootpy(tobject.ProjectionX(uuid.uuid4().get_hex()))
+        else:
             raise ValueError("Cannot apply function `normalize_x` to object of type '{}': must be Hist2D [TH2D]!".format(type(tobject)))
 
-        _new_tobject = asrootpy(tobject.Clone())
-        #_projection = asrootpy(tobject.ProjectionX(uuid.uuid4().get_hex(), 1, len(list(tobject.y()))-1))
-        _projection = asrootpy(tobject.ProjectionX(uuid.uuid4().get_hex()))
-
         # divide 2D bin contents by integral over x slice (= result of ProjectionX())
-        for _bin_proxy in _new_tobject:
-            if _projection[_bin_proxy.xyz[0]].value:
-                _bin_proxy.value /= _projection[_bin_proxy.xyz[0]].value
-                _bin_proxy.error /= _projection[_bin_proxy.xyz[0]].value
-            else:
-                _bin_proxy.value, _bin_proxy.error = 0, 0
+        if _ROOTObjectFunctions._supports_arrays(_new_tobject, _projection):
+            _contents, _errors = _ROOTObjectFunctions._get_arrays(_new_tobject)
+            _integrals = _ROOTObjectFunctions._get_arrays(_projection)[0][_ROOTObjectFunctions._get_axis_bin_indices(_new_tobject, 0)]
+            _nonzero = _integrals != 0
+            _ROOTObjectFunctions._set_arrays(
+                _new_tobject,
+                np.divide(_contents, _integrals, out=np.zeros_like(_contents), where=_nonzero),
+                np.divide(_errors, _integrals, out=np.zeros_like(_errors), where=_nonzero),
+            )
+        else:
+            for _bin_proxy in _new_tobject:
+                if _projection[_bin_proxy.xyz[0]].value:
+                    _bin_proxy.value /= _projection[_bin_proxy.xyz[0]].value
+                    _bin_proxy.error /= _projection[_bin_proxy.xyz[0]].value
+                else:
+                    _bin_proxy.value, _bin_proxy.error = 0, 0
 
         _projection.Delete()  # cleanup
 
@@ -552,15 +716,15 @@ class _ROOTObjectFunctions(object):
         assert(th2d_response.GetNbinsY() == _nbins_reco)
         assert(th2d_response.GetNbinsY() == _nbins_reco)
 
-        _th2d_response_clone = asrootpy(th2d_response.Clone())
-        _th1d_input_clone = asrootpy(th1d_input.Clone())
+        _th2d_response_clone = rootpy.asrootpy(th2d_response.Clone())
+        _th1d_input_clone = rootpy.asrootpy(th1d_input.Clone())
 
         # determine relative fake rate per reco. bin
-        _th1d_true_reco = asrootpy(th2d_response.ProjectionY(uuid.uuid4().get_hex()))
+        _th1d_true_reco = rootpy.asrootpy(th2d_response.ProjectionY(uuid.uuid4().get_hex()))
         _th1d_true_fraction_reco = _th1d_true_reco / th1d_marginal_reco
 
         # determine absolute number of lost events per gen. bin
-        _th1d_accepted_gen = asrootpy(th2d_response.ProjectionX(uuid.uuid4().get_hex()))
+        _th1d_accepted_gen = rootpy.asrootpy(th2d_response.ProjectionX(uuid.uuid4().get_hex()))
         _th1d_rejected_gen = th1d_marginal_gen - _th1d_accepted_gen
 
         # correct reco. distribution for fakes using inferred true fraction
@@ -600,13 +764,13 @@ class _ROOTObjectFunctions(object):
         _th1d_true_fraction_reco.Delete()
         _tunfold.Delete()
 
-        return asrootpy(_th1d_output)
+        return rootpy.asrootpy(_th1d_output)
 
     @staticmethod
     def normalize_to_ref(tobject, tobject_ref):
         """Normalize `tobject` to the integral over `tobject_ref`."""
 
-        _new_tobject = asrootpy(tobject.Clone())
+        _new_tobject = rootpy.asrootpy(tobject.Clone())
         if tobject.integral():
             _factor = float(tobject_ref.integral()) / float(tobject.integral())
 
@@ -618,13 +782,13 @@ class _ROOTObjectFunctions(object):
     def cumulate(tobject):
         """Make value of n-th bin equal to the sum of all bins up to and including n (but excluding underflow bins)."""
         #                                     forward  suffix
-        return asrootpy(tobject.GetCumulative(True,    uuid.uuid4().get_hex()))
+        return rootpy.asrootpy(tobject.GetCumulative(True,    uuid.uuid4().get_hex()))
 
     @staticmethod
     def cumulate_reverse(tobject):
         """Make value of n-th bin equal to the sum of all bins from n up to and inclufing the last bin (but excluding overflow bins)."""
         #                                     forward  suffix
-        return asrootpy(tobject.GetCumulative(False,   uuid.uuid4().get_hex()))
+        return rootpy.asrootpy(tobject.GetCumulative(False,   uuid.uuid4().get_hex()))
 
     @staticmethod
     def bin_differences(tobject):
@@ -657,12 +821,502 @@ class _ROOTObjectFunctions(object):
         return _new_tobject
 
 
+class TFileHandlePool(object):
+    """A pool of open ROOT files, shared by all :py:class:`~DijetAnalysis.PostProcessing.Palisade.InputROOTFile` objects.
+
+    Files are kept open after use. Once more than `max_open_files` files are open,
+    the least recently used ones are closed. Files modified on disk since they were opened
+    are reopened on the next access. Access to the pool (and to the files
+    obtained from it) is serialized by a lock, so the pool can be used from several threads.
+
+    Usage example:
+
+    .. code:: python
+
+       pool = TFileHandlePool(max_open_files=8)
+
+       with pool.open('/path/to/rootfile.root') as tfile:
+           my_object = tfile.Get('MyDirectory/myObject')
+    """
+
+    def __init__(self, max_open_files=32):
+        self._max_open_files = max_open_files
+        self._handles = OrderedDict()  # tuples `(file, modification_time)`, least recently used first
+        self._n_users = {}
+        self._lock = threading.RLock()
+
+    @property
+    def max_open_files(self):
+        """Maximum number of files kept open."""
+        return self._max_open_files
+
+    @max_open_files.setter
+    def max_open_files(self, value):
+        with self._lock:
+            self._max_open_files = value
+            self._close_unused_files()
+
+    @staticmethod
+    def _open_file(filename):
+        '''open a file (overridden by pools for other file readers)'''
+        return rootpy_io.root_open(filename)
+
+    @staticmethod
+    def _close_file(handle):
+        '''close a file opened with `_open_file`'''
+        handle.Close()
+
+    @staticmethod
+    def _get_modification_time(filename):
+        if '://' in filename:
+            return None  # no metadata available for remote files
+        try:
+            return os.path.getmtime(filename)
+        except OSError:
+            return None
+
+    def _close_unused_files(self, keep=None):
+        '''close least recently used files which are not in use until at most `max_open_files` are open'''
+        for _filename in list(self._handles):
+            if len(self._handles) <= self._max_open_files:
+                break
+            if self._n_users.get(_filename, 0) == 0 and _filename != keep:
+                _tfile, _ = self._handles.pop(_filename)
+                self._close_file(_tfile)
+
+    @contextmanager
+    def open(self, filename):
+        """Context manager: get an open file from the pool, opening it if needed.
+        The pool is locked while the context is active."""
+        with self._lock:
+            _mtime = self._get_modification_time(filename)
+            _handle = self._handles.pop(filename, None)
+
+            # reopen files which have changed on disk (unless they are still in use)
+            if _handle is not None and _handle[1] != _mtime and not self._n_users.get(filename, 0):
+                self._close_file(_handle[0])
+                _handle = None
+
+            if _handle is None:
+                _handle = (self._open_file(filename), _mtime)
+
+            # (re)insert as most recently used
+            self._handles[filename] = _handle
+            self._n_users[filename] = self._n_users.get(filename, 0) + 1
+            try:
+                self._close_unused_files(keep=filename)
+                yield _handle[0]
+            finally:
+                self._n_users[filename] -= 1
+                self._close_unused_files()
+
+    def close(self, filename):
+        """Close a file, if it is open and not in use."""
+        with self._lock:
+            if filename in self._handles and not self._n_users.get(filename, 0):
+                _tfile, _ = self._handles.pop(filename)
+                self._close_file(_tfile)
+
+    def close_all(self):
+        """Close all open files which are not in use."""
+        with self._lock:
+            for _filename in list(self._handles):
+                self.close(_filename)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._handles)
+
+    def __contains__(self, filename):
+        with self._lock:
+            return filename in self._handles
+
+
+class NativeFileHandlePool(TFileHandlePool):
+    """A pool of ROOT files opened for reading with *uproot* instead of ROOT
+    (see :py:meth:`~DijetAnalysis.PostProcessing.Palisade.InputROOT.set_reader`)."""
+
+    @staticmethod
+    def _open_file(filename):
+        return open_native_file(filename)
+
+    @staticmethod
+    def _close_file(handle):
+        handle.file.close()
+
+
+class ObjectCache(object):
+    """A cache for ROOT objects (and other results) with a memory budget.
+
+    The memory taken up by each object is estimated from its type and, for histograms
+    and graphs, its number of bins or points. Once the total exceeds `max_bytes`,
+    the least recently used objects are evicted. Keys are tuples `(namespace, key)`,
+    which allows clearing all entries in a namespace at once. The number of cache
+    hits, misses and evictions is recorded. Access is serialized by a lock, so the
+    cache can be used from several threads.
+
+    Parameters
+    ----------
+        max_bytes : `int`, optional
+            memory budget in bytes. If `None`, the cache is unbounded.
+    """
+
+    # approximate memory used by each object, independent of its contents
+    _BYTES_PER_OBJECT = 1024
+    # size of histogram bin contents, by last character of the class name (e.g. 'TH1D', 'TH2F')
+    _BYTES_PER_BIN_CONTENT = {'D': 8, 'F': 4, 'I': 4, 'S': 2, 'C': 1}
+
+    def __init__(self, max_bytes=None):
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()  # tuples `(object, size)`, least recently used first
+        self._n_bytes = 0
+        self._lock = threading.RLock()
+        self.reset_stats()
+
+    @property
+    def max_bytes(self):
+        """Memory budget in bytes (`None` if unbounded)."""
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value):
+        with self._lock:
+            self._max_bytes = value
+            self._evict()
+
+    @property
+    def n_bytes(self):
+        """Estimated memory taken up by all cached objects."""
+        return self._n_bytes
+
+    @property
+    def stats(self):
+        """Dictionary with number of cache hits, misses and evictions, as well as the number of objects and their size."""
+        with self._lock:
+            return dict(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                n_objects=len(self._entries),
+                n_bytes=self._n_bytes,
+                max_bytes=self._max_bytes,
+            )
+
+    def reset_stats(self):
+        """Reset the number of cache hits, misses and evictions."""
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @classmethod
+    def estimate_size(cls, obj):
+        """Estimate the memory taken up by an object, in bytes."""
+        if isinstance(obj, (list, tuple)):
+            return sum([cls.estimate_size(_o) for _o in obj]) + sys.getsizeof(obj)
+        elif isinstance(obj, _ArrayObjectBase):
+            return cls._BYTES_PER_OBJECT + obj.nbytes
+        elif not ROOT.imported:
+            # no ROOT objects can exist
+            return sys.getsizeof(obj)
+        elif isinstance(obj, ROOT.TH1):
+            _class_name = obj.IsA().GetName()
+            if _class_name.startswith('TProfile'):
+                # bin contents, sums of squares and bin entries (and sums of squared weights)
+                _bytes_per_bin = 8 * (3 if obj.GetBinSumw2().GetSize() == 0 else 4)
+            else:
+                _bytes_per_bin = cls._BYTES_PER_BIN_CONTENT.get(_class_name[-1], 8)
+                if obj.GetSumw2N():
+                    _bytes_per_bin += 8
+            return cls._BYTES_PER_OBJECT + obj.GetNcells() * _bytes_per_bin
+        elif isinstance(obj, ROOT.TGraph):
+            # coordinates and (up to four) errors
+            return cls._BYTES_PER_OBJECT + obj.GetN() * 8 * 6
+        elif isinstance(obj, ROOT.TEfficiency):
+            return cls._BYTES_PER_OBJECT + cls.estimate_size(obj.GetTotalHistogram()) + cls.estimate_size(obj.GetPassedHistogram())
+        elif isinstance(obj, ROOT.TObject):
+            return cls._BYTES_PER_OBJECT
+        return sys.getsizeof(obj)
+
+    def _evict(self, keep=None):
+        '''evict least recently used objects until the memory budget is respected'''
+        if self._max_bytes is None:
+            return
+        for _key in list(self._entries):
+            if self._n_bytes <= self._max_bytes:
+                break
+            if _key == keep:
+                continue
+            _, _size = self._entries.pop(_key)
+            self._n_bytes -= _size
+            self._evictions += 1
+
+    def get(self, key, default=None):
+        """Retrieve an object from the cache, or return `default` if it is not present."""
+        with self._lock:
+            _entry = self._entries.pop(key, None)
+            if _entry is None:
+                self._misses += 1
+                return default
+            # reinsert as most recently used
+            self._entries[key] = _entry
+            self._hits += 1
+            return _entry[0]
+
+    def put(self, key, obj):
+        """Store an object in the cache, evicting other objects if needed."""
+        _size = self.estimate_size(obj)
+        with self._lock:
+            self.pop(key)
+            self._entries[key] = (obj, _size)
+            self._n_bytes += _size
+            self._evict(keep=key)
+
+    def pop(self, key, default=None):
+        """Remove an object from the cache and return it, or return `default` if it is not present."""
+        with self._lock:
+            _entry = self._entries.pop(key, None)
+            if _entry is None:
+                return default
+            self._n_bytes -= _entry[1]
+            return _entry[0]
+
+    def clear(self, namespace=None):
+        """Remove all objects, or only those with keys in `namespace`."""
+        with self._lock:
+            if namespace is None:
+                self._entries = OrderedDict()
+                self._n_bytes = 0
+                return
+            for _key in list(self._entries):
+                if _key[0] == namespace:
+                    self.pop(_key)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# sentinel for cache lookups (cached values may be `None`)
+_not_found = object()
+
+
+class PersistentCache(object):
+    """An on-disk cache for results of expensive input functions (e.g. unfolding).
+
+    Results are stored in `cache_dir`, keyed by a hash of the function identity (its module,
+    name and source code) and the *contents* of the arguments: for histograms, the binning,
+    bin contents, errors and number of entries are hashed, so that identical histograms
+    are recognized across Palisade invocations even if they were retrieved from different
+    file objects or have different names. ROOT objects are stored in ROOT files, all
+    other results are pickled.
+
+    Arguments whose contents cannot be hashed (e.g. arbitrary ROOT objects) raise a
+    :py:exc:`TypeError` when computing the key. Callers should then evaluate the function
+    without using the cache.
+
+    Parameters
+    ----------
+        cache_dir : `str`
+            directory in which to store the results (created if not existing)
+    """
+
+    # increment when changing the key or storage format, to invalidate existing entries
+    _FORMAT_VERSION = 2
+
+    def __init__(self, cache_dir):
+        self._cache_dir = cache_dir
+        if not os.path.isdir(self._cache_dir):
+            os.makedirs(self._cache_dir)
+
+    @property
+    def cache_dir(self):
+        """Directory in which the results are stored."""
+        return self._cache_dir
+
+    @staticmethod
+    def _update_hash_values(hasher, values):
+        '''update `hasher` with a sequence of floating-point values'''
+        hasher.update(np.asarray(values, dtype=np.float64).tobytes())
+
+    @classmethod
+    def _update_hash_profile(cls, hasher, edges, sum_arrays, error_option, entries):
+        '''update `hasher` with the binning and per-bin sums of a profile'''
+        for _edges in edges:
+            cls._update_hash_values(hasher, _edges)
+        for _key in sorted(sum_arrays):
+            hasher.update(_key.encode('utf-8'))
+            cls._update_hash_values(hasher, sum_arrays[_key])
+        hasher.update(repr(error_option).encode('utf-8'))
+        cls._update_hash_values(hasher, [entries])
+
+    @classmethod
+    def _update_hash_graph(cls, hasher, x_values, y_values, x_errors, y_errors):
+        '''update `hasher` with the points and (low, high) errors of a graph'''
+        for _array in (x_values, y_values, x_errors, y_errors):
+            cls._update_hash_values(hasher, _array)
+
+    @classmethod
+    def _update_hash(cls, hasher, obj):
+        '''update `hasher` with the contents of `obj`'''
+        if obj is None or isinstance(obj, (bool, float) + six.integer_types + six.string_types):
+            hasher.update(repr((type(obj).__name__, obj)).encode('utf-8'))
+        elif isinstance(obj, (list, tuple)):
+            hasher.update("{}[{}](".format(type(obj).__name__, len(obj)).encode('utf-8'))
+            for _item in obj:
+                cls._update_hash(hasher, _item)
+            hasher.update(b")")
+        elif isinstance(obj, Mapping):
+            hasher.update("dict[{}](".format(len(obj)).encode('utf-8'))
+            for _key in sorted(obj, key=repr):
+                cls._update_hash(hasher, _key)
+                cls._update_hash(hasher, obj[_key])
+            hasher.update(b")")
+        elif isinstance(obj, np.ndarray):
+            hasher.update("ndarray[{}, {}](".format(obj.dtype.str, obj.shape).encode('utf-8'))
+            hasher.update(np.ascontiguousarray(obj).tobytes())
+            hasher.update(b")")
+        elif isinstance(obj, ArrayHist):
+            hasher.update(type(obj).__name__.encode('utf-8'))
+            for _edges in obj.edges:
+                cls._update_hash_values(hasher, _edges)
+            cls._update_hash_values(hasher, obj.values)
+            cls._update_hash_values(hasher, obj.variances)
+            cls._update_hash_values(hasher, [obj.entries])
+        elif isinstance(obj, ArrayProfile):
+            hasher.update(type(obj).__name__.encode('utf-8'))
+            cls._update_hash_profile(hasher, obj.projection.edges, obj.sum_arrays, obj.error_option, obj.entries)
+        elif isinstance(obj, ArrayGraph):
+            hasher.update(type(obj).__name__.encode('utf-8'))
+            cls._update_hash_graph(hasher, obj.x_values, obj.y_values, obj.x_errors, obj.y_errors)
+        elif isinstance(obj, _ArrayObjectBase):
+            cls._update_hash(hasher, obj.to_root())
+        elif not ROOT.imported:
+            # no ROOT objects can exist
+            raise TypeError("Cannot compute content hash for object of type '{}'".format(type(obj).__name__))
+        elif isinstance(obj, ROOT.TEfficiency):
+            hasher.update(obj.IsA().GetName().encode('utf-8'))
+            cls._update_hash(hasher, obj.GetTotalHistogram())
+            cls._update_hash(hasher, obj.GetPassedHistogram())
+            cls._update_hash_values(hasher, [obj.GetStatisticOption(), obj.GetConfidenceLevel()])
+        elif isinstance(obj, ROOT.TProfile) or isinstance(obj, ROOT.TProfile2D) or isinstance(obj, ROOT.TProfile3D):
+            # contents are read from the ROOT buffers, without looping over the bins in Python
+            hasher.update(obj.IsA().GetName().encode('utf-8'))
+            _edges = [_get_root_axis_edges(_axis) for _axis in _get_root_axes(obj)]
+            cls._update_hash_profile(hasher, _edges, _get_root_profile_arrays(obj), obj.GetErrorOption(), obj.GetEntries())
+        elif isinstance(obj, ROOT.TH1):
+            hasher.update(obj.IsA().GetName().encode('utf-8'))
+            for _axis in _get_root_axes(obj):
+                cls._update_hash_values(hasher, _get_root_axis_edges(_axis))
+            for _array in _get_root_hist_arrays(obj):
+                cls._update_hash_values(hasher, _array)
+            cls._update_hash_values(hasher, [obj.GetEntries()])
+        elif isinstance(obj, ROOT.TGraph):
+            hasher.update(obj.IsA().GetName().encode('utf-8'))
+            cls._update_hash_graph(hasher, *_get_root_graph_arrays(obj))
+        else:
+            raise TypeError("Cannot compute content hash for object of type '{}'".format(type(obj).__name__))
+
+    @staticmethod
+    def _get_function_identity(func):
+        '''return a string identifying a function, including its source code (if available)'''
+        _func = getattr(func, '__wrapped__', func)
+        try:
+            _source = inspect.getsource(_func)
+        except (IOError, TypeError):
+            _source = ""
+        return "{}.{}:{}".format(
+            getattr(_func, '__module__', None),
+            getattr(_func, '__name__', type(_func).__name__),
+            hashlib.sha1(_source.encode('utf-8')).hexdigest(),
+        )
+
+    def get_key(self, func, args, kwargs):
+        """Return a key identifying a function call. Raises :py:exc:`TypeError` if an argument cannot be hashed."""
+        _hasher = hashlib.sha1()
+        self._update_hash(_hasher, [self._FORMAT_VERSION, self._get_function_identity(func)])
+        self._update_hash(_hasher, list(args))
+        self._update_hash(_hasher, dict(kwargs))
+        return _hasher.hexdigest()
+
+    def _get_paths(self, key):
+        '''return the paths for storing ROOT objects and pickled results under `key`'''
+        _path = os.path.join(self._cache_dir, key)
+        return _path + '.root', _path + '.pkl'
+
+    def load(self, key, default=None):
+        """Load the result stored under `key`, or return `default` if not available."""
+        _root_path, _pickle_path = self._get_paths(key)
+        if os.path.exists(_root_path):
+            _tfile = ROOT.TFile.Open(_root_path, "READ")
+            try:
+                _tobj = _tfile.Get('result')
+                if not _tobj:
+                    return default
+                # for histograms: move to global directory
+                try:
+                    _tobj.SetDirectory(0)
+                except AttributeError:
+                    pass
+            finally:
+                _tfile.Close()
+            return rootpy.asrootpy(_tobj)
+        elif os.path.exists(_pickle_path):
+            with open(_pickle_path, 'rb') as _f:
+                return pickle.load(_f)
+        return default
+
+    def store(self, key, result):
+        """Store `result` under `key`, replacing any existing result."""
+        _root_path, _pickle_path = self._get_paths(key)
+        _is_tobject = ROOT.imported and isinstance(result, ROOT.TObject)
+
+        # write to a temporary file first, so that incomplete results are never loaded
+        _fd, _tmp_path = tempfile.mkstemp(dir=self._cache_dir, suffix='.root' if _is_tobject else '.pkl')
+        os.close(_fd)
+        try:
+            if _is_tobject:
+                _tfile = ROOT.TFile.Open(_tmp_path, "RECREATE")
+                _tfile.WriteTObject(result, 'result')
+                _tfile.Close()
+                os.rename(_tmp_path, _root_path)
+            else:
+                with open(_tmp_path, 'wb') as _f:
+                    pickle.dump(result, _f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.rename(_tmp_path, _pickle_path)
+        except Exception:
+            if os.path.exists(_tmp_path):
+                os.remove(_tmp_path)
+            raise
+
+    def clear(self):
+        """Remove all stored results."""
+        for _filename in os.listdir(self._cache_dir):
+            if _filename.endswith('.root') or _filename.endswith('.pkl'):
+                os.remove(os.path.join(self._cache_dir, _filename))
+
+# cache shared by all input modules
+_object_cache_max_mb = os.getenv('PALISADE_CACHE_SIZE_MB')
+_object_cache = ObjectCache(max_bytes=int(float(_object_cache_max_mb) * 1024**2) if _object_cache_max_mb else None)
+
+
 class InputROOTFile(object):
     """An input module for accessing objects from a single ROOT file.
 
     Multiple objects can be requested. They will be all be retrieved
     simultaneously and cached on the first subsequent call to `get()`.
-    The file will thus only be opened once.
+    Open files are kept in a :py:class:`~DijetAnalysis.PostProcessing.Palisade.TFileHandlePool`
+    shared by all instances, so that files are not reopened for every batch of requests.
+    The maximum number of open files can be configured via
+    :py:meth:`~DijetAnalysis.PostProcessing.Palisade.InputROOTFile.set_max_open_files` or
+    the environment variable ``PALISADE_MAX_OPEN_FILES``.
+
+    Retrieved objects are stored in an :py:class:`~DijetAnalysis.PostProcessing.Palisade.ObjectCache`
+    shared by all instances (see :py:meth:`~DijetAnalysis.PostProcessing.Palisade.InputROOT.set_cache_size`).
+    Objects evicted from the cache are retrieved again (using the original request) when needed.
 
     Usage example:
 
@@ -674,19 +1328,58 @@ class InputROOTFile(object):
        my_object = m.get('MyDirectory/myObject')
     """
 
+    # if True, convert retrieved ROOT objects to array-backed objects
+    _array_objects = os.getenv('PALISADE_ARRAY_OBJECTS', '0') not in ('', '0')
+
+    # reader used for retrieving objects: 'root' or 'native' (see `InputROOT.set_reader`)
+    _reader = os.getenv('PALISADE_READER') or 'root'
+
+    # pools of open files shared by all instances
+    _file_handle_pool = TFileHandlePool(max_open_files=int(os.getenv('PALISADE_MAX_OPEN_FILES') or 32))
+    _native_file_handle_pool = NativeFileHandlePool(max_open_files=int(os.getenv('PALISADE_MAX_OPEN_FILES') or 32))
+
     def __init__(self, filename):
         self._filename = filename
         self._outstanding_requests = dict()
-        self._plot_data_cache = dict()
+        self._request_specs = dict()  # for retrieving objects again after eviction from cache
+        self._plot_data_cache = _object_cache
+        self._cache_namespace = uuid.uuid4().hex
 
-    def _process_outstanding_requests(self):
-        # if no requests, return immediately
-        if not self._outstanding_requests:
-            return
+    @classmethod
+    def set_max_open_files(cls, max_open_files):
+        """Set the maximum number of files kept open by all instances."""
+        cls._file_handle_pool.max_open_files = max_open_files
+        cls._native_file_handle_pool.max_open_files = max_open_files
+
+    @classmethod
+    def close_all_files(cls):
+        """Close all files kept open by all instances."""
+        cls._file_handle_pool.close_all()
+        cls._native_file_handle_pool.close_all()
+
+    @classmethod
+    def reset_file_handle_pools(cls):
+        """Replace the pools of open files with empty ones, without closing the files.
+        Must be called in processes created by forking, so that files opened by the
+        parent process are not shared with it."""
+        cls._file_handle_pool = TFileHandlePool(max_open_files=cls._file_handle_pool.max_open_files)
+        cls._native_file_handle_pool = NativeFileHandlePool(max_open_files=cls._native_file_handle_pool.max_open_files)
 
-        # process outstanding requests
-        with root_open(self._filename) as _tfile:
-            for tobj_path, request_spec in six.iteritems(self._outstanding_requests):
+    @staticmethod
+    def _get_seek_key(tfile, object_path):
+        '''return the position of an object in a ROOT file (or 0, if not found)'''
+        _dirname, _, _name = object_path.rpartition('/')
+        _dir = ROOT.TDirectory.GetDirectory(tfile, _dirname) if _dirname else tfile
+        _key = _dir.GetKey(_name) if _dir else None
+        return _key.GetSeekKey() if _key else 0
+
+    def _read_objects_root(self, requests, retrieved_objects):
+        '''retrieve requested objects using ROOT and add them to `retrieved_objects`'''
+        with self._file_handle_pool.open(self._filename) as _tfile:
+            # read objects in the order in which they are stored in the file
+            _object_paths = sorted(requests, key=lambda _path: self._get_seek_key(_tfile, _path))
+            for tobj_path in _object_paths:
+                request_spec = requests[tobj_path]
                 _rebin_factor = request_spec.pop('rebin_factor', None)
                 _profile_error_option = request_spec.pop('profile_error_option', None)
 
@@ -708,10 +1401,57 @@ class InputROOTFile(object):
                     # TOOD: check if profile?
                     _tobj.SetErrorOption(_profile_error_option)
 
-                self._plot_data_cache[tobj_path] = _tobj
+                # convert to array-backed object (if requested)
+                if self._array_objects:
+                    _tobj = to_array_object(_tobj)
+
+                retrieved_objects[tobj_path] = _tobj
+
+    def _read_objects_native(self, requests, retrieved_objects):
+        '''retrieve requested objects without using ROOT and add them to `retrieved_objects` (as
+        array-backed objects only if enabled). Return the requests for objects which cannot be read this way.'''
+        _remaining_requests = {}
+        with self._native_file_handle_pool.open(self._filename) as _file:
+            for tobj_path, request_spec in six.iteritems(requests):
+                try:
+                    _tobj = read_array_object(
+                        _file, tobj_path,
+                        rebin_factor=request_spec.get('rebin_factor', None),
+                        profile_error_option=request_spec.get('profile_error_option', None),
+                    )
+                except NotImplementedError:
+                    _remaining_requests[tobj_path] = request_spec
+                    continue
+
+                # return the same types of objects as when reading with ROOT
+                if not self._array_objects:
+                    _tobj = to_root_object(_tobj)
+
+                retrieved_objects[tobj_path] = _tobj
+        return _remaining_requests
+
+    def _process_outstanding_requests(self):
+        '''retrieve all requested objects, store them in the cache and return them as a dict'''
+        # if no requests, return immediately
+        if not self._outstanding_requests:
+            return {}
+
+        _retrieved_objects = {}
+
+        # process outstanding requests (objects which cannot be read natively are read with ROOT)
+        _requests = self._outstanding_requests
+        if self._reader == 'native':
+            _requests = self._read_objects_native(_requests, _retrieved_objects)
+        if _requests:
+            self._read_objects_root(_requests, _retrieved_objects)
+
+        for tobj_path, _tobj in six.iteritems(_retrieved_objects):
+            self._plot_data_cache.put((self._cache_namespace, tobj_path), _tobj)
 
         self._outstanding_requests = dict()
 
+        return _retrieved_objects
+
 
     def get(self, object_path):
         """
@@ -721,17 +1461,17 @@ class InputROOTFile(object):
         ----------
             object_path : string, path to resource in ROOT file (e.g. "directory/object")
         """
-        # request object if not present
+        # return cached object, if present and not waiting to be (re)requested
         if object_path not in self._outstanding_requests:
-            if object_path not in self._plot_data_cache:
-                self.request([dict(object_path=object_path)])
+            _obj = self._plot_data_cache.get((self._cache_namespace, object_path))
+            if _obj is not None:
+                return _obj
 
-        # process request if object is waiting
-        if object_path in self._outstanding_requests:
-            self._process_outstanding_requests()
+            # request object (again, if evicted from cache)
+            self.request([dict(self._request_specs.get(object_path, {}), object_path=object_path)])
 
-        # return object
-        return self._plot_data_cache[object_path]
+        # process requests and return object
+        return self._process_outstanding_requests()[object_path]
 
     def request(self, request_specs):
         """
@@ -747,18 +1487,208 @@ class InputROOTFile(object):
             _force_rerequest = request_spec.pop('force_rerequest', True)
 
             # override earlier request iff 'force_rerequest' is True
-            if (not (_object_path in self._outstanding_requests or _object_path in self._plot_data_cache)) or _force_rerequest:
+            _cache_key = (self._cache_namespace, _object_path)
+            if (not (_object_path in self._outstanding_requests or _cache_key in self._plot_data_cache)) or _force_rerequest:
                 self._outstanding_requests[_object_path] = request_spec
+                self._request_specs[_object_path] = dict(request_spec)
 
-                if _object_path in self._plot_data_cache:
-                    del self._plot_data_cache[_object_path]
+                self._plot_data_cache.pop(_cache_key)
 
     def clear(self):
         """
         Remove all cached data and outstanding requests.
         """
-        self._plot_data_cache = {}
+        self._plot_data_cache.clear(namespace=self._cache_namespace)
         self._outstanding_requests = {}
+        self._request_specs = {}
+
+
+def _contains_array_objects(obj, native_types=()):
+    '''check if `obj` is (or contains) an array-backed object which is not an instance of `native_types`'''
+    if isinstance(obj, (list, tuple)):
+        return any(_contains_array_objects(_o, native_types) for _o in obj)
+    return isinstance(obj, _ArrayObjectBase) and not isinstance(obj, native_types)
+
+
+def _with_array_object_conversion(f, native_types=()):
+    '''wrap an input function so that array-backed objects passed to it (except for instances
+    of `native_types`) are converted to ROOT objects, and its results converted back'''
+    @functools.wraps(f)
+    def _wrapped_function(*args, **kwargs):
+        if not _contains_array_objects(list(args) + list(kwargs.values()), native_types):
+            return f(*args, **kwargs)
+
+        _args = to_root_object(args)
+        _kwargs = {_key: to_root_object(_value) for _key, _value in six.iteritems(kwargs)}
+        return to_array_object(f(*_args, **_kwargs))
+
+    _wrapped_function.__wrapped__ = f
+    return _wrapped_function
+
+
+class _CompiledExpression(object):
+    '''An expression parsed once into an AST and compiled into nested closures, together
+    with the specifications of all objects in files it references. Shared between the
+    request and evaluation phases of :py:class:`InputROOT`.'''
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.node = ast.parse(expression, mode='eval').body
+        self._evaluate = self._compile_node(self.node)
+
+        # strings and identifiers containing a colon are object specifications
+        _object_specs = []
+        for _node in ast.walk(self.node):
+            if isinstance(_node, ast.Name):
+                _obj_spec = _node.id
+            elif isinstance(_node, ast.Str):
+                _obj_spec = _node.s
+            else:
+                continue
+
+            if ':' in _obj_spec and _obj_spec not in _object_specs:
+                _object_specs.append(_obj_spec)
+        self.object_specs = tuple(_object_specs)
+
+    def evaluate(self, input_root, ctx):
+        '''evaluate the expression using the input module `input_root` and the evaluation context `ctx`'''
+        return self._evaluate(input_root, ctx)
+
+    @classmethod
+    def _compile_node(cls, node):
+        '''return a function `f(input_root, ctx)` evaluating an AST node. The structure of the
+        tree is resolved once, while locals, functions and objects are looked up on evaluation.'''
+        if node is None:
+            return lambda input_root, ctx: None
+
+        elif isinstance(node, ast.Name):  # <identifier>
+            _id = node.id
+            # restrict subset of supported literals
+            _is_literal = _id in ('True', 'False', 'None')
+            _literal = ast.literal_eval(_id) if _is_literal else None
+
+            def _eval_name(input_root, ctx):
+                # lookup identifiers in local namespace
+                if _id in ctx['locals']:
+                    return input_root._eval_local(ctx['locals'][_id])
+                # if no local is found, try a few builtin Python literals
+                elif _is_literal:
+                    return _literal
+                # if nothing above matched, assume mistyped identifier and give up
+                # NOTE: do *not* assume identifier is a ROOT file path. ROOT file paths
+                # must be given explicitly as strings.
+                raise NameError("Cannot resolve identifier '{}': not a valid Python literal or a registered local variable!".format(_id))
+            return _eval_name
+
+        elif isinstance(node, ast.Str):  # <string> : array column
+            _string = node.s
+            # lookup in ROOT file or return string as-is
+            return lambda input_root, ctx: input_root.get(_string) if ctx['input'] else _string
+
+        elif isinstance(node, ast.Num):  # <number>
+            _number = node.n
+            return lambda input_root, ctx: _number
+
+        elif isinstance(node, ast.Call):  # node names containing parentheses (interpreted as 'Call' objects)
+            # -- determine function to call
+
+            # function handle is a simple identifier
+            if isinstance(node.func, ast.Name):
+                _func_id = node.func.id
+
+                def _get_callable(input_root, ctx):
+                    # handle special functions
+                    if _func_id in input_root.special_functions:
+                        _spec_func_spec = input_root.special_functions[_func_id]
+                        # callable for special function (default to no-op), modified evaluation context
+                        return _spec_func_spec.get('func', lambda x: x), dict(ctx, **_spec_func_spec.get('ctx', {}))
+
+                    # call a registered input function
+                    try:
+                        return ctx['functions'][_func_id], ctx
+                    except KeyError as e:
+                        raise KeyError(
+                            "Cannot call input function '{}': no such "
+                            "function!".format(_func_id))
+
+            # function handle is an expression: evaluate 'func' as any other node
+            else:
+                _eval_func = cls._compile_node(node.func)
+
+                def _get_callable(input_root, ctx):
+                    return _eval_func(input_root, ctx), ctx
+
+            # starred kwargs (**) not supported for the moment
+            if getattr(node, 'kwargs', None):
+                return cls._compile_error(NotImplementedError(
+                    "Unpacking keyword arguments in expressions via "
+                    "** is not supported. Expression was: '{}'".format(
+                        ast.dump(node, annotate_fields=False))))
+
+            # unpacked positional arguments, if any
+            _eval_starargs = cls._compile_node(getattr(node, 'starargs', None))
+            _eval_args = [cls._compile_node(_arg) for _arg in node.args]
+            _eval_kwargs = [(_keyword.arg, cls._compile_node(_keyword.value)) for _keyword in node.keywords]
+
+            def _eval_call(input_root, ctx):
+                _callable, _ctx = _get_callable(input_root, ctx)
+                _starargs_values = _eval_starargs(input_root, _ctx) or []
+
+                # evaluate arguments
+                _args = [_eval_arg(input_root, _ctx) for _eval_arg in _eval_args] + list(_starargs_values)
+                _kwargs = {
+                    _arg_name : _eval_arg(input_root, _ctx)
+                    for _arg_name, _eval_arg in _eval_kwargs
+                }
+
+                # call function
+                return _callable(*_args, **_kwargs)
+            return _eval_call
+
+        elif isinstance(node, ast.BinOp):  # <left> <operator> <right>
+            _op_type = type(node.op)
+            _eval_left, _eval_right = cls._compile_node(node.left), cls._compile_node(node.right)
+            return lambda input_root, ctx: ctx['operators'][_op_type](_eval_left(input_root, ctx), _eval_right(input_root, ctx))
+
+        elif isinstance(node, ast.UnaryOp):  # <operator> <operand> e.g., -1
+            _op_type = type(node.op)
+            _eval_operand = cls._compile_node(node.operand)
+            return lambda input_root, ctx: ctx['operators'][_op_type](_eval_operand(input_root, ctx))
+
+        elif isinstance(node, ast.Subscript):  # <value>[<index>] or <value>[<lower>:<upper>:<step>]
+            _eval_value = cls._compile_node(node.value)
+            if isinstance(node.slice, ast.Slice):  # support subscripting via slice
+                _eval_lower, _eval_upper, _eval_step = [
+                    cls._compile_node(_n) for _n in (node.slice.lower, node.slice.upper, node.slice.step)]
+                return lambda input_root, ctx: _eval_value(input_root, ctx)[
+                    _eval_lower(input_root, ctx):_eval_upper(input_root, ctx):_eval_step(input_root, ctx)]
+
+            # support subscripting via simple index (wrapped in `ast.Index` before Python 3.9)
+            _eval_index = cls._compile_node(node.slice.value if isinstance(node.slice, ast.Index) else node.slice)
+            return lambda input_root, ctx: _eval_value(input_root, ctx)[_eval_index(input_root, ctx)]
+
+        elif isinstance(node, ast.Attribute):  # <value>.<attr>
+            _attr = node.attr
+            _eval_value = cls._compile_node(node.value)
+            return lambda input_root, ctx: getattr(_eval_value(input_root, ctx), _attr)
+
+        elif isinstance(node, ast.List):  # list of node names
+            _eval_elements = [cls._compile_node(_el) for _el in node.elts]
+            return lambda input_root, ctx: [_eval_el(input_root, ctx) for _eval_el in _eval_elements]
+
+        elif isinstance(node, ast.Tuple):  # tuple of node names
+            _eval_elements = [cls._compile_node(_el) for _el in node.elts]
+            return lambda input_root, ctx: tuple(_eval_el(input_root, ctx) for _eval_el in _eval_elements)
+
+        # unsupported nodes: raise on evaluation, as the expression may never be evaluated
+        return cls._compile_error(TypeError(node))
+
+    @staticmethod
+    def _compile_error(exception):
+        '''return a function raising `exception` when evaluated'''
+        def _raise(input_root, ctx):
+            raise exception
+        return _raise
 
 
 class InputROOT(object):
@@ -784,17 +1714,31 @@ class InputROOT(object):
     }
 
     # input functions (meant to be applied to ROOT objects in files)
-    functions = dict(
-        _ROOTObjectFunctions.get_all(),
-        # add some useful aliases
-        **{
-            'h':                                   _ROOTObjectFunctions.project_x,  # alias
-            'hist':                                _ROOTObjectFunctions.project_x,  # alias
-        }
-    )
+    functions = {
+        _name : _with_array_object_conversion(
+            _function,
+            native_types=(ArrayHist,) if _name in _ROOTObjectFunctions._ARRAY_HIST_FUNCTIONS else ())
+        for _name, _function in six.iteritems(dict(
+            _ROOTObjectFunctions.get_all(),
+            # add some useful aliases
+            **{
+                'h':                                   _ROOTObjectFunctions.project_x,  # alias
+                'hist':                                _ROOTObjectFunctions.project_x,  # alias
+            }
+        ))
+    }
 
     # class-level cache for storing memoized function results
-    _cache = {}
+    # (shared with the input file objects, under a separate namespace)
+    _cache = _object_cache
+    _CACHE_NAMESPACE_MEMOIZED = '__memoized__'
+
+    # class-level cache of compiled expressions, least recently used first
+    _compiled_expressions = OrderedDict()
+    _MAX_COMPILED_EXPRESSIONS = 10000
+
+    # class-level on-disk cache for results of functions added with `persistent=True`
+    _persistent_cache = PersistentCache(os.getenv('PALISADE_PERSISTENT_CACHE_DIR')) if os.getenv('PALISADE_PERSISTENT_CACHE_DIR') else None
 
     def __init__(self, files_spec=None):
         """
@@ -853,7 +1797,7 @@ class InputROOT(object):
         return _file_nickname, _object_path_in_file
 
     @classmethod
-    def add_function(cls, function=None, name=None, override=False, memoize=False):
+    def add_function(cls, function=None, name=None, override=False, memoize=False, persistent=False, array_objects=False):
         '''Register a user-defined input function. Can also be used as a decorator.
 
         .. note::
@@ -874,6 +1818,19 @@ class InputROOT(object):
                 subsequent call with identical arguments, the result will be retrieved
                 from the cache instead of evaluating the function again.
                 (*default*: ``False``)
+            persistent : `bool`, optional
+                if ``True``, store function results on disk, so that they can be reused by
+                later Palisade invocations. Calls are identified by the function source code
+                and the *contents* of the arguments. Has no effect unless a cache directory
+                has been set via
+                :py:meth:`~DijetAnalysis.PostProcessing.Palisade.InputROOT.set_persistent_cache_dir`
+                (*default*: ``False``)
+            array_objects : `bool`, optional
+                if ``True``, the function accepts array-backed histograms
+                (:py:class:`~DijetAnalysis.PostProcessing.Palisade.ArrayHist`) as arguments.
+                Otherwise, array-backed objects are converted to ROOT objects before calling
+                the function (see :py:meth:`~DijetAnalysis.PostProcessing.Palisade.InputROOT.set_array_objects`).
+                (*default*: ``False``)
 
         Usage examples:
 
@@ -930,21 +1887,42 @@ class InputROOT(object):
                 "'{}': it already exists and `override` not explicitly allowed!".format(name))
 
 
-        if memoize:
+        if memoize or persistent:
+            _memoize_in_memory = memoize
+
             def memoize(f):
                 @functools.wraps(f)
                 def _memoized_function(*args, **kwargs):
                     # compute unique hash key for the argument structure
-                    key = HashableMap(func=f, args=args, kwargs=kwargs)
+                    key = (cls._CACHE_NAMESPACE_MEMOIZED, HashableMap(func=f, args=args, kwargs=kwargs)) if _memoize_in_memory else None
 
                     # look up in cache
-                    if key in cls._cache:
-                        # return if found
-                        return cls._cache[key]
+                    if _memoize_in_memory:
+                        _result = cls._cache.get(key, _not_found)
+                        if _result is not _not_found:
+                            # return if found
+                            return _result
+
+                    # look up in persistent cache, if requested
+                    _persistent_key = None
+                    if persistent and cls._persistent_cache is not None:
+                        try:
+                            _persistent_key = cls._persistent_cache.get_key(f, args, kwargs)
+                        except TypeError as _err:
+                            print("[WARNING] Not using persistent cache for function '{}': {}".format(f.__name__, _err))
+                        else:
+                            _result = cls._persistent_cache.load(_persistent_key, _not_found)
+                            if _result is not _not_found:
+                                if _memoize_in_memory:
+                                    cls._cache.put(key, _result)
+                                return _result
 
                     # compute and store if not found
                     _result = f(*args, **kwargs)
-                    cls._cache[key] = _result
+                    if _memoize_in_memory:
+                        cls._cache.put(key, _result)
+                    if _persistent_key is not None:
+                        cls._persistent_cache.store(_persistent_key, _result)
 
                     return _result
 
@@ -952,7 +1930,7 @@ class InputROOT(object):
 
             def _decorator(f):
                 # replace 'f' with a version enabling memoization of results
-                f = memoize(f)
+                f = memoize(_with_array_object_conversion(f, native_types=(ArrayHist,) if array_objects else ()))
 
                 # add memoized function to mapping
                 cls.functions[name or f.__name__] = f
@@ -960,6 +1938,8 @@ class InputROOT(object):
                 return f
         else:
             def _decorator(f):
+                f = _with_array_object_conversion(f, native_types=(ArrayHist,) if array_objects else ())
+
                 # add user-specified function to mapping
                 cls.functions[name or f.__name__] = f
 
@@ -1033,6 +2013,11 @@ class InputROOT(object):
         _ic = self._get_input_controller_for_file(_file_nickname)
         return _ic.get(_object_path_in_file)
 
+    def process_requests(self):
+        """Retrieve all requested objects from all registered files now, instead of on
+        the first :py:meth:`~DijetAnalysis.PostProcessing.Palisade.InputROOT.get` call."""
+        for _ic in six.itervalues(self._input_controllers):
+            _ic._process_outstanding_requests()
 
     def request(self, request_specs):
         """
@@ -1173,15 +2158,15 @@ class InputROOT(object):
         if locals is not None:
             _locals = dict(self._locals, **locals)
 
-        expr = expr.strip()   # extraneous spaces otherwise interpreted as indentation
+        _compiled_expr = self._compile_expr(expr)
 
-        self._request_all_objects_in_expression(expr)
+        self._request_all_objects_in_expression(_compiled_expr)
 
-        _result = self._eval(node=ast.parse(expr, mode='eval').body,
-                             ctx=dict(operators=self.operators,
-                                      functions=self.functions,
-                                      locals=_locals,
-                                      input=True))
+        _result = _compiled_expr.evaluate(self,
+                                          ctx=dict(operators=self.operators,
+                                                   functions=self.functions,
+                                                   locals=_locals,
+                                                   input=True))
 
         # raise exceptions unable to be raised during `_eval` for technical reasons
         # (e.g. due to expressions with self-referencing local variables that would
@@ -1191,21 +2176,31 @@ class InputROOT(object):
 
         return _result
 
+    @classmethod
+    def _compile_expr(cls, expr):
+        '''parse an expression, or retrieve it from the cache if it has been parsed before'''
+        _compiled_expr = cls._compiled_expressions.pop(expr, None)
+        if _compiled_expr is None:
+            # extraneous spaces otherwise interpreted as indentation
+            _compiled_expr = _CompiledExpression(expr.strip())
+
+            # make room for new entry
+            while len(cls._compiled_expressions) >= cls._MAX_COMPILED_EXPRESSIONS:
+                cls._compiled_expressions.popitem(last=False)
+
+        # (re)insert as most recently used
+        cls._compiled_expressions[expr] = _compiled_expr
+        return _compiled_expr
+
     def _request_all_objects_in_expression(self, expr, **other_request_params):
-        """Walk through the expression AST and request an object for each string or identifier"""
-        _ast = ast.parse(expr, mode='eval')
-        _reqs = []
-        for _node in ast.walk(_ast):
-            if isinstance(_node, ast.Name):
-                _obj_spec = _node.id
-            elif isinstance(_node, ast.Str):
-                _obj_spec = _node.s
-            else:
-                continue
+        """Request an object for each string or identifier in the expression (given as a string or compiled)"""
+        if not isinstance(expr, _CompiledExpression):
+            expr = self._compile_expr(expr)
 
-            if ':' in _obj_spec:
-                _reqs.append(dict(object_spec=_obj_spec, force_rerequest=False, **other_request_params))
-        self.request(_reqs)
+        self.request([
+            dict(object_spec=_obj_spec, force_rerequest=False, **other_request_params)
+            for _obj_spec in expr.object_specs
+        ])
 
     def register_local(self, name, value, override=False):
         """
@@ -1234,138 +2229,90 @@ class InputROOT(object):
         """
         self._locals = dict()
 
-    def _eval(self, node, ctx):
-        """Evaluate an AST node"""
-        if node is None:
-            return None
-        elif isinstance(node, ast.Name):  # <identifier>
-            # lookup identifiers in local namespace
-            if node.id in ctx['locals']:
-                _local = ctx['locals'][node.id]
-
-                # if local variable contains a list, evaluate each element by threading 'get_expr' over it
-                if isinstance(_local, list):
-                    _retlist = []
-                    for _local_el in _local:
-                        # non-string elements are simply passed through
-                        if not isinstance(_local_el, str):
-                            _retlist.append(_local_el)
-                            continue
-
-                        # string-valued elements are evaluated
-                        try:
-                            # NOTE: local variable lookup is disabled when threading
-                            # over lists that were stored in local variables themselves.
-                            # This is done to prevent infinite recursion errors for
-                            # expressions which may reference themselves
-                            _ret_el = self.get_expr(_local_el, locals=None)
-                        except NameError as e:
-                            # one element of the list references a local variable
-                            # -> stop evaluation and return dummy
-                            # use NameError object instead of None to identifiy
-                            # dummy elements unambiguously later
-                            _retlist.append(e)
-                        else:
-                            # evaluation succeeded
-                            _retlist.append(_ret_el)
-                    return _retlist
-                # local variables containing strings are parsed
-                elif isinstance(_local, str):
-                    return self.get_expr(_local, locals=None)
-                # all other types are simply passed through
-                else:
-                    return _local
-
-            # if no local is found, try a few builtin Python literals
-            elif node.id in ('True', 'False', 'None'):  # restrict subset of supported literals
-                return ast.literal_eval(node.id)  # returns corresponding Python literal from string
-
-            # if nothing above matched, assume mistyped identifier and give up
-            # NOTE: do *not* assume identifier is a ROOT file path. ROOT file paths
-            # must be given explicitly as strings.
-            else:
-                raise NameError("Cannot resolve identifier '{}': not a valid Python literal or a registered local variable!".format(node.id))
-        elif isinstance(node, ast.Str): # <string> : array column
-            if ctx['input']:
-                # lookup in ROOT file
-                return self.get(node.s)
-            else:
-                # return string as-is
-                return node.s
-        elif isinstance(node, ast.Num): # <number>
-            return node.n
-        elif isinstance(node, ast.Call): # node names containing parentheses (interpreted as 'Call' objects)
-            # -- determine function to call
-
-            # function handle is a simple identifier
-            if isinstance(node.func, ast.Name):
-
-                # handle special functions
-                if node.func.id in self.special_functions:
-                    _spec_func_spec = self.special_functions[node.func.id]
-                    # callable for special function (default to no-op)
-                    _callable = _spec_func_spec.get('func', lambda x: x)
-                    # modify avaluation context for special function
-                    ctx = dict(ctx, **_spec_func_spec.get('ctx', {}))
+    def _eval_local(self, local):
+        '''evaluate a local variable referenced in an expression'''
+        # if local variable contains a list, evaluate each element by threading 'get_expr' over it
+        if isinstance(local, list):
+            _retlist = []
+            for _local_el in local:
+                # non-string elements are simply passed through
+                if not isinstance(_local_el, str):
+                    _retlist.append(_local_el)
+                    continue
 
-                # call a registered input function
+                # string-valued elements are evaluated
+                try:
+                    # NOTE: local variable lookup is disabled when threading
+                    # over lists that were stored in local variables themselves.
+                    # This is done to prevent infinite recursion errors for
+                    # expressions which may reference themselves
+                    _ret_el = self.get_expr(_local_el, locals=None)
+                except NameError as e:
+                    # one element of the list references a local variable
+                    # -> stop evaluation and return dummy
+                    # use NameError object instead of None to identifiy
+                    # dummy elements unambiguously later
+                    _retlist.append(e)
                 else:
-                    try:
-                        _callable = ctx['functions'][node.func.id]
-                    except KeyError as e:
-                        raise KeyError(
-                            "Cannot call input function '{}': no such "
-                            "function!".format(node.func.id))
+                    # evaluation succeeded
+                    _retlist.append(_ret_el)
+            return _retlist
+        # local variables containing strings are parsed
+        elif isinstance(local, str):
+            return self.get_expr(local, locals=None)
+        # all other types are simply passed through
+        else:
+            return local
 
-            # function handle is an expression
-            else:
-                # evaluate 'func' as any other node
-                _callable = self._eval(node.func, ctx)
+    @classmethod
+    def clear_cache(cls):
+        """Remove all memoized function results from the cache."""
+        cls._cache.clear(namespace=cls._CACHE_NAMESPACE_MEMOIZED)
 
-            # evaluate unpacked positional arguments, if any
-            _starargs_values = []
-            if node.starargs is not None:
-                _starargs_values = self._eval(node.starargs, ctx)
+    @classmethod
+    def set_cache_size(cls, max_bytes):
+        """Set the memory budget (in bytes) of the cache shared by all input modules. Once exceeded,
+        the least recently used objects (retrieved from files or memoized function results) are evicted.
+        Use `None` for an unbounded cache. The initial value can also be specified in MB via the
+        environment variable ``PALISADE_CACHE_SIZE_MB``."""
+        cls._cache.max_bytes = max_bytes
 
-            # starred kwargs (**) not supported for the moment
-            if node.kwargs:
-                raise NotImplementedError(
-                    "Unpacking keyword arguments in expressions via "
-                    "** is not supported. Expression was: '{}'".format(
-                        ast.dump(node, annotate_fields=False)))
+    @classmethod
+    def set_persistent_cache_dir(cls, cache_dir):
+        """Set the directory in which results of functions added with ``persistent=True``
+        are stored. Use `None` to disable the on-disk cache. The directory can also be
+        specified via the environment variable ``PALISADE_PERSISTENT_CACHE_DIR``."""
+        cls._persistent_cache = PersistentCache(cache_dir) if cache_dir is not None else None
 
-            # evaluate arguments
-            _args = map(lambda _arg: self._eval(_arg, ctx), node.args) + _starargs_values
-            _kwargs = {
-                _keyword.arg : self._eval(_keyword.value, ctx)
-                for _keyword in node.keywords
-            }
+    @classmethod
+    def set_array_objects(cls, enabled):
+        """If `enabled`, histograms, profiles and graphs retrieved from files are converted to
+        array-backed objects (:py:class:`~DijetAnalysis.PostProcessing.Palisade.ArrayHist`,
+        :py:class:`~DijetAnalysis.PostProcessing.Palisade.ArrayProfile` and
+        :py:class:`~DijetAnalysis.PostProcessing.Palisade.ArrayGraph`), which avoids creating
+        a new ROOT object for each operation in an expression. Input functions not
+        supporting these objects receive ROOT objects instead. Can also be enabled
+        by setting the environment variable ``PALISADE_ARRAY_OBJECTS=1``."""
+        InputROOTFile._array_objects = enabled
 
-            # call function
-            return _callable(*_args, **_kwargs)
-        elif isinstance(node, ast.BinOp): # <left> <operator> <right>
-            return ctx['operators'][type(node.op)](self._eval(node.left, ctx), self._eval(node.right, ctx))
-        elif isinstance(node, ast.UnaryOp): # <operator> <operand> e.g., -1
-            return ctx['operators'][type(node.op)](self._eval(node.operand, ctx))
-        elif isinstance(node, ast.Subscript): # <operator> <operand> e.g., -1
-            if isinstance(node.slice, ast.Index): # support subscripting via simple index
-                return self._eval(node.value, ctx)[self._eval(node.slice.value, ctx)]
-            elif isinstance(node.slice, ast.Slice): # support subscripting via slice
-                return self._eval(node.value, ctx)[self._eval(node.slice.lower, ctx):self._eval(node.slice.upper, ctx):self._eval(node.slice.step, ctx)]
-            else:
-                raise TypeError(node)
-        elif isinstance(node, ast.Attribute): # <value>.<attr>
-            return getattr(self._eval(node.value, ctx), node.attr)
-        elif isinstance(node, ast.List): # list of node names
-            return [self._eval(_el, ctx) for _el in node.elts]
-        elif isinstance(node, ast.Tuple): # tuple of node names
-            return tuple(self._eval(_el, ctx) for _el in node.elts)
-        else:
-            raise TypeError(node)
+    @classmethod
+    def set_reader(cls, reader):
+        """Set the reader used for retrieving objects from files. With ``'root'`` (default),
+        objects are read using ROOT. With ``'native'``, histograms, profiles and graphs are read
+        with the pure-Python library *uproot* directly into array-backed objects (see
+        :py:meth:`~DijetAnalysis.PostProcessing.Palisade.InputROOT.set_array_objects`),
+        decompressing only the requested objects. These are converted to ROOT objects unless
+        array-backed objects are enabled. Other objects, and objects requested with options
+        not supported by the native reader, are read using ROOT. The reader can also be
+        specified via the environment variable ``PALISADE_READER``."""
+        if reader not in ('root', 'native'):
+            raise ValueError("Unknown reader '{}': expected 'root' or 'native'!".format(reader))
+        InputROOTFile._reader = reader
 
     @classmethod
-    def clear_cache(cls):
-        cls._cache = {}
+    def get_cache_stats(cls):
+        """Return statistics of the cache shared by all input modules (hits, misses, evictions, etc.)."""
+        return cls._cache.stats
 
     # functions with special meanings/side effects
     # when encountered in expressions, these functions can change the
@@ -1379,3 +2326,8 @@ class InputROOT(object):
         # get argument as string (i.e. without ROOT input)
         'str':      dict(func=str, ctx=dict(input=False)),
     }
+
+
+# expensive built-in functions: store results on disk (if a persistent cache directory is set)
+for _function_name in ('unfold', 'efficiency', 'efficiency_graph'):
+    InputROOT.add_function(getattr(_ROOTObjectFunctions, _function_name), override=True, persistent=True)
@@ -3,11 +3,15 @@
 
 import abc
 import ast
+import functools
 import six
 import operator
+import threading
+
+from contextlib import contextmanager
 
 __all__ = [
-    'lazify',
+    'lazify', 'intern_nodes', 'evaluation_cache',
     'LazyNodeBase', 'LazyIterableNodeBase',
     'Lazy', 'Map', 'List', 'String', 'FormatString',
     'If', 'Try',
@@ -84,6 +88,126 @@ def lazify(obj):
         return Lazy(obj)
 
 
+# stores the results of lazy node evaluations in the active `evaluation_cache` scope (if any)
+_evaluation_state = threading.local()
+
+
+@contextmanager
+def evaluation_cache():
+    """Context manager: within the scope, the result of evaluating a lazy node with
+    a particular context is stored and returned for any further evaluation of the same node
+    with the same context. The stored results are released when leaving the scope.
+
+    This avoids evaluating subtrees shared between several nodes (see
+    :py:func:`~Palisade.intern_nodes`) more than once. Within the scope, the evaluation
+    context and the objects referenced by the nodes should not be modified."""
+    _previous_cache = getattr(_evaluation_state, 'cache', None)
+    _evaluation_state.cache = {}
+    try:
+        yield
+    finally:
+        _evaluation_state.cache = _previous_cache
+
+
+def _memoize_eval(eval_method):
+    '''wrap the `eval` method of a lazy node class to look up results in the active evaluation cache'''
+    @functools.wraps(eval_method)
+    def _eval(self, context=None):
+        _cache = getattr(_evaluation_state, 'cache', None)
+        if _cache is None or not self._memoize:
+            return eval_method(self, context)
+        _key = (id(self), id(context))
+        try:
+            return _cache[_key][2]
+        except KeyError:
+            _result = eval_method(self, context)
+            # containers may be modified by the caller: never share them between evaluations
+            if isinstance(_result, (dict, list)):
+                return _result
+            # keep references to node and context, so that their `id` cannot be reused
+            _cache[_key] = (self, context, _result)
+            return _result
+    return _eval
+
+
+class _LazyNodeMeta(abc.ABCMeta):
+    '''metaclass for lazy nodes: enables memoization of `eval` in all subclasses'''
+
+    def __new__(mcs, name, bases, namespace):
+        _eval = namespace.get('eval', None)
+        if _eval is not None and not getattr(_eval, '__isabstractmethod__', False):
+            namespace['eval'] = _memoize_eval(_eval)
+        return super(_LazyNodeMeta, mcs).__new__(mcs, name, bases, namespace)
+
+
+def _get_field_key(value):
+    '''return a hashable key identifying the value of a lazy node field'''
+    if isinstance(value, LazyNodeBase):
+        # nodes are compared by identity (after interning, structurally equal nodes are identical)
+        return ('node', id(value))
+    elif isinstance(value, list):
+        return ('list', tuple(_get_field_key(_v) for _v in value))
+    try:
+        _key = ('value', type(value), value)
+        hash(_key)
+        return _key
+    except TypeError:
+        # unhashable values are compared by identity
+        return ('id', id(value))
+
+
+def _intern(obj, table, interned):
+    '''recursively replace lazy nodes in `obj` with the structurally identical nodes in `table`'''
+    if isinstance(obj, LazyNodeBase):
+        if id(obj) in interned:
+            return interned[id(obj)][1]
+
+        _attr_names = ['_' + _f for _f in obj._fields]
+        if set(obj.__dict__) != set(_attr_names):
+            # node has state not described by its fields: do not merge
+            _canonical_obj = obj
+        else:
+            # note: values contained in `Lazy` are never evaluated, so they are left untouched
+            for _attr_name in (_attr_names if not isinstance(obj, Lazy) else []):
+                _value = obj.__dict__[_attr_name]
+                if isinstance(_value, LazyNodeBase):
+                    obj.__dict__[_attr_name] = _intern(_value, table, interned)
+                elif isinstance(_value, list):
+                    obj.__dict__[_attr_name] = [_intern(_v, table, interned) for _v in _value]
+            _key = (type(obj),) + tuple(_get_field_key(obj.__dict__[_attr_name]) for _attr_name in _attr_names)
+            _canonical_obj = table.setdefault(_key, obj)
+
+        # keep a reference to the original node, so that its `id` cannot be reused
+        interned[id(obj)] = (obj, _canonical_obj)
+        return _canonical_obj
+
+    elif isinstance(obj, dict):
+        for _k, _v in six.iteritems(obj):
+            obj[_k] = _intern(_v, table, interned)
+    elif isinstance(obj, list):
+        for _i, _v in enumerate(obj):
+            obj[_i] = _intern(_v, table, interned)
+    return obj
+
+
+def intern_nodes(obj, table=None):
+    """Merge structurally identical lazy nodes (hash-consing).
+
+    All lazy nodes in `obj` (which can be a lazy node or a dict or list containing lazy
+    nodes) are replaced by a canonical node with the same type and identical fields,
+    such that identical subtrees are represented by a single node. Dicts and lists are
+    modified in place. The canonical nodes are stored in the dict `table`, which can
+    be passed to further calls in order to share nodes across several objects.
+
+    Combined with :py:func:`~Palisade.evaluation_cache`, identical subtrees are then
+    only evaluated once for each context.
+
+    Returns `obj`, or its canonical node if it is a lazy node."""
+    if table is None:
+        table = {}
+    return _intern(obj, table, {})
+
+
 def _add_operators(cls):
     """class decorator for implementing common operator methods for nodes"""
 
@@ -98,12 +222,15 @@ def _add_operators(cls):
 
 
 @_add_operators
-@six.add_metaclass(abc.ABCMeta)
+@six.add_metaclass(_LazyNodeMeta)
 class LazyNodeBase(object):
     """The abstract base class from which all lazy node objects must inherit."""
 
     _fields = tuple()
 
+    # if True, results are stored in the active `evaluation_cache` (if any)
+    _memoize = True
+
     def __init__(self, *args, **kwargs):
         """Default constructor: parse all arguments as field names and nodes"""
         _nargs = len(args) + len(kwargs)
@@ -243,6 +370,7 @@ class Lazy(LazyNodeBase):
     must be called explicitly."""
 
     _fields = ('value',)
+    _memoize = False
 
     def __init__(self, value):
         self._value = value
@@ -270,6 +398,7 @@ class Map(LazyNodeBase):
     inside a :py:class:`~Palisade.Lazy` container."""
 
     _fields = ('keys', 'values')
+    _memoize = False  # evaluates to a new `dict` each time
 
     def __init__(self, mapping):
         self._keys = list(map(lazify, mapping.keys()))
@@ -312,6 +441,7 @@ class List(LazyIterableNodeBase):
     inside a :py:class:`~Palisade.Lazy` container."""
 
     _fields = ('elts',)
+    _memoize = False  # evaluates to a new `list` each time
 
     def __init__(self, elts):
         self._elts = list(map(lazify, elts))
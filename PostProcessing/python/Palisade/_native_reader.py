@@ -0,0 +1,153 @@
+"""Reading histograms, profiles and graphs from ROOT files without ROOT.
+
+The files are read with the pure-Python library *uproot*, which decompresses
+only the objects which are actually accessed. Objects are returned as
+array-backed objects (see :py:mod:`._array_objects`).
+"""
+from __future__ import print_function
+
+import numpy as np
+
+from ._array_objects import ArrayHist, ArrayProfile, ArrayGraph
+from ._root import rootpy_io
+
+
+__all__ = ['read_array_object', 'open_native_file']
+
+
+# ROOT `TProfile` error modes, by value of the `fErrorMode` member
+_PROFILE_ERROR_OPTIONS = {0: '', 1: 's', 2: 'i', 3: 'g'}
+
+_uproot = None
+
+
+def _get_uproot():
+    '''import uproot on first use'''
+    global _uproot
+    if _uproot is None:
+        try:
+            import uproot
+        except ImportError:
+            print("[ERROR] Native ROOT file reader requested, but `uproot` is not installed!")
+            raise
+        _uproot = uproot
+    return _uproot
+
+
+def open_native_file(filename):
+    """Open a ROOT file for reading with *uproot*. Only the file header and the top-level
+    directory are read; objects are read and decompressed when accessed."""
+    return _get_uproot().open(filename)
+
+
+def _to_global_bin_order(array):
+    '''flatten a (multidimensional) array of bins, indexed as [x, y, z], so that the x index runs fastest'''
+    return np.ravel(np.asarray(array, dtype=np.float64), order='F')
+
+
+def _get_edges(obj):
+    '''return the bin edges for each axis of an uproot histogram'''
+    return [np.asarray(_axis.edges(), dtype=np.float64) for _axis in obj.axes]
+
+
+def _read_hist(obj, rebin_factor=None):
+    if obj.member('fBinStatErrOpt') != 0:
+        raise NotImplementedError("Cannot read histogram with non-default bin error option natively!")
+
+    _values = _to_global_bin_order(obj.values(flow=True))
+    _sumw2 = obj.member('fSumw2')
+    if len(_sumw2) == len(_values):
+        _variances = np.asarray(_sumw2, dtype=np.float64)
+    else:
+        _variances = np.abs(_values)
+
+    _hist = ArrayHist(
+        edges=_get_edges(obj),
+        values=_values,
+        variances=_variances,
+        entries=obj.member('fEntries'),
+        name=obj.member('fName'),
+        title=obj.member('fTitle'),
+    )
+    if rebin_factor is not None:
+        _hist = _hist.rebin(rebin_factor)
+    return _hist
+
+
+def _read_profile(obj, rebin_factor=None, profile_error_option=None):
+    if rebin_factor is not None:
+        raise NotImplementedError("Cannot rebin profiles read natively!")
+
+    _error_option = profile_error_option
+    if _error_option is None:
+        _error_option = _PROFILE_ERROR_OPTIONS[obj.member('fErrorMode')]
+
+    _means = _to_global_bin_order(obj.values(flow=True))
+    _errors = _to_global_bin_order(obj.errors(flow=True, error_mode=_error_option))
+
+    _obj = ArrayProfile()
+    _obj.name = obj.member('fName')
+    _obj.title = obj.member('fTitle')
+    _obj.error_option = _error_option
+    _obj.entries = obj.member('fEntries')
+
+    _sumw = np.asarray(obj.member('fBinEntries'), dtype=np.float64)
+    _obj.sum_arrays = dict(
+        sumw=_sumw,
+        sumwy=_means * _sumw,  # means are zero for empty bins
+        sumwy2=np.asarray(obj.member('fSumw2'), dtype=np.float64),
+    )
+    _bin_sumw2 = obj.member('fBinSumw2')
+    if len(_bin_sumw2):
+        _obj.sum_arrays['sumw2'] = np.asarray(_bin_sumw2, dtype=np.float64)
+
+    _obj.projection = ArrayHist(
+        edges=_get_edges(obj),
+        values=_means, variances=np.square(_errors), entries=_obj.entries, name=_obj.name, title=_obj.title,
+    )
+    return _obj
+
+
+def _read_graph(obj):
+    _classname = obj.classname
+    _x_values = np.asarray(obj.member('fX'), dtype=np.float64)
+    _y_values = np.asarray(obj.member('fY'), dtype=np.float64)
+    _x_errors = _y_errors = None
+    if _classname == 'TGraphErrors':
+        _x_errors = np.repeat(np.asarray(obj.member('fEX'), dtype=np.float64)[:, np.newaxis], 2, axis=1)
+        _y_errors = np.repeat(np.asarray(obj.member('fEY'), dtype=np.float64)[:, np.newaxis], 2, axis=1)
+    elif _classname == 'TGraphAsymmErrors':
+        _x_errors = np.stack([obj.member('fEXlow'), obj.member('fEXhigh')], axis=1)
+        _y_errors = np.stack([obj.member('fEYlow'), obj.member('fEYhigh')], axis=1)
+
+    return ArrayGraph(
+        _x_values, _y_values, _x_errors, _y_errors,
+        name=obj.member('fName'),
+        title=obj.member('fTitle'),
+    )
+
+
+def read_array_object(native_file, object_path, rebin_factor=None, profile_error_option=None):
+    """Read a histogram, profile or graph from a file opened with :py:func:`open_native_file`
+    and return it as an array-backed object.
+
+    Raises `NotImplementedError` for objects which cannot be read natively
+    (other classes, or unsupported options). These can be read with ROOT instead.
+    Raises :py:exc:`rootpy.io.DoesNotExist` if the object is not found, as when reading with ROOT.
+    """
+    try:
+        _obj = native_file[object_path]
+    except KeyError:
+        # note: uproot's `KeyInFileError` derives from `KeyError`
+        raise rootpy_io.DoesNotExist("requested path '{}' does not exist in {}".format(
+            object_path, getattr(native_file, 'file_path', native_file)))
+    _classname = _obj.classname
+
+    if _classname.startswith('TProfile'):
+        return _read_profile(_obj, rebin_factor=rebin_factor, profile_error_option=profile_error_option)
+    elif _classname[:3] in ('TH1', 'TH2', 'TH3'):
+        return _read_hist(_obj, rebin_factor=rebin_factor)
+    elif _classname in ('TGraph', 'TGraphErrors', 'TGraphAsymmErrors') and rebin_factor is None:
+        return _read_graph(_obj)
+
+    raise NotImplementedError("Cannot read object '{}' of class '{}' natively!".format(object_path, _classname))
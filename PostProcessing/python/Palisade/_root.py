@@ -0,0 +1,53 @@
+"""Deferred imports of ROOT and rootpy.
+
+Importing ROOT takes several seconds. The modules below are therefore only imported
+when one of their attributes is first accessed. When objects are read with the
+native reader into array-backed objects (see :py:meth:`InputROOT.set_reader`),
+figures can be produced without importing ROOT at all.
+
+Since an object can only be a ROOT object if ROOT has been imported, type checks
+against ROOT classes should be guarded by :py:attr:`_DeferredModule.imported`.
+"""
+import importlib
+import sys
+
+
+class _DeferredModule(object):
+    '''stand-in for a module, which is imported on first attribute access'''
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._import_callbacks = []
+
+    @property
+    def imported(self):
+        '''whether the module has been imported (here or elsewhere)'''
+        return self._module is not None or self._name in sys.modules
+
+    def on_import(self, callback):
+        '''call `callback` with the module as soon as it has been imported'''
+        if self.imported:
+            callback(self._get_module())
+        else:
+            self._import_callbacks.append(callback)
+
+    def _get_module(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+            while self._import_callbacks:
+                self._import_callbacks.pop(0)(self._module)
+        return self._module
+
+    def __getattr__(self, attr):
+        # only called for attributes not set in `__init__`
+        return getattr(self._get_module(), attr)
+
+
+ROOT = _DeferredModule('ROOT')
+rootpy = _DeferredModule('rootpy')
+rootpy_context = _DeferredModule('rootpy.context')
+rootpy_io = _DeferredModule('rootpy.io')
+rootpy_plotting = _DeferredModule('rootpy.plotting')
+rootpy_plotting_hist = _DeferredModule('rootpy.plotting.hist')
+rootpy_plotting_profile = _DeferredModule('rootpy.plotting.profile')
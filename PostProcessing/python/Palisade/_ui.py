@@ -92,6 +92,9 @@ class PalisadeCLI(object):
 
 
     def __init__(self):
+        # number of worker processes to use by default in processors (`None`: as set by the task)
+        self._n_jobs = None
+
         # retrieve runner arguments and analysis config
         self._args, self._task_module = self._get_cli_args_and_task()
 
@@ -204,9 +207,18 @@ class PalisadeCLI(object):
             # task-specific parser configuration
             _task_module.cli(_task_cli_parser)
 
+            # number of worker processes, unless the task defines an option with the same name itself
+            _add_jobs_option = not any(_option in _task_cli_parser._option_string_actions for _option in ('-j', '--jobs'))
+            if _add_jobs_option:
+                _task_cli_parser.add_argument('-j', '--jobs', type=int, default=1, help="Number of worker processes over which processors "
+                                              "run by the task distribute their work, if supported (e.g. producing figures). Default: %(default)s")
+
             # ignore "global" arguments
             _task_cli_args = _task_cli_parser.parse_args(sys.argv[4:])
 
+            if _add_jobs_option:
+                self._n_jobs = _task_cli_args.jobs
+
             return _task_cli_args, _task_module
         else:
             # no subcommand specified, presumably called for help only
@@ -223,5 +235,10 @@ class PalisadeCLI(object):
         if self._task_module is None:
             raise NotImplemented
         else:
+            # processors run by the task use the number of worker processes given on the command line
+            if self._n_jobs is not None:
+                from .Processors._base import _ProcessorBase
+                _ProcessorBase.set_default_n_jobs(self._n_jobs)
+
             # run the task
             self._task_module.run(self._args)
@@ -0,0 +1,69 @@
+"""Compare the run time of the vectorized (NumPy) and bin-loop implementations of
+the Palisade input functions for large histograms.
+
+Usage: python benchmark_input_functions.py [N_BINS_X N_BINS_Y]
+"""
+from __future__ import print_function
+
+import sys
+import timeit
+
+import numpy as np
+
+from rootpy.plotting import Hist2D
+
+from Karma.PostProcessing.Palisade._input import _ROOTObjectFunctions
+
+
+def _make_random_hist(n_bins_x, n_bins_y, seed):
+    _rng = np.random.RandomState(seed)
+    _hist = Hist2D(n_bins_x, 0, 1, n_bins_y, 0, 1, type='D')
+    _n_entries = 20 * n_bins_x * n_bins_y
+    _hist.FillN(_n_entries, _rng.uniform(size=_n_entries), _rng.uniform(size=_n_entries), _rng.exponential(size=_n_entries))
+    return _hist
+
+
+def _get_bins(tobject):
+    return np.array([(_bin.value, _bin.error) for _bin in tobject])
+
+
+def main(n_bins_x=300, n_bins_y=300):
+    _h1 = _make_random_hist(n_bins_x, n_bins_y, seed=1)
+    _h2 = _make_random_hist(n_bins_x, n_bins_y, seed=2)
+    _threshold = _h1.GetMaximum() / 2.0
+    _indices = _ROOTObjectFunctions.threshold(_h1, _threshold)
+
+    _function_args = [
+        ('yerr', (_h1,)),
+        ('atleast', (_h1, _threshold)),
+        ('threshold', (_h1, _threshold)),
+        ('bin_width', (_h1,)),
+        ('max', (_h1, _h2)),
+        ('max_val_min_err', (_h1, _h2)),
+        ('mask_if_less', (_h1, _h2)),
+        ('select', ([_h1, _h2], _indices)),
+        ('max_yield_index', ([_h1, _h2], [_h2, _h1], 0.0)),
+        ('normalize_x', (_h1,)),
+    ]
+
+    print("Histograms with {} x {} bins ({} cells)".format(n_bins_x, n_bins_y, _h1.GetNcells()))
+    print("{:<20s} {:>12s} {:>12s} {:>10s}  {}".format("function", "loop [s]", "arrays [s]", "speedup", "same result"))
+    for _function_name, _args in _function_args:
+        _function = getattr(_ROOTObjectFunctions, _function_name)
+
+        _ROOTObjectFunctions.use_arrays = False
+        _time_loop = timeit.timeit(lambda: _function(*_args), number=1)
+        _result_loop = _get_bins(_function(*_args))
+
+        _ROOTObjectFunctions.use_arrays = True
+        _n_repeat = 10
+        _time_arrays = timeit.timeit(lambda: _function(*_args), number=_n_repeat) / _n_repeat
+        _result_arrays = _get_bins(_function(*_args))
+
+        print("{:<20s} {:>12.4f} {:>12.4f} {:>9.1f}x  {}".format(
+            _function_name, _time_loop, _time_arrays, _time_loop / _time_arrays,
+            np.allclose(_result_loop, _result_arrays)))
+
+
+if __name__ == "__main__":
+    main(*[int(_arg) for _arg in sys.argv[1:3]])
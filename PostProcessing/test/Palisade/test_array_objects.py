@@ -0,0 +1,232 @@
+import numpy as np
+import operator as op
+import os
+import shutil
+import tempfile
+import unittest2 as unittest
+
+try:
+    import uproot
+except ImportError:
+    uproot = None
+
+from rootpy.io import root_open, DoesNotExist
+from rootpy.plotting import Profile1D
+from rootpy.plotting.hist import _Hist
+
+from Karma.PostProcessing.Palisade import ArrayHist, ArrayProfile, ColumnarStore, InputROOT, to_array_object
+
+
+class TestArrayHist(unittest.TestCase):
+
+    def setUp(self):
+        with root_open('ref/test.root') as _tfile:
+            self._objects = {}
+            for _name in ('h1', 'h2', 'h2d'):
+                self._objects[_name] = _tfile.Get(_name)
+                self._objects[_name].SetDirectory(0)
+
+    def _assert_same_bins(self, tobject_1, tobject_2):
+        self.assertEqual(len(tobject_1), len(tobject_2))
+        for _bin_1, _bin_2 in zip(tobject_1, tobject_2):
+            self.assertAlmostEqual(_bin_1.value, _bin_2.value)
+            self.assertAlmostEqual(_bin_1.error, _bin_2.error)
+
+    def test_round_trip(self):
+        for _name in ('h1', 'h2d'):
+            with self.subTest(object=_name):
+                _array_hist = ArrayHist.from_root(self._objects[_name])
+                self.assertEqual(_array_hist.GetNcells(), self._objects[_name].GetNcells())
+                self._assert_same_bins(_array_hist.to_root(), self._objects[_name])
+                self.assertEqual(_array_hist.to_root().GetEntries(), self._objects[_name].GetEntries())
+
+    def test_arithmetic(self):
+        _h1, _h2 = self._objects['h1'], self._objects['h2']
+        _array_h1, _array_h2 = ArrayHist.from_root(_h1), ArrayHist.from_root(_h2)
+        for _symbol, _op in [('+', op.add), ('-', op.sub), ('*', op.mul), ('/', op.truediv)]:
+            with self.subTest(operation=_symbol):
+                self._assert_same_bins(_op(_array_h1, _array_h2).to_root(), _op(_h1, _h2))
+        with self.subTest(operation='scalar'):
+            self._assert_same_bins((3 * _array_h1).to_root(), 3 * _h1)
+            self._assert_same_bins((_array_h1 / 2.0).to_root(), _h1 / 2.0)
+
+    def test_plot_accessors(self):
+        for _name, _properties in [('h1', ('x', 'xerr', 'xwidth', 'xedges', 'y', 'yerr')), ('h2d', ('xedges', 'yedges', 'z'))]:
+            _array_hist = ArrayHist.from_root(self._objects[_name])
+            for _property_name in _properties:
+                with self.subTest(object=_name, property=_property_name):
+                    np.testing.assert_allclose(
+                        getattr(_array_hist, _property_name)(),
+                        np.array(list(getattr(self._objects[_name], _property_name)())),
+                    )
+
+    def test_to_array_object_lists(self):
+        _converted = to_array_object([self._objects['h1'], 42])
+        self.assertIsInstance(_converted[0], ArrayHist)
+        self.assertEqual(_converted[1], 42)
+
+
+class TestArrayProfile(unittest.TestCase):
+
+    def setUp(self):
+        self._profile = Profile1D(5, 0, 5)
+        self._profile.SetDirectory(0)
+        for _x, _y, _w in [(0.5, 1.0, 1.0), (0.5, 3.0, 2.0), (2.5, -1.0, 0.5), (4.5, 7.0, 1.0), (7.0, 2.0, 1.0)]:
+            self._profile.Fill(_x, _y, _w)
+
+    def test_round_trip(self):
+        _array_profile = ArrayProfile.from_root(self._profile)
+        _tobject = _array_profile.to_root()
+        self.assertEqual(_tobject.GetNcells(), self._profile.GetNcells())
+        for _i in range(self._profile.GetNcells()):
+            with self.subTest(bin=_i):
+                self.assertAlmostEqual(_tobject.GetBinContent(_i), self._profile.GetBinContent(_i))
+                self.assertAlmostEqual(_tobject.GetBinError(_i), self._profile.GetBinError(_i))
+                self.assertAlmostEqual(_tobject.GetBinEntries(_i), self._profile.GetBinEntries(_i))
+        self.assertEqual(_tobject.GetEntries(), self._profile.GetEntries())
+
+    def test_to_array_object(self):
+        self.assertIsInstance(to_array_object(self._profile), ArrayProfile)
+
+    def test_from_sum_arrays(self):
+        for _error_option in ('', 's', 'i', 'g'):
+            with self.subTest(error_option=_error_option):
+                self._profile.SetErrorOption(_error_option)
+                _array_profile = ArrayProfile.from_root(self._profile)
+                _from_sums = ArrayProfile.from_sum_arrays(
+                    _array_profile.projection.edges, _array_profile.sum_arrays, error_option=_error_option)
+                np.testing.assert_allclose(_from_sums.projection.values, _array_profile.projection.values)
+                np.testing.assert_allclose(_from_sums.projection.variances, _array_profile.projection.variances)
+
+
+class TestColumnarStore(unittest.TestCase):
+
+    def setUp(self):
+        self._store_path = os.path.join(tempfile.mkdtemp(), 'out_columnar')
+        _arrays = {
+            'split/h_x/edges_x': np.array([0.0, 1.0, 2.0]),
+            'split/h_x/sumw': np.array([0.0, 1.0, 2.0, 0.0]),
+            'split/h_x/sumw2': np.array([0.0, 1.0, 4.0, 0.0]),
+            'split/y/h2d_x/edges_x': np.array([0.0, 1.0]),
+            'split/y/h2d_x/edges_y': np.array([0.0, 1.0, 2.0]),
+            'split/y/h2d_x/sumw': np.arange(12.0).reshape(3, 4),  # indexed as [x, y]
+            'split/y/h2d_x/sumw2': np.arange(12.0).reshape(3, 4),
+            '_index_paths': np.array(['split/h_x', 'split/y/h2d_x']),
+            '_index_classes': np.array(['TH1D', 'TH2D']),
+            '_index_entries': np.array([3.0, 66.0]),
+            '_index_error_options': np.array(['', '']),
+        }
+        for _array_path, _array in _arrays.items():
+            _file_path = os.path.join(self._store_path, _array_path + '.npy')
+            if not os.path.isdir(os.path.dirname(_file_path)):
+                os.makedirs(os.path.dirname(_file_path))
+            np.save(_file_path, _array)
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self._store_path))
+
+    def test_get_objects(self):
+        with ColumnarStore(self._store_path) as _store:
+            self.assertEqual(_store.keys(), ['split/h_x', 'split/y/h2d_x'])
+
+            _hist = _store.get('split/h_x')
+            self.assertIsInstance(_hist, ArrayHist)
+            np.testing.assert_allclose(_hist.values, [0.0, 1.0, 2.0, 0.0])
+            self.assertEqual(_hist.GetEntries(), 3.0)
+
+            # global bin index runs fastest in 'x'
+            _hist_2d = _store.get('split/y/h2d_x')
+            self.assertEqual(_hist_2d.dimension, 2)
+            np.testing.assert_allclose(_hist_2d.values[:4], [0.0, 4.0, 8.0, 1.0])
+
+    def test_missing_object_raises(self):
+        with ColumnarStore(self._store_path) as _store:
+            with self.assertRaises(KeyError):
+                _store.get('split/inexistent')
+
+
+class TestInputROOTArrayObjects(unittest.TestCase):
+
+    def setUp(self):
+        InputROOT.set_array_objects(True)
+        self._ic = InputROOT()
+        self._ic.add_file('ref/test.root', nickname='test')
+
+    def tearDown(self):
+        InputROOT.set_array_objects(False)
+
+    def test_get_returns_array_objects(self):
+        self.assertIsInstance(self._ic.get('test:h1'), ArrayHist)
+
+    def test_get_expr_matches_root_objects(self):
+        _expressions = [
+            '"test:h1" + "test:h2"',
+            'yerr("test:h1")',             # supports array objects
+            'discard_errors("test:h1")',   # evaluated on ROOT objects
+        ]
+        for _expression in _expressions:
+            with self.subTest(expression=_expression):
+                InputROOT.set_array_objects(True)
+                _ic_arrays = InputROOT()
+                _ic_arrays.add_file('ref/test.root', nickname='test')
+                _result_arrays = _ic_arrays.get_expr(_expression)
+
+                InputROOT.set_array_objects(False)
+                _ic_root = InputROOT()
+                _ic_root.add_file('ref/test.root', nickname='test')
+                _result_root = _ic_root.get_expr(_expression)
+
+                self.assertIsInstance(_result_arrays, ArrayHist)
+                self.assertIsInstance(_result_root, _Hist)
+                for _bin_1, _bin_2 in zip(_result_arrays.to_root(), _result_root):
+                    self.assertAlmostEqual(_bin_1.value, _bin_2.value)
+                    self.assertAlmostEqual(_bin_1.error, _bin_2.error)
+
+
+@unittest.skipIf(uproot is None, "native reader requires `uproot`")
+class TestInputROOTNativeReader(unittest.TestCase):
+
+    def tearDown(self):
+        InputROOT.set_reader('root')
+        InputROOT.set_array_objects(False)
+
+    def _get_object(self, reader, request_spec, array_objects=True):
+        InputROOT.set_reader(reader)
+        InputROOT.set_array_objects(array_objects)
+        _ic = InputROOT()
+        _ic.add_file('ref/test.root', nickname='test')
+        _ic.request([dict(request_spec, file_nickname='test')])
+        return _ic.get('test:' + request_spec['object_path'])
+
+    def test_native_matches_root(self):
+        _request_specs = [
+            dict(object_path='h1'),
+            dict(object_path='h2d'),
+            dict(object_path='h1', rebin_factor=2),
+        ]
+        for _request_spec in _request_specs:
+            with self.subTest(**_request_spec):
+                _native_object = self._get_object('native', _request_spec)
+                _root_object = self._get_object('root', _request_spec)
+                self.assertIsInstance(_native_object, ArrayHist)
+                for _native_edges, _root_edges in zip(_native_object.edges, _root_object.edges):
+                    np.testing.assert_allclose(_native_edges, _root_edges)
+                np.testing.assert_allclose(_native_object.values, _root_object.values)
+                np.testing.assert_allclose(_native_object.variances, _root_object.variances)
+                self.assertEqual(_native_object.GetEntries(), _root_object.GetEntries())
+
+    def test_native_returns_root_objects_unless_array_objects(self):
+        _native_object = self._get_object('native', dict(object_path='h1'), array_objects=False)
+        _root_object = self._get_object('root', dict(object_path='h1'), array_objects=False)
+        self.assertIsInstance(_native_object, _Hist)
+        for _bin_1, _bin_2 in zip(_native_object, _root_object):
+            self.assertAlmostEqual(_bin_1.value, _bin_2.value)
+            self.assertAlmostEqual(_bin_1.error, _bin_2.error)
+
+    def test_native_missing_object(self):
+        with self.assertRaises(DoesNotExist):
+            self._get_object('native', dict(object_path='inexistent'))
+
+    def test_unknown_reader(self):
+        with self.assertRaises(ValueError):
+            InputROOT.set_reader('invalid')
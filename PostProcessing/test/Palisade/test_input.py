@@ -1,5 +1,7 @@
 import numpy as np
 import operator as op
+import shutil
+import tempfile
 import unittest2 as unittest
 
 from rootpy import asrootpy
@@ -8,7 +10,8 @@ from rootpy.plotting import Hist1D, Hist2D, Profile1D, Efficiency, Graph
 from rootpy.plotting.hist import _Hist, _Hist2D
 from rootpy.plotting.profile import _ProfileBase
 
-from Karma.PostProcessing.Palisade import InputROOT
+from Karma.PostProcessing.Palisade import InputROOT, InputROOTFile, ObjectCache, PersistentCache, TFileHandlePool
+from Karma.PostProcessing.Palisade._input import _ROOTObjectFunctions
 
 
 class TestInputROOTClass(unittest.TestCase):
@@ -63,6 +66,235 @@ class TestInputROOTClass(unittest.TestCase):
         self.assertIs(InputROOT.get_function('test_function'), test_function_2)
 
 
+class TestTFileHandlePool(unittest.TestCase):
+
+    def setUp(self):
+        self._pool = TFileHandlePool(max_open_files=1)
+
+    def tearDown(self):
+        self._pool.close_all()
+
+    def test_file_kept_open(self):
+        with self._pool.open('ref/test.root') as _tfile_1:
+            pass
+        with self._pool.open('ref/test.root') as _tfile_2:
+            pass
+        self.assertIs(_tfile_1, _tfile_2)
+        self.assertIn('ref/test.root', self._pool)
+
+    def test_least_recently_used_closed(self):
+        with self._pool.open('ref/test.root'):
+            pass
+        with self._pool.open('ref/test_2.root'):
+            pass
+        self.assertEqual(len(self._pool), 1)
+        self.assertNotIn('ref/test.root', self._pool)
+        self.assertIn('ref/test_2.root', self._pool)
+
+    def test_files_in_use_not_closed(self):
+        with self._pool.open('ref/test.root') as _tfile_1:
+            with self._pool.open('ref/test_2.root'):
+                self.assertEqual(len(self._pool), 2)
+            self.assertIsInstance(_tfile_1.Get('h1'), _Hist)
+        self.assertEqual(len(self._pool), 1)
+
+    def test_max_open_files_reduced(self):
+        self._pool.max_open_files = 2
+        with self._pool.open('ref/test.root'):
+            pass
+        with self._pool.open('ref/test_2.root'):
+            pass
+        self.assertEqual(len(self._pool), 2)
+        self._pool.max_open_files = 1
+        self.assertEqual(len(self._pool), 1)
+
+    def test_input_file_reuses_pooled_file(self):
+        _ic = InputROOT()
+        _ic.add_file('ref/test.root', nickname='test')
+        _ic.get('test:h1')
+        _ic._get_input_controller_for_file('test').clear()
+        _ic.get('test:h1')
+        self.assertIn(list(_ic._input_controllers)[0], InputROOTFile._file_handle_pool)
+
+
+class TestObjectCache(unittest.TestCase):
+
+    def setUp(self):
+        with root_open('ref/test.root') as _tfile:
+            self._h1 = _tfile.Get('h1')
+            self._h1.SetDirectory(0)
+        self._h1_size = ObjectCache.estimate_size(self._h1)
+        self._cache = ObjectCache(max_bytes=2 * self._h1_size)
+
+    def test_estimate_size_scales_with_bins(self):
+        _h_small = Hist1D(10, 0, 1, type='D')
+        _h_large = Hist1D(1000, 0, 1, type='D')
+        self.assertGreater(ObjectCache.estimate_size(_h_large), ObjectCache.estimate_size(_h_small))
+        self.assertGreater(ObjectCache.estimate_size(_h_large), 1000 * 8)
+
+    def test_least_recently_used_evicted(self):
+        self._cache.put(('ns', 'a'), self._h1)
+        self._cache.put(('ns', 'b'), self._h1)
+        self._cache.get(('ns', 'a'))
+        self._cache.put(('ns', 'c'), self._h1)
+        self.assertIn(('ns', 'a'), self._cache)
+        self.assertNotIn(('ns', 'b'), self._cache)
+        self.assertIn(('ns', 'c'), self._cache)
+        self.assertLessEqual(self._cache.n_bytes, self._cache.max_bytes)
+
+    def test_stats(self):
+        self._cache.put(('ns', 'a'), self._h1)
+        self._cache.get(('ns', 'a'))
+        self._cache.get(('ns', 'b'))
+        for _key in 'cd':
+            self._cache.put(('ns', _key), self._h1)
+        _stats = self._cache.stats
+        self.assertEqual(_stats['hits'], 1)
+        self.assertEqual(_stats['misses'], 1)
+        self.assertEqual(_stats['evictions'], 1)
+        self.assertEqual(_stats['n_objects'], 2)
+
+    def test_clear_namespace(self):
+        self._cache.put(('ns1', 'a'), 1)
+        self._cache.put(('ns2', 'a'), 2)
+        self._cache.clear(namespace='ns1')
+        self.assertNotIn(('ns1', 'a'), self._cache)
+        self.assertIn(('ns2', 'a'), self._cache)
+
+    def test_input_file_rerequests_evicted_object(self):
+        _ic = InputROOT()
+        _ic.add_file('ref/test.root', nickname='test')
+        _ic.request([dict(object_spec='test:h1', rebin_factor=2)])
+        _n_bins = _ic.get('test:h1').GetNbinsX()
+        InputROOT.set_cache_size(0)
+        try:
+            self.assertEqual(_ic.get('test:h1').GetNbinsX(), _n_bins)
+            self.assertEqual(_ic.get('test:h1').GetNbinsX(), _n_bins)
+        finally:
+            InputROOT.set_cache_size(None)
+
+
+class TestPersistentCache(unittest.TestCase):
+
+    def setUp(self):
+        self._cache_dir = tempfile.mkdtemp()
+        self._cache = PersistentCache(self._cache_dir)
+        with root_open('ref/test.root') as _tfile:
+            self._h1 = _tfile.Get('h1')
+            self._h1.SetDirectory(0)
+
+    def tearDown(self):
+        InputROOT.set_persistent_cache_dir(None)
+        shutil.rmtree(self._cache_dir)
+
+    def test_key_depends_on_contents(self):
+        _h1_clone = self._h1.Clone('some_other_name')
+        _key = self._cache.get_key(len, (self._h1,), {})
+        self.assertEqual(self._cache.get_key(len, (_h1_clone,), {}), _key)
+        _h1_clone.Fill(0.5)
+        self.assertNotEqual(self._cache.get_key(len, (_h1_clone,), {}), _key)
+        self.assertNotEqual(self._cache.get_key(abs, (self._h1,), {}), _key)
+
+    def test_key_depends_on_profile_and_graph_contents(self):
+        _p1 = Profile1D(5, 0, 5)
+        _p1.Fill(0.5, 2.0)
+        _p1.Fill(1.5, 3.0, 0.5)
+        _g1 = Graph(2)
+        _g1.SetPoint(0, 1.0, 2.0)
+        _g1.SetPoint(1, 2.0, 3.0)
+        for _label, _obj in [('profile', _p1), ('graph', _g1)]:
+            with self.subTest(test_label=_label):
+                _clone = _obj.Clone('some_other_name')
+                _key = self._cache.get_key(len, (_obj,), {})
+                self.assertEqual(self._cache.get_key(len, (_clone,), {}), _key)
+                if _label == 'profile':
+                    _clone.Fill(1.5, 4.0)
+                else:
+                    _clone.SetPoint(1, 2.0, 4.0)
+                self.assertNotEqual(self._cache.get_key(len, (_clone,), {}), _key)
+
+    def test_store_and_load(self):
+        for _label, _result in [('tobject', self._h1), ('python_object', dict(a=[1, 2], b="c"))]:
+            with self.subTest(test_label=_label):
+                _key = self._cache.get_key(len, (_label,), {})
+                self.assertIs(self._cache.load(_key), None)
+                self._cache.store(_key, _result)
+                _loaded = self._cache.load(_key)
+                if _label == 'tobject':
+                    self.assertIsInstance(_loaded, _Hist)
+                    for _bin_1, _bin_2 in zip(_loaded, _result):
+                        self.assertEqual(_bin_1.value, _bin_2.value)
+                        self.assertEqual(_bin_1.error, _bin_2.error)
+                else:
+                    self.assertEqual(_loaded, _result)
+
+    def test_persistent_function_evaluated_once(self):
+        _call_count = [0]
+
+        @InputROOT.add_function(persistent=True)
+        def triple_persistent(tobject):
+            _call_count[0] += 1
+            return 3 * tobject
+
+        InputROOT.set_persistent_cache_dir(self._cache_dir)
+        for _i in range(3):
+            _ic = InputROOT()
+            _ic.add_file('ref/test.root', nickname='test')
+            _result = _ic.get_expr('triple_persistent("test:h1")')
+            InputROOT.clear_cache()
+
+        self.assertEqual(_call_count[0], 1)
+        for _bin_1, _bin_2 in zip(_result, 3 * self._h1):
+            self.assertEqual(_bin_1.value, _bin_2.value)
+
+        # remove function to avoid side effects
+        InputROOT.functions.pop('triple_persistent', None)
+
+
+class TestROOTObjectFunctionsArrays(unittest.TestCase):
+
+    def setUp(self):
+        with root_open('ref/test.root') as _tfile:
+            self._objects = {}
+            for _name in ('h1', 'h2', 'h2d'):
+                self._objects[_name] = _tfile.Get(_name)
+                self._objects[_name].SetDirectory(0)
+
+    def tearDown(self):
+        _ROOTObjectFunctions.use_arrays = True
+
+    def _assert_same_bins(self, tobject_1, tobject_2):
+        self.assertEqual(len(tobject_1), len(tobject_2))
+        for _bin_1, _bin_2 in zip(tobject_1, tobject_2):
+            self.assertAlmostEqual(_bin_1.value, _bin_2.value)
+            self.assertAlmostEqual(_bin_1.error, _bin_2.error)
+
+    def test_array_implementations_match_bin_loops(self):
+        _h1, _h2, _h2d = self._objects['h1'], self._objects['h2'], self._objects['h2d']
+        _threshold = 0.5 * _h1.GetMaximum()
+        _function_args = [
+            ('yerr', (_h1,)),
+            ('atleast', (_h1, _threshold)),
+            ('threshold', (_h1, _threshold)),
+            ('bin_width', (_h1,)),
+            ('bin_width', (_h2d,)),
+            ('max', (_h1, _h2)),
+            ('max_val_min_err', (_h1, _h2, _h1)),
+            ('mask_if_less', (_h1, _h2)),
+            ('select', ([_h1, _h2], _ROOTObjectFunctions.threshold(_h1, _threshold))),
+            ('max_yield_index', ([_h1, _h2], [_h2, _h1], _threshold)),
+            ('normalize_x', (_h2d,)),
+        ]
+        for _function_name, _args in _function_args:
+            with self.subTest(function=_function_name):
+                _function = getattr(_ROOTObjectFunctions, _function_name)
+                _ROOTObjectFunctions.use_arrays = False
+                _result_loop = _function(*_args)
+                _ROOTObjectFunctions.use_arrays = True
+                _result_arrays = _function(*_args)
+                self._assert_same_bins(_result_arrays, _result_loop)
+
+
 class TestInputROOTNoFile(unittest.TestCase):
 
     def setUp(self):
@@ -120,6 +352,15 @@ class TestInputROOTWithFile(unittest.TestCase):
     def test_get_expr_simple_string(self):
         self.assertEquals(self._ic.get_expr('str("test:h1")'), "test:h1")
 
+    def test_compile_expr_cached(self):
+        _compiled_expr = InputROOT._compile_expr('"test:h1" + "test:h2"')
+        self.assertIs(InputROOT._compile_expr('"test:h1" + "test:h2"'), _compiled_expr)
+        self.assertEqual(_compiled_expr.object_specs, ('test:h1', 'test:h2'))
+
+    def test_compile_expr_object_specs(self):
+        _compiled_expr = InputROOT._compile_expr('f("test:h1", str("no_spec"), ["test:h1", "test:h2"])')
+        self.assertEqual(_compiled_expr.object_specs, ('test:h1', 'test:h2'))
+
     def test_get_expr_histogram_binary_op(self):
         for _symbol, _op in [('+', op.add), ('*', op.mul)]:
             with self.subTest(operation=_symbol):
@@ -5,7 +5,8 @@ import unittest2 as unittest
 
 from Karma.PostProcessing.Palisade import (
     ContextValue, InputValue,
-    Lazy, String, lazify, If, Try
+    Lazy, String, lazify, If, Try,
+    intern_nodes, evaluation_cache
 )
 
 
@@ -156,6 +157,15 @@ class TrivialInputController(object):
         return '<'+str(expression)+'>'
 
 
+class CountingInputController(TrivialInputController):
+    def __init__(self):
+        self.n_calls = 0
+
+    def get_expr(self, expression):
+        self.n_calls += 1
+        return super(CountingInputController, self).get_expr(expression)
+
+
 class TestContextInputValues(unittest.TestCase):
     def setUp(self):
         self._ic = TrivialInputController()
@@ -196,3 +206,53 @@ class TestContextInputValues(unittest.TestCase):
             _ival.eval(self._context),
              self._ic.get_expr(_expr_1) + self._ic.get_expr(_expr_2)
         )
+
+
+class TestInternAndEvaluationCache(unittest.TestCase):
+    def setUp(self):
+        self._ic = CountingInputController()
+        self._contexts = [
+            {'namespace': {'key': 'value_{}'.format(_i)}, '_input_controller': self._ic}
+            for _i in range(2)
+        ]
+
+    def test_intern_merges_identical_subtrees(self):
+        _config = {
+            'a': InputValue('x') + ContextValue('namespace[key]'),
+            'b': [InputValue('x') + ContextValue('namespace[key]'), InputValue('y')],
+        }
+        intern_nodes(_config)
+        self.assertIs(_config['a'], _config['b'][0])
+        self.assertIsNot(_config['b'][0], _config['b'][1])
+
+    def test_intern_keeps_different_subtrees(self):
+        _nodes = [Lazy(1) + Lazy(2), Lazy(1) - Lazy(2), Lazy(1.0) + Lazy(2), Lazy([1]) + Lazy(2)]
+        _interned = [intern_nodes(_node) for _node in _nodes]
+        self.assertEqual(len(set(map(id, _interned))), len(_nodes))
+
+    def test_evaluation_cache_per_context(self):
+        _node = intern_nodes([InputValue('x') + InputValue('x'), InputValue('x')])
+        for _context in self._contexts:
+            with evaluation_cache():
+                self.assertEquals([_n.eval(_context) for _n in _node], ['<x><x>', '<x>'])
+        # evaluated once per context
+        self.assertEqual(self._ic.n_calls, len(self._contexts))
+
+    def test_no_evaluation_cache_outside_scope(self):
+        _node = InputValue('x')
+        _node.eval(self._contexts[0])
+        _node.eval(self._contexts[0])
+        self.assertEqual(self._ic.n_calls, 2)
+
+    def test_evaluation_cache_does_not_share_containers(self):
+        _nodes = intern_nodes([If(Lazy(True), Lazy(dict)(a=Lazy(1)), None) for _ in range(2)])
+        self.assertIs(_nodes[0], _nodes[1])
+        with evaluation_cache():
+            _first = _nodes[0].eval(self._contexts[0])
+            _first['a'] = 2
+            self.assertEquals(_nodes[1].eval(self._contexts[0]), {'a': 1})
+
+    def test_evaluation_cache_distinguishes_contexts(self):
+        _node = ContextValue('namespace[key]')
+        with evaluation_cache():
+            self.assertEquals([_node.eval(_context) for _context in self._contexts], ['value_0', 'value_1'])
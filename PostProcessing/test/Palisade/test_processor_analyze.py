@@ -143,6 +143,25 @@ class TestAnalyzeProcessor(unittest.TestCase):
 
                 self._assert_rootpy_hist_equal(_obj_ref, _obj_test)
 
+    def test_copy_objects_to_directories_with_compression(self):
+        _cfg = deepcopy(self.BASE_CFG)
+        _cfg['tasks'][0].update(compression_level=9, compression_algorithm='lzma', buffer_size=64000)
+        for _output_path in ['dir_b/h2', 'dir_a/nested/h1', 'dir_a/h2']:
+            _cfg['tasks'][0]['subtasks'].append({
+                'expression': '"test:{}"'.format(os.path.basename(_output_path)),
+                'output_path': _output_path
+            })
+
+        self._run_palisade(config=_cfg)
+
+        with root_open(self._TEST_FILENAME) as _tfile:
+            self.assertEqual(_tfile.GetCompressionAlgorithm(), 2)
+            self.assertEqual(_tfile.GetCompressionLevel(), 9)
+            for _output_path in ['dir_b/h2', 'dir_a/nested/h1', 'dir_a/h2']:
+                with self.subTest(output_path=_output_path):
+                    _obj_ref = self._REF_OBJECTS[os.path.basename(_output_path)]
+                    self._assert_rootpy_hist_equal(_obj_ref, _tfile.Get(_output_path))
+
     def test_arithmetic(self):
         _cfg = deepcopy(self.BASE_CFG)
         _cfg['tasks'][0]['subtasks'].append({
@@ -12,9 +12,9 @@ from rootpy.plotting import Hist1D, Hist2D, Profile1D, Efficiency, Graph
 from rootpy.plotting.hist import _Hist, _Hist2D
 from rootpy.plotting.profile import _ProfileBase
 
-from Karma.PostProcessing.Palisade import ContextValue, String, LiteralString
+from Karma.PostProcessing.Palisade import ContextValue, InputValue, String, LiteralString
 from Karma.PostProcessing.Palisade.Processors._base import _ProcessorBase, ConfigurationError
-from Karma.PostProcessing.Palisade._lazy import String
+from Karma.PostProcessing.Palisade._lazy import String, Lazy, If
 
 
 _RESULTS = []
@@ -38,6 +38,20 @@ class DummyProcessor(_ProcessorBase):
     _ACTIONS = [_process]
 
 
+class DummyProcessorModifyingConfig(DummyProcessor):
+
+    def _modify(self, config):
+        config['replace_under_here']['modified'].n_modifications += 1
+        return self.results.append(config)
+
+    _ACTIONS = [_modify]
+
+
+class DummyProcessorWithExpressions(DummyProcessor):
+
+    SUBKEY_FOR_EXPRESSIONS = "expressions_here"
+
+
 
 class TestProcessorBase(unittest.TestCase):
     #MANDATORY_CONFIG_KEYS = ['input_files', 'expansions', 'templates']
@@ -316,3 +330,109 @@ class TestProcessorBase(unittest.TestCase):
         _results = self._run_palisade(config=_cfg)
         self.assertEqual(len(_results), 1)
         self.assertEqual(_results[0]['replace_under_here']['context_value'], self.BASE_CFG['expansions']['namespace'][0]['key'])
+
+    def test_invariant_entries_resolved_once(self):
+        _calls = []
+        def _count_calls():
+            _calls.append(None)
+            return len(_calls)
+
+        _cfg = deepcopy(self.BASE_CFG)
+        _cfg['expansions']['varying'] = [dict(key=1), dict(key=2), dict(key=3)]
+        _cfg['templates'][0].update({
+            'replace_under_here': {
+                'invariant': Lazy(_count_calls)(),
+                'varying': ContextValue('varying[key]'),
+                'varying_string': '{varying[key]}_{namespace[key]}',
+            }
+        })
+
+        _results = self._run_palisade(config=_cfg)
+        self.assertEqual(len(_calls), 1)
+        self.assertEqual([_r['replace_under_here']['invariant'] for _r in _results], [1, 1, 1])
+        self.assertEqual(sorted(_r['replace_under_here']['varying'] for _r in _results), [1, 2, 3])
+        self.assertEqual(sorted(_r['replace_under_here']['varying_string'] for _r in _results), ['1_42', '2_42', '3_42'])
+
+    def test_invariant_entries_modified_not_shared(self):
+        class _Modifiable(object):
+            n_modifications = 0
+
+        _cfg = deepcopy(self.BASE_CFG)
+        _cfg['expansions']['varying'] = [dict(key=1), dict(key=2), dict(key=3)]
+        _cfg['templates'][0].update({
+            'replace_under_here': {
+                'modified': Lazy(_Modifiable)(),
+                'varying': ContextValue('varying[key]'),
+            }
+        })
+
+        _p = DummyProcessorModifyingConfig(_cfg)
+        _p.run(show_progress=False)
+        self.assertEqual(len(_p.results), 3)
+        self.assertEqual([_r['replace_under_here']['modified'].n_modifications for _r in _p.results], [1, 1, 1])
+
+    def test_templates_shared_not_modified(self):
+        _shared_object = np.arange(3)
+        _cfg = deepcopy(self.BASE_CFG)
+        _cfg['expansions']['varying'] = [dict(key=1), dict(key=2)]
+        _cfg['templates'][0].update({
+            'replace_under_here': {
+                'varying': ContextValue('varying[key]'),
+                'static': [dict(array=_shared_object)],
+            },
+            'not_under_key': dict(array=_shared_object),
+        })
+        _template = _cfg['templates'][0]
+
+        _results = self._run_palisade(config=_cfg)
+        self.assertEqual(len(_results), 2)
+
+        # configurations are independent copies...
+        self.assertIsNot(_results[0]['replace_under_here'], _results[1]['replace_under_here'])
+        self.assertIsNot(_results[0]['replace_under_here']['static'][0], _template['replace_under_here']['static'][0])
+        self.assertIsNot(_results[0]['not_under_key'], _template['not_under_key'])
+        self.assertIsInstance(_template['replace_under_here']['varying'], ContextValue)
+
+        # ...but unchanged entries are not copied
+        for _result in _results:
+            self.assertIs(_result['replace_under_here']['static'][0]['array'], _shared_object)
+            self.assertIs(_result['not_under_key']['array'], _shared_object)
+
+    def test_input_expressions_planned(self):
+        _cfg = deepcopy(self.BASE_CFG)
+        _cfg['templates'][0].update({
+            'expressions_here': [
+                dict(expression='"file:{namespace[key]}"', request_params=dict(rebin_factor=2)),
+            ],
+            'other_key': {
+                'nested': [InputValue('"file:obj_{namespace[key]}"') * 2],
+            },
+        })
+        _p = DummyProcessorWithExpressions(_cfg)
+        _context = dict(namespace=self.BASE_CFG['expansions']['namespace'][0])
+
+        self.assertEqual(
+            _p._get_input_expressions(_cfg['templates'][0], _context),
+            [('"file:42"', dict(rebin_factor=2)), ('"file:obj_42"', {})]
+        )
+
+    def test_input_expressions_planned_lazy_subkey(self):
+        _cfg = deepcopy(self.BASE_CFG)
+        _cfg['templates'][0].update({
+            'expressions_here': If(
+                ContextValue('namespace[key]') == 42,
+                Lazy([dict(expression='"file:{namespace[key]}"')]),
+                Lazy([]),
+            ),
+        })
+        _p = DummyProcessorWithExpressions(_cfg)
+        _context = dict(namespace=self.BASE_CFG['expansions']['namespace'][0])
+
+        self.assertEqual(
+            _p._get_input_expressions(_cfg['templates'][0], _context),
+            [('"file:42"', {})]
+        )
+        self.assertEqual(
+            _p._get_input_expressions(_cfg['templates'][0], dict(namespace=dict(key=43))),
+            []
+        )
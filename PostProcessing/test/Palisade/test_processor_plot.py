@@ -490,3 +490,126 @@ class TestPlotProcessor(unittest.TestCase):
         #assert len(_obj_yml_dicts) == 1  # should be present twice
         #self._assert_yml_equal_to_ref(_obj_yml_dicts[0], self._REF_OBJECTS['h1'])
         #self._assert_yml_equal_to_ref(_obj_yml_dicts[1], self._REF_OBJECTS['h1'])
+
+    def test_plot_parallel(self):
+        _cfg = deepcopy(self.BASE_CFG)
+        _cfg['figures'][0]['filename'] = 'plot_{obj[name]}.png'
+        _cfg['figures'][0]['subplots'].append({
+            'expression': '"test:{obj[name]}"',
+        })
+        _cfg['expansions'] = {
+            'obj': [dict(name='h1'), dict(name='h2')],
+        }
+
+        _p = PlotProcessor(
+            _cfg,
+            output_folder=TestPlotProcessor.OUTPUT_FOLDER
+        )
+        _p.run(show_progress=False, n_jobs=2)
+
+        for _obj_name in ['h1', 'h2']:
+            with self.subTest(object=_obj_name):
+                with open(os.path.join(self.OUTPUT_FOLDER, 'plot_{}.yml'.format(_obj_name))) as _f:
+                    _yml = yaml.load(_f)
+                self._assert_yml_equal_to_ref(_yml['subplots'][0], self._REF_OBJECTS[_obj_name])
+
+    def test_figures_released_and_reused(self):
+        _cfg = deepcopy(self.BASE_CFG)
+        _cfg['figures'][0]['filename'] = 'plot_{obj[name]}.png'
+        _cfg['figures'][0]['subplots'].append({
+            'expression': '"test:{obj[name]}"',
+        })
+        _cfg['expansions'] = {
+            'obj': [dict(name='h1'), dict(name='h2')],
+        }
+
+        _p = PlotProcessor(
+            _cfg,
+            output_folder=TestPlotProcessor.OUTPUT_FOLDER
+        )
+        _p.run(show_progress=False)
+
+        # both figures were released after saving, reusing the same figure
+        self.assertEqual(len(_p._figures), 0)
+        self.assertEqual(sum(len(_figs) for _figs in _p._figure_pool.values()), 1)
+        for _obj_name in ['h1', 'h2']:
+            with self.subTest(object=_obj_name):
+                with open(os.path.join(self.OUTPUT_FOLDER, 'plot_{}.yml'.format(_obj_name))) as _f:
+                    _yml = yaml.load(_f)
+                self._assert_yml_equal_to_ref(_yml['subplots'][0], self._REF_OBJECTS[_obj_name])
+        _p.clear_figures()
+
+    def test_keep_figure(self):
+        _cfg = deepcopy(self.BASE_CFG)
+        _cfg['figures'][0]['keep_figure'] = True
+        _cfg['figures'][0]['subplots'].append({
+            'expression': '"test:h1"',
+        })
+
+        _p = PlotProcessor(
+            _cfg,
+            output_folder=TestPlotProcessor.OUTPUT_FOLDER
+        )
+        _p.run(show_progress=False)
+
+        self.assertEqual(list(_p._figures), [self._TEST_FILENAME_FIG])
+        _p.clear_figures()
+
+    def test_incremental_skips_unchanged_figures(self):
+        _cfg = deepcopy(self.BASE_CFG)
+        _cfg['figures'][0]['filename'] = 'plot_incremental.png'
+        _cfg['figures'][0]['incremental'] = True
+        _cfg['figures'][0]['subplots'].append({
+            'expression': '"test:h1"',
+        })
+
+        def _run_and_count_figures(config):
+            _p = PlotProcessor(
+                deepcopy(config),
+                output_folder=TestPlotProcessor.OUTPUT_FOLDER
+            )
+            _p.run(show_progress=False)
+            _n_figures = sum(len(_figs) for _figs in _p._figure_pool.values())
+            _p.clear_figures()
+            return _n_figures
+
+        self.assertEqual(_run_and_count_figures(_cfg), 1)
+        self.assertTrue(os.path.exists(os.path.join(self.OUTPUT_FOLDER, 'plot_incremental.fingerprint')))
+
+        with self.subTest(change='none'):
+            self.assertEqual(_run_and_count_figures(_cfg), 0)
+
+        with self.subTest(change='config'):
+            _cfg['figures'][0]['subplots'][0]['color'] = 'red'
+            self.assertEqual(_run_and_count_figures(_cfg), 1)
+            self.assertEqual(_run_and_count_figures(_cfg), 0)
+
+        with self.subTest(change='expression'):
+            _cfg['figures'][0]['subplots'][0]['expression'] = '"test:h2"'
+            self.assertEqual(_run_and_count_figures(_cfg), 1)
+
+    def test_incremental_hashes_shared_objects_once(self):
+        _cfg = deepcopy(self.BASE_CFG)
+        _cfg['figures'] = [
+            {
+                'filename': 'plot_incremental_{}.png'.format(_i),
+                'incremental': True,
+                'subplots': [{'expression': '"test:h1"'}],
+            }
+            for _i in range(3)
+        ]
+        _p = PlotProcessor(
+            deepcopy(_cfg),
+            output_folder=TestPlotProcessor.OUTPUT_FOLDER
+        )
+        _p.run(show_progress=False)
+        _p.clear_figures()
+        self.assertEqual([_object_path for _, _object_path in _p._object_content_hashes], ['h1'])
+
+    def test_fingerprint_unhashable_config(self):
+        _p = PlotProcessor(
+            deepcopy(self.BASE_CFG),
+            output_folder=TestPlotProcessor.OUTPUT_FOLDER
+        )
+        self.assertIs(_p._get_fingerprint({'filename': 'plot.png', 'subplots': [], 'cmap': object()}), None)
+        self.assertTrue(_p._warned_unhashable_fingerprint)